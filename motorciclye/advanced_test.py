@@ -25,6 +25,8 @@ import re
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
+from motorciclye.prices import parse_prices
+
 
 class AdvancedSpiderValidator:
     """Validador avanzado para spiders con tests específicos"""
@@ -356,6 +358,10 @@ class AdvancedSpiderValidator:
         valid_prices = 0
         price_issues = []
         
+        # Los precios que llegaron como texto se parsean en lote para informar qué contenían
+        text_prices = [p.get('price') for p in products if isinstance(p.get('price'), str)]
+        parsed_text_prices = dict(zip(text_prices, parse_prices(text_prices)))
+        
         for product in products:
             price = product.get('price')
             
@@ -364,7 +370,9 @@ class AdvancedSpiderValidator:
                 continue
                 
             if not isinstance(price, (int, float)):
-                price_issues.append(f"Precio no numérico: {price}")
+                parsed = parsed_text_prices.get(price)
+                detail = f" (parseado: {parsed.value}, {parsed.status})" if parsed else ""
+                price_issues.append(f"Precio no numérico: {price}{detail}")
                 continue
                 
             if price <= 0:
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los backends de parseo HTML (motorciclye/html_backends.py) por spider.
+
+Corre extract_product_fields del spider sobre páginas de producto con cada
+backend y muestra el tiempo por página (incluye parsear el documento) y los
+campos que difieren entre backends. Las páginas salen de la cache HTTP del
+spider (solo las que parsel reconoce como producto, con nombre) o de archivos
+HTML.
+
+Uso:
+    python benchmark_parsers.py motodelta
+    python benchmark_parsers.py motodelta --limit 100 --repeat 5
+    python benchmark_parsers.py fasmotos --html paginas/*.html
+
+Con los resultados se elige el backend en config.yml (parsing.html_backend.spiders).
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Agregar el path del proyecto
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+os.environ.setdefault('SCRAPY_SETTINGS_MODULE', 'motorciclye.settings')
+
+from scrapy.http import HtmlResponse, Request
+from scrapy.spiderloader import SpiderLoader
+from scrapy.utils.project import data_path, get_project_settings
+
+from motorciclye.compression import decompress
+from motorciclye.html_backends import BACKENDS, make_backend, selectolax_available
+from motorciclye.parse_pool import detached_spider
+
+
+def cached_pages(cache_path: Path):
+    """(url, body) de las respuestas HTML guardadas en la cache SQLite del spider"""
+    conn = sqlite3.connect(f'file:{cache_path}?mode=ro', uri=True)
+    try:
+        for url, raw_headers, body, codec in conn.execute(
+            'SELECT response_url, headers, body, codec FROM responses WHERE status = 200 ORDER BY stored_at DESC'
+        ):
+            content_type = {k.lower(): v for k, v in json.loads(raw_headers).items()}.get('content-type', [''])
+            if 'html' in (content_type[0] if content_type else ''):
+                yield url, decompress(body, codec)
+    finally:
+        conn.close()
+
+
+def html_pages(paths):
+    for path in paths:
+        path = Path(path).resolve()
+        yield path.as_uri(), path.read_bytes()
+
+
+def new_response(url: str, body: bytes) -> HtmlResponse:
+    # Una response nueva por medición: el parseo del documento entra en el tiempo
+    return HtmlResponse(url=url, body=body, request=Request(url))
+
+
+def extract(spider, backend, url, body):
+    spider._html_backend = backend
+    return spider.extract_product_fields(new_response(url, body))
+
+
+def time_pages(spider, backend, pages, repeat: int):
+    """Milisegundos por página (mejor de `repeat` corridas de cada página)"""
+    times = []
+    for url, body in pages:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            extract(spider, backend, url, body)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        times.append(best * 1000)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de backends de parseo HTML por spider')
+    parser.add_argument('spider', help='Nombre del spider')
+    parser.add_argument('--html', nargs='+', help='Archivos HTML de páginas de producto (en lugar de la cache HTTP)')
+    parser.add_argument('--cache', help='Archivo de cache SQLite (por defecto el del spider)')
+    parser.add_argument('--limit', type=int, default=200, help='Máximo de páginas a medir')
+    parser.add_argument('--repeat', type=int, default=3, help='Mediciones por página (se toma la mejor)')
+    args = parser.parse_args()
+
+    settings = get_project_settings()
+    spider_cls = SpiderLoader.from_settings(settings).load(args.spider)
+    spider = detached_spider(spider_cls)
+    backends = {name: make_backend(name, spider_cls.FAST_SELECTORS) for name in BACKENDS}
+    if not selectolax_available():
+        print("⚠️  selectolax no está instalado: el backend 'selectolax' usa parsel")
+    elif not spider_cls.FAST_SELECTORS:
+        print(f"⚠️  {args.spider} no declara FAST_SELECTORS: el backend 'selectolax' usa parsel")
+
+    if args.html:
+        source, candidates = f'{len(args.html)} archivos', html_pages(args.html)
+    else:
+        cache_path = Path(args.cache or Path(data_path(settings['HTTPCACHE_DIR'])) / f'{args.spider}.sqlite3')
+        if not cache_path.exists():
+            print(f"✗ No existe la cache {cache_path}; usar --html")
+            return 1
+        source, candidates = str(cache_path), cached_pages(cache_path)
+
+    # Páginas de producto: las que parsel extrae con nombre
+    pages, reference = [], []
+    for url, body in candidates:
+        data = extract(spider, backends['parsel'], url, body)
+        if data.get('name'):
+            pages.append((url, body))
+            reference.append(data)
+            if len(pages) >= args.limit:
+                break
+    if not pages:
+        print(f"✗ No hay páginas de producto en {source}")
+        return 1
+    total_kb = sum(len(body) for _, body in pages) / 1024
+    print(f"📋 {args.spider}: {len(pages)} páginas de producto de {source} ({total_kb / len(pages):.0f} KB promedio)")
+
+    # Correctitud: campos que difieren de parsel
+    for name, backend in backends.items():
+        if backend.name == 'parsel':
+            continue
+        mismatches = {}
+        for (url, body), expected in zip(pages, reference):
+            actual = extract(spider, backend, url, body)
+            for field in set(expected) | set(actual):
+                if expected.get(field) != actual.get(field):
+                    mismatches.setdefault(field, []).append((url, expected.get(field), actual.get(field)))
+        print(f"   {name}: {'campos iguales a parsel' if not mismatches else f'{len(mismatches)} campos distintos'}")
+        for field, cases in sorted(mismatches.items()):
+            url, expected, actual = cases[0]
+            print(f"   ❌ {field} ({len(cases)} páginas), ej. {url}: parsel={expected!r} {name}={actual!r}")
+
+    print(f"\n⏱️  ms por página (mejor de {args.repeat})")
+    baseline = None
+    for name, backend in backends.items():
+        times = time_pages(spider, backend, pages, args.repeat)
+        mean = statistics.fmean(times)
+        p95 = sorted(times)[int(len(times) * 0.95) - 1] if len(times) >= 20 else max(times)
+        baseline = baseline or mean
+        print(f"   {name:<11} media {mean:7.2f}  mediana {statistics.median(times):7.2f}  "
+              f"p95 {p95:7.2f}  ({baseline / mean:.1f}x)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark y chequeo de correctitud del motor de precios (motorciclye/prices.py).
+
+Compara contra el corpus de fixtures/prices_es_ar.json y mide el tiempo del
+parser precompilado frente a la limpieza por regex anterior de BaseSpider.
+
+Uso:
+    python benchmark_prices.py
+    python benchmark_prices.py --iterations 200000
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+# Agregar el path del proyecto
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from motorciclye.prices import PRICE_PARSER, PriceParser
+
+CORPUS = project_root / 'fixtures' / 'prices_es_ar.json'
+
+# Lo que devuelven los XPath de precio de casi todos los spiders: "$ 1.234.567", "$ 1.234,56", "1234"
+COMMON_FORMAT_RE = re.compile(r'\s*\$?\s*[\d.,]+\s*')
+
+
+def legacy_clean_price(price_text):
+    """Implementación anterior de BaseSpider.clean_price (solo como referencia)"""
+    if not price_text:
+        return None
+    try:
+        cleaned = re.sub(r'[^\d.,]', '', price_text.strip())
+        cleaned = cleaned.replace(',', '.')
+        if cleaned.count('.') > 1:
+            parts = cleaned.split('.')
+            cleaned = ''.join(parts[:-1]) + '.' + parts[-1]
+        return float(cleaned) if cleaned else None
+    except (ValueError, AttributeError):
+        return None
+
+
+def check_corpus(cases):
+    """Devuelve la lista de casos en los que el parser no coincide con lo esperado"""
+    failures = []
+    for case in cases:
+        parsed = PRICE_PARSER.parse(case['text'])
+        expected = {field: case[field] for field in ('value', 'status', 'currency', 'installments') if field in case}
+        actual = {field: getattr(parsed, field) for field in expected}
+        if actual != expected:
+            failures.append((case['text'], expected, actual))
+    return failures
+
+
+def timeit(func, texts, iterations):
+    start = time.perf_counter()
+    done = 0
+    while done < iterations:
+        for text in texts:
+            func(text)
+        done += len(texts)
+    return (time.perf_counter() - start) / done * 1e6  # µs por llamada
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del parser de precios')
+    parser.add_argument('--iterations', type=int, default=100000, help='Cantidad de llamadas por variante')
+    args = parser.parse_args()
+
+    cases = json.loads(CORPUS.read_text(encoding='utf-8'))
+    texts = [case['text'] for case in cases]
+
+    failures = check_corpus(cases)
+    legacy_ok = sum(1 for case in cases if legacy_clean_price(case['text']) == case['value'])
+    print(f"📋 Corpus: {len(cases)} precios")
+    print(f"   PriceParser: {len(cases) - len(failures)}/{len(cases)} correctos")
+    print(f"   Regex anterior: {legacy_ok}/{len(cases)} correctos")
+    for text, expected, actual in failures:
+        print(f"   ❌ {text!r}: esperado {expected}, obtenido {actual}")
+
+    groups = {
+        'formato común': [text for text in texts if COMMON_FORMAT_RE.fullmatch(text)],
+        'corpus completo': texts,
+    }
+    print(f"\n⏱️  µs por precio ({args.iterations} llamadas)")
+    for label, group in groups.items():
+        legacy_us = timeit(legacy_clean_price, group, args.iterations)
+        engine_us = timeit(PRICE_PARSER.to_float, group, args.iterations)
+        # Sin el cache LRU: costo de un texto que no es del formato común la primera vez que aparece
+        uncached_us = timeit(PriceParser(cache_size=0).to_float, group, args.iterations)
+        batch_us = timeit(lambda _: PRICE_PARSER.to_floats(group), [None] * len(group), args.iterations)
+        print(f"   {label} ({len(group)} textos)")
+        print(f"      Regex anterior:        {legacy_us:.2f}")
+        print(f"      PriceParser.to_float:  {engine_us:.2f} ({legacy_us / engine_us:.1f}x)")
+        print(f"      sin cache:             {uncached_us:.2f} ({legacy_us / uncached_us:.1f}x)")
+        print(f"      PriceParser.to_floats: {batch_us / len(group):.2f} ({legacy_us * len(group) / batch_us:.1f}x)")
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
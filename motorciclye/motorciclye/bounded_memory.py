@@ -0,0 +1,187 @@
+"""
+Modo de memoria acotada para catálogos muy grandes.
+
+Con el scheduler por defecto todas las requests pendientes (cada una con su
+copia de meta) y el set de fingerprints del dupefilter viven en memoria, así
+que el proceso crece con el tamaño del catálogo: un listado o sitemap de
+decenas de miles de productos encola decenas de miles de Request. En modo
+acotado:
+
+- Las requests pendientes van a colas en disco (JOBDIR por corrida en
+  `build/jobs/<spider>/<run_id>`) serializadas con msgpack, sin los campos que
+  tienen el valor por defecto. Las que no se pueden serializar (callbacks que
+  no son métodos del spider, SeleniumRequest) quedan en la cola en memoria.
+- El dupefilter guarda los fingerprints en SQLite (`seen.sqlite3` en el
+  JOBDIR) en lugar de un set.
+- Se limitan las responses en proceso (SCRAPER_SLOT_MAX_ACTIVE_SIZE), las
+  requests concurrentes y el tamaño máximo de response, y la extensión
+  MemoryUsage avisa y cierra el spider al superar el techo configurado.
+
+La memoria queda plana respecto del tamaño del catálogo; ver
+`test_bounded_memory.py`, que lo verifica crawleando un catálogo sintético
+servido en localhost. Los pipelines con índices por producto (historial de
+precios, matching, hashes estáticos) mantienen su propio estado.
+
+Se activa por spider con BOUNDED_MEMORY = True, `-a bounded_memory=1` o en
+config.yml (`bounded_memory.spiders`). El JOBDIR se elimina cuando la
+corrida termina bien.
+"""
+
+import os
+import shutil
+import sqlite3
+
+import msgpack
+from queuelib import queue
+from scrapy.dupefilters import RFPDupeFilter
+from scrapy.http import Request
+from scrapy.utils.request import request_from_dict
+
+from .config import load_config
+
+COMMIT_EVERY = 1000  # Fingerprints nuevos por transacción
+
+# Valores por defecto de Request.to_dict que no se guardan en la cola
+_REQUEST_DEFAULTS = {
+    'errback': None,
+    'headers': {},
+    'body': b'',
+    'cookies': {},
+    'meta': {},
+    'encoding': 'utf-8',
+    'flags': [],
+    'cb_kwargs': {},
+    'dont_filter': False,
+    'method': 'GET',
+    'priority': 0,
+}
+
+SEEN_SCHEMA = """
+CREATE TABLE IF NOT EXISTS seen (
+    fingerprint BLOB PRIMARY KEY
+) WITHOUT ROWID;
+"""
+
+
+def bounded_memory_config() -> dict:
+    return load_config().get('bounded_memory') or {}
+
+
+def is_enabled(spider) -> bool:
+    """`-a bounded_memory=...`, config.yml (`bounded_memory.spiders`) o BOUNDED_MEMORY del spider"""
+    flag = getattr(spider, 'bounded_memory', None)
+    if flag is not None:
+        return str(flag).lower() in ('1', 'true', 'yes', 'si')
+    return spider.name in (bounded_memory_config().get('spiders') or []) or spider.BOUNDED_MEMORY
+
+
+def job_dir_for(spider_name: str, run_id: str) -> str:
+    directory = bounded_memory_config().get('dir') or os.path.join('build', 'jobs')
+    return os.path.join(directory, spider_name, run_id)
+
+
+def apply_settings(settings, job_dir: str):
+    """Settings del modo acotado; se aplican en from_crawler, antes de crear scheduler y extensiones"""
+    cfg = bounded_memory_config()
+    values = {
+        'JOBDIR': job_dir,
+        'SCHEDULER_DISK_QUEUE': 'motorciclye.bounded_memory.CompactLifoDiskQueue',
+        'DUPEFILTER_CLASS': 'motorciclye.bounded_memory.SqliteDupeFilter',
+        'CONCURRENT_REQUESTS': cfg.get('concurrent_requests', 8),
+        'SCRAPER_SLOT_MAX_ACTIVE_SIZE': int(cfg.get('max_active_response_mb', 2) * 1024 * 1024),
+        'DOWNLOAD_MAXSIZE': int(cfg.get('max_response_mb', 16) * 1024 * 1024),
+        'DOWNLOAD_WARNSIZE': int(cfg.get('max_response_mb', 16) * 1024 * 1024 / 2),
+        'MEMUSAGE_ENABLED': True,
+        'MEMUSAGE_WARNING_MB': cfg.get('memory_warning_mb', 0),
+        'MEMUSAGE_LIMIT_MB': cfg.get('memory_limit_mb', 0),
+        'MEMUSAGE_CHECK_INTERVAL_SECONDS': cfg.get('memory_check_interval_secs', 10),
+    }
+    for name, value in values.items():
+        settings.set(name, value, priority='spider')
+
+
+def remove_job_dir(job_dir: str):
+    shutil.rmtree(job_dir, ignore_errors=True)
+
+
+def encode_request(request: Request, spider) -> bytes:
+    """
+    Request -> msgpack sin los campos con valor por defecto (las tuplas de meta
+    vuelven como listas); ValueError si no se puede serializar
+    """
+    if not type(request).__module__.startswith('scrapy.'):
+        # Subclases de terceros (SeleniumRequest) tienen parámetros que to_dict no guarda
+        raise ValueError(f"Request de clase {type(request).__name__} no serializable en modo acotado")
+    data = request.to_dict(spider=spider)
+    compact = {key: value for key, value in data.items() if _REQUEST_DEFAULTS.get(key, ...) != value}
+    try:
+        return msgpack.packb(compact, use_bin_type=True)
+    except (TypeError, ValueError, OverflowError) as e:
+        raise ValueError(str(e)) from e
+
+
+def decode_request(raw: bytes, spider) -> Request:
+    data = dict(_REQUEST_DEFAULTS)
+    data.update(msgpack.unpackb(raw, raw=False))
+    return request_from_dict(data, spider=spider)
+
+
+class CompactLifoDiskQueue:
+    """Cola LIFO en disco (queuelib) de requests en msgpack; SCHEDULER_DISK_QUEUE"""
+
+    def __init__(self, crawler, key: str):
+        os.makedirs(os.path.dirname(key) or '.', exist_ok=True)
+        self.spider = crawler.spider
+        self.queue = queue.LifoDiskQueue(key)
+
+    @classmethod
+    def from_crawler(cls, crawler, key: str, *args, **kwargs):
+        return cls(crawler, key)
+
+    def push(self, request: Request):
+        self.queue.push(encode_request(request, self.spider))
+
+    def pop(self):
+        raw = self.queue.pop()
+        return decode_request(raw, self.spider) if raw else None
+
+    def peek(self):
+        raw = self.queue.peek()
+        return decode_request(raw, self.spider) if raw else None
+
+    def close(self):
+        self.queue.close()
+
+    def __len__(self):
+        return len(self.queue)
+
+
+class SqliteDupeFilter(RFPDupeFilter):
+    """RFPDupeFilter con los fingerprints en SQLite (JOBDIR/seen.sqlite3) en lugar de un set"""
+
+    def __init__(self, path=None, debug=False, *, fingerprinter=None):
+        super().__init__(None, debug, fingerprinter=fingerprinter)
+        # Sin JOBDIR (no debería pasar en modo acotado) la tabla queda en memoria
+        self.path = os.path.join(path, 'seen.sqlite3') if path else ':memory:'
+        if path:
+            os.makedirs(path, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=OFF')  # Se descarta junto con el JOBDIR
+        self.conn.executescript(SEEN_SCHEMA)
+        self._pending = 0
+
+    def request_seen(self, request: Request) -> bool:
+        fingerprint = self.fingerprinter.fingerprint(request)
+        inserted = self.conn.execute('INSERT OR IGNORE INTO seen (fingerprint) VALUES (?)', (fingerprint,)).rowcount
+        if not inserted:
+            return True
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self.conn.commit()
+            self._pending = 0
+        return False
+
+    def close(self, reason: str):
+        self.conn.commit()
+        self.conn.close()
@@ -4,9 +4,18 @@ Comando para reenviar datos desde archivos JSON a RabbitMQ.
 
 Uso:
     python command.py resend <source> <timestamp>
+    python command.py resend-bulk [--sources GLOB ...] [--since FECHA] [--until FECHA] [--latest] [--workers N]
+    python command.py runs list|sync|retention [opciones]
+    python command.py diff <feed_viejo> <feed_nuevo> | --source <spider> [--fields CAMPO ...] [-o salida.jsonl]
+    python command.py prices history <product_url> [--days N] | stores [--sources SPIDER ...] | backfill
+    python command.py matches list [--min-stores N] | show <product_url> | index [--sources GLOB ...] [--latest]
+    python command.py cache-compact [spider]
+    python command.py outbox-drain [spider]
     
 Ejemplo:
     python command.py resend motodelta 20250625131936
+    python command.py resend-bulk --since 20250625 --until 20250625 --workers 16
+    python command.py resend-bulk --sources 'moto*' --latest
     
 Este script:
 1. Lee el archivo build/<source>/<timestamp>/<source>.json
@@ -16,6 +25,11 @@ Este script:
 import sys
 import json
 import os
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pika
 from pathlib import Path
 from datetime import datetime
 
@@ -23,8 +37,17 @@ from datetime import datetime
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from motorciclye.rabbit_connection import get_rabbit_connection, publish_message
+from motorciclye.rabbit_connection import ChannelPool, get_rabbit_connection, publish_message
+from motorciclye.message_codecs import get_message_codec
+from motorciclye.outbox import idempotency_key
+from motorciclye.runs import find_build_dir
+from motorciclye.run_catalog import RunCatalog, load_feed, open_feed
+from motorciclye.feed_diff import FeedDiff, iter_feed, open_feed_path
+from motorciclye.matching import MatchIndex, matching_path
+from motorciclye.price_history import PriceHistory, history_path, observation_row, run_epoch
 from motorciclye.config import load_config
+from motorciclye.httpcache import cache_expiration_secs, compact_cache
+from motorciclye.outbox import Outbox, OutboxPublisher, outbox_config
 
 
 class ResendCommand:
@@ -35,13 +58,14 @@ class ResendCommand:
         self.channel = None
         self.processed_count = 0
         self.error_count = 0
+        self.codec = get_message_codec()
     
     def setup_rabbitmq(self):
         """Configurar conexión a RabbitMQ"""
         try:
             self.connection = get_rabbit_connection()
             self.channel = self.connection.channel()
-            print("✓ Conexión a RabbitMQ establecida")
+            print(f"✓ Conexión a RabbitMQ establecida ({self.codec})")
         except Exception as e:
             print(f"✗ Error conectando a RabbitMQ: {e}")
             sys.exit(1)
@@ -54,6 +78,16 @@ class ResendCommand:
             self.connection.close()
         print("✓ Conexión a RabbitMQ cerrada")
     
+    def find_catalog_run(self, source, timestamp):
+        """Buscar la corrida en el catálogo (build/catalog.sqlite3); None si no está registrada"""
+        build_dir = find_build_dir()
+        if build_dir is None:
+            return None
+        with RunCatalog(build_dir) as catalog:
+            runs = [run for run in catalog.find_runs(sources=[source], since=timestamp, until=timestamp)
+                    if run.timestamp == timestamp]
+        return runs[0] if runs else None
+
     def find_json_file(self, source, timestamp):
         """Buscar el archivo JSON en el directorio build"""
         # Buscar en el directorio actual
@@ -80,11 +114,14 @@ class ResendCommand:
         
         return None
     
-    def load_json_data(self, json_file):
-        """Cargar datos del archivo JSON"""
+    def load_json_data(self, json_file, run=None):
+        """Cargar datos del archivo JSON (o del .tar.gz si la corrida está archivada)"""
         try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            if run is not None and run.archive_path:
+                data = load_feed(run)
+            else:
+                with open(json_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
             
             print(f"✓ Archivo JSON cargado: {json_file}")
             
@@ -114,9 +151,9 @@ class ResendCommand:
         cfg = load_config()['rabbitmq']
         
         try:
-            message = json.dumps(item, ensure_ascii=False)
+            message = self.codec.encode(item)
             routing_key = f'{cfg["routing_key_prefix"]}.products.{source}'
-            publish_message(self.channel, routing_key, message)
+            publish_message(self.channel, routing_key, message, self.codec.properties)
             
             self.processed_count += 1
             item_name = item.get('name', item.get('title', 'Sin nombre'))
@@ -131,8 +168,12 @@ class ResendCommand:
         print(f"🔄 Iniciando resend para source='{source}' timestamp='{timestamp}'")
         print("-" * 60)
         
-        # 1. Buscar archivo JSON
-        json_file = self.find_json_file(source, timestamp)
+        # 1. Buscar archivo JSON (las corridas archivadas se leen del .tar.gz)
+        run = self.find_catalog_run(source, timestamp)
+        if run is not None and run.archive_path:
+            json_file = run.archive_path
+        else:
+            json_file = self.find_json_file(source, timestamp)
         if not json_file:
             print(f"✗ No se encontró el archivo: build/{source}/{timestamp}/{source}.json")
             print("✗ Ubicaciones buscadas:")
@@ -141,7 +182,7 @@ class ResendCommand:
             return False
         
         # 2. Cargar datos
-        data = self.load_json_data(json_file)
+        data = self.load_json_data(json_file, run)
         if not data:
             print("✗ No hay datos para procesar")
             return False
@@ -175,12 +216,477 @@ class ResendCommand:
         return self.error_count == 0
 
 
+class BulkResendCommand:
+    """
+    Reenvía muchas corridas en paralelo. Las corridas se resuelven con el
+    catálogo (ver run_catalog.py) y cada feed se publica en un thread del pool
+    usando un pool compartido de conexiones a RabbitMQ.
+    """
+
+    def __init__(self, workers=8):
+        self.workers = workers
+        self.codec = get_message_codec()
+        self.routing_key_prefix = load_config()['rabbitmq']['routing_key_prefix']
+        self._lock = threading.Lock()
+        self.published = 0
+        self.errors = 0
+        self.bytes_sent = 0
+
+    def resend_bulk_command(self, sources=None, since=None, until=None, latest=False, build_dir=None, dry_run=False):
+        build_dir = build_dir or find_build_dir()
+        if not build_dir or not os.path.isdir(build_dir):
+            print(f"✗ No se encontró el directorio build ({build_dir or 'build'})")
+            return False
+        try:
+            with RunCatalog(build_dir) as catalog:
+                runs = catalog.find_runs(sources=sources, since=since, until=until, latest=latest)
+        except ValueError as e:
+            print(f"✗ {e}")
+            return False
+        if not runs:
+            print("✗ No hay corridas que coincidan con el filtro (¿falta 'python command.py runs sync'?)")
+            return False
+
+        print(f"🔄 {len(runs)} corridas seleccionadas de {len({run.source for run in runs})} fuentes")
+        for run in runs:
+            print(f"   • {run.source} {run.timestamp}{' (archivada)' if run.archive_path else ''}")
+        if dry_run:
+            return True
+
+        print(f"🚀 Publicando con {self.workers} workers ({self.codec})...")
+        print("-" * 60)
+        pool = ChannelPool(self.workers)
+        start_time = time.monotonic()
+        ok = True
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = {executor.submit(self._resend_run, run, pool): run for run in runs}
+                for future in as_completed(futures):
+                    run = futures[future]
+                    try:
+                        published, errors, elapsed = future.result()
+                    except Exception as e:
+                        ok = False
+                        print(f"✗ {run.source} {run.timestamp}: {e!r}")
+                        continue
+                    ok = ok and errors == 0
+                    rate = published / elapsed if elapsed else 0
+                    status = "✓" if errors == 0 else "⚠️"
+                    print(f"{status} {run.source} {run.timestamp}: {published} publicados, {errors} errores ({rate:.0f} items/s)")
+        finally:
+            pool.close()
+
+        elapsed = time.monotonic() - start_time
+        print("-" * 60)
+        print(f"📊 RESUMEN:")
+        print(f"   • Corridas: {len(runs)}")
+        print(f"   • Total publicados: {self.published}")
+        print(f"   • Errores: {self.errors}")
+        print(f"   • Tiempo: {elapsed:.1f}s")
+        print(f"   • Velocidad: {self.published / elapsed if elapsed else 0:.1f} items/s, "
+              f"{self.bytes_sent / 1024 / 1024 / elapsed if elapsed else 0:.1f} MB/s")
+        return ok
+
+    def _resend_run(self, run, pool):
+        start_time = time.monotonic()
+        data = load_feed(run)
+
+        published = errors = bytes_sent = 0
+        for item in data:
+            # Misma clave de idempotencia que los pipelines: el consumidor descarta los que ya tenía
+            if item.get('item_type') == 'source':
+                routing_key = f'{self.routing_key_prefix}.sources'
+                message_id = idempotency_key(run.timestamp, run.source, 'source', item.get('source_url'))
+            else:
+                routing_key = f'{self.routing_key_prefix}.products.{run.source}'
+                message_id = idempotency_key(run.timestamp, run.source, item.get('product_url'))
+            try:
+                message = self.codec.encode(item)
+                with pool.channel() as channel:
+                    publish_message(channel, routing_key, message, self.codec.properties_for(message_id))
+                published += 1
+                bytes_sent += len(message)
+            except pika.exceptions.AMQPConnectionError:
+                # Sin broker no tiene sentido seguir con el resto del feed
+                raise
+            except Exception:
+                errors += 1
+
+        with self._lock:
+            self.published += published
+            self.errors += errors
+            self.bytes_sent += bytes_sent
+        return published, errors, time.monotonic() - start_time
+
+
+class RunsCommand:
+    """Comandos sobre el catálogo de corridas (build/catalog.sqlite3)"""
+
+    def __init__(self, build_dir=None):
+        self.build_dir = build_dir or find_build_dir() or 'build'
+
+    def list_command(self, sources=None, since=None, until=None, latest=False, include_deleted=False):
+        with RunCatalog(self.build_dir) as catalog:
+            rows = catalog.query(sources, since, until, latest, include_deleted=include_deleted)
+            total_mb = catalog.total_bytes() / 1024 / 1024
+        if not rows:
+            print("✗ No hay corridas que coincidan con el filtro")
+            return False
+        print(f"{'SPIDER':<16} {'RUN_ID':<15} {'ESTADO':<9} {'ITEMS':>7} {'FEED MB':>8}  MOTIVO")
+        for row in rows:
+            size = row['archive_bytes'] if row['status'] == 'archived' else row['feed_bytes']
+            size_mb = f"{size / 1024 / 1024:.1f}" if size is not None else '-'
+            items = row['item_count'] if row['item_count'] is not None else '-'
+            print(f"{row['spider']:<16} {row['run_id']:<15} {row['status']:<9} {items:>7} {size_mb:>8}  {row['finish_reason'] or ''}")
+        print(f"📊 {len(rows)} corridas, {total_mb:.1f} MB en {self.build_dir}")
+        return True
+
+    def sync_command(self):
+        with RunCatalog(self.build_dir) as catalog:
+            added = catalog.sync(self.build_dir)
+        print(f"✓ {added} corridas agregadas al catálogo desde {self.build_dir}")
+        return True
+
+    def retention_command(self, archive_after_days=None, max_total_mb=None, dry_run=False):
+        with RunCatalog(self.build_dir) as catalog:
+            summary = catalog.apply_retention(archive_after_days, max_total_mb, dry_run=dry_run)
+        prefix = "(dry-run) " if dry_run else ""
+        for spider, run_id in summary['archived']:
+            print(f"📦 {prefix}Archivada: {spider} {run_id}")
+        for spider, run_id in summary['deleted']:
+            print(f"🗑️  {prefix}Eliminada: {spider} {run_id}")
+        for spider, run_id in summary['missing']:
+            print(f"⚠️  {prefix}Sin directorio, no se archiva: {spider} {run_id}")
+        before_mb = summary['bytes_before'] / 1024 / 1024
+        after_mb = summary['bytes_after'] / 1024 / 1024
+        print(f"📊 {len(summary['archived'])} archivadas, {len(summary['deleted'])} eliminadas, "
+              f"{len(summary['missing'])} sin directorio, "
+              f"{before_mb:.1f} MB → {after_mb:.1f} MB")
+        return True
+
+
+class DiffCommand:
+    """Diff entre dos corridas: productos nuevos, eliminados y modificados (ver feed_diff.py)"""
+
+    def __init__(self, build_dir=None):
+        self.build_dir = build_dir or find_build_dir() or 'build'
+
+    def resolve_feed(self, spec):
+        """Ruta a un feed o '<spider>@<run_id>' del catálogo -> (etiqueta, context manager, tamaño)"""
+        if os.path.isfile(spec):
+            return spec, open_feed_path(spec), os.path.getsize(spec)
+        if '@' not in spec:
+            raise ValueError(f"No existe el archivo '{spec}' (usar una ruta o <spider>@<run_id>)")
+        source, run_id = spec.split('@', 1)
+        with RunCatalog(self.build_dir) as catalog:
+            runs = [run for run in catalog.find_runs(sources=[source], since=run_id, until=run_id)
+                    if run.timestamp == run_id]
+        if not runs:
+            raise ValueError(f"La corrida {source} {run_id} no está en el catálogo")
+        run = runs[0]
+        size = os.path.getsize(run.feed_path) if os.path.exists(run.feed_path) else None
+        return spec, open_feed(run), size
+
+    def latest_pair(self, source):
+        """Las últimas dos corridas de un spider según el catálogo"""
+        with RunCatalog(self.build_dir) as catalog:
+            runs = [run for run in catalog.find_runs(sources=[source]) if run.source == source]
+        if len(runs) < 2:
+            raise ValueError(f"Se necesitan al menos dos corridas de {source} en el catálogo")
+        return f"{source}@{runs[-2].timestamp}", f"{source}@{runs[-1].timestamp}"
+
+    def diff_command(self, old, new, fields=None, output=None, buckets=None, limit=20):
+        old_label, old_feed, old_size = self.resolve_feed(old)
+        new_label, new_feed, new_size = self.resolve_feed(new)
+        size_hint = max(old_size, new_size) if old_size is not None and new_size is not None else None
+        diff = FeedDiff(old_feed, new_feed, fields=fields, buckets=buckets, size_hint=size_hint)
+        print(f"🔍 Diff {old_label} → {new_label} ({diff.buckets} buckets)")
+
+        start_time = time.monotonic()
+        out = open(output, 'w', encoding='utf-8') if output else None
+        shown = 0
+        try:
+            for record in diff.records():
+                if out is not None:
+                    out.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+                if shown < limit:
+                    shown += 1
+                    if record['change'] == 'changed':
+                        detail = ', '.join(f"{name}: {values[0]!r} → {values[1]!r}" for name, values in record['fields'].items())
+                    else:
+                        detail = record['product'].get('name') or ''
+                    print(f"   {record['change']:<8} {record['product_url']}  {detail}")
+        finally:
+            if out is not None:
+                out.close()
+        elapsed = time.monotonic() - start_time
+
+        stats = diff.stats
+        print("-" * 60)
+        print(f"📊 {stats['old_items']} → {stats['new_items']} productos en {elapsed:.1f}s")
+        print(f"   ➕ Nuevos: {stats['added']}")
+        print(f"   ➖ Eliminados: {stats['removed']}")
+        print(f"   ✏️  Modificados: {stats['changed']} ({stats['price_changes']} cambios de precio)")
+        print(f"   = Sin cambios: {stats['unchanged']}")
+        if stats['missing_url'] or stats['duplicates']:
+            print(f"   ⚠️  Sin product_url: {stats['missing_url']}, URLs repetidas: {stats['duplicates']}")
+        if output:
+            print(f"✓ Cambios escritos en {output}")
+        return True
+
+
+class PricesCommand:
+    """Consultas al historial de precios (build/price_history.sqlite3, ver price_history.py)"""
+
+    def __init__(self, build_dir=None):
+        self.build_dir = build_dir or find_build_dir() or 'build'
+        self.path = history_path(self.build_dir)
+
+    @staticmethod
+    def _since(days):
+        return int(time.time() - days * 24 * 60 * 60) if days else None
+
+    @staticmethod
+    def _date(epoch):
+        return datetime.fromtimestamp(epoch).strftime('%Y-%m-%d %H:%M') if epoch else '-'
+
+    @staticmethod
+    def _price(value):
+        return f"{value:,.2f}" if value is not None else '-'
+
+    def history_command(self, product_url, days=None):
+        start_time = time.monotonic()
+        with PriceHistory(self.path) as history:
+            rows = history.history(product_url, self._since(days))
+        elapsed_ms = (time.monotonic() - start_time) * 1000
+        if not rows:
+            print(f"✗ No hay historial para {product_url}")
+            return False
+        print(f"📈 {product_url} ({rows[0]['source']})")
+        print(f"{'FECHA':<17} {'PRECIO':>14} {'DESC %':>7}  STOCK")
+        for row in rows:
+            discount = f"{row['discount_percent']:.0f}" if row['discount_percent'] is not None else '-'
+            print(f"{self._date(row['observed_at']):<17} {self._price(row['price']):>14} {discount:>7}  {row['stock'] or ''}")
+        print(f"📊 {len(rows)} cambios ({elapsed_ms:.1f} ms)")
+        return True
+
+    def stores_command(self, sources=None, days=7):
+        start_time = time.monotonic()
+        with PriceHistory(self.path) as history:
+            rows = history.store_summary(sources, self._since(days))
+        elapsed_ms = (time.monotonic() - start_time) * 1000
+        if not rows:
+            print("✗ No hay tiendas en el historial de precios")
+            return False
+        print(f"{'TIENDA':<16} {'PRODUCTOS':>9} {'C/PRECIO':>8} {'MÍNIMO':>14} {'PROMEDIO':>14} {'MÁXIMO':>14} "
+              f"{'DESC %':>6} {'CAMBIOS':>7}  ÚLTIMA CORRIDA")
+        for row in rows:
+            discount = f"{row['avg_discount']:.1f}" if row['avg_discount'] is not None else '-'
+            print(f"{row['source']:<16} {row['products']:>9} {row['priced']:>8} {self._price(row['min_price']):>14} "
+                  f"{self._price(row['avg_price']):>14} {self._price(row['max_price']):>14} {discount:>6} "
+                  f"{row['changed_since']:>7}  {self._date(row['last_seen'])}")
+        print(f"📊 {len(rows)} tiendas, cambios en los últimos {days} días ({elapsed_ms:.1f} ms)")
+        return True
+
+    def backfill_command(self, sources=None, since=None, until=None):
+        """Importa al historial los feeds de corridas anteriores (en orden cronológico)"""
+        with RunCatalog(self.build_dir) as catalog:
+            runs = catalog.find_runs(sources=sources, since=since, until=until)
+        if not runs:
+            print("✗ No hay corridas que coincidan con el filtro (¿falta 'python command.py runs sync'?)")
+            return False
+        runs.sort(key=lambda run: run.timestamp)
+        imported = 0
+        with PriceHistory(self.path) as history:
+            for run in runs:
+                if history.is_imported(run.source, run.timestamp):
+                    continue
+                try:
+                    with open_feed(run) as feed:
+                        rows = [observation_row(item) for item in iter_feed(feed)
+                                if item.get('item_type', 'product') == 'product']
+                except (OSError, ValueError) as e:
+                    print(f"✗ {run.source} {run.timestamp}: {e}")
+                    continue
+                summary = history.record(run.source, run_epoch(run.timestamp), rows)
+                history.mark_imported(run.source, run.timestamp)
+                imported += 1
+                stale = f", {summary['stale']} más viejas que el historial" if summary['stale'] else ''
+                print(f"✓ {run.source} {run.timestamp}: {summary['changed']} cambios, "
+                      f"{summary['unchanged']} sin cambios{stale}")
+        print(f"📊 {imported} corridas importadas en {self.path}")
+        return True
+
+
+class MatchesCommand:
+    """Consultas al índice de matching entre tiendas (build/matching.sqlite3, ver matching.py)"""
+
+    def __init__(self, build_dir=None):
+        self.build_dir = build_dir or find_build_dir() or 'build'
+        self.path = matching_path(self.build_dir)
+
+    @staticmethod
+    def _price(value):
+        return f"{value:,.2f}" if value is not None else '-'
+
+    def list_command(self, min_stores=2, source=None, limit=50):
+        with MatchIndex(self.path) as index:
+            rows = index.clusters(min_stores, source, limit)
+            stats = index.stats()
+        if not rows:
+            print(f"✗ No hay clusters con productos de {min_stores} o más tiendas")
+            return False
+        print(f"{'MATCH_ID':>9} {'TIENDAS':>7} {'PRODUCTOS':>9} {'MÍNIMO':>14} {'MÁXIMO':>14}  NOMBRE")
+        for row in rows:
+            print(f"{row['cluster_id']:>9} {row['stores']:>7} {row['products']:>9} {self._price(row['min_price']):>14} "
+                  f"{self._price(row['max_price']):>14}  {row['name'] or ''}")
+        print(f"📊 {stats['products']} productos en {stats['clusters']} clusters ({len(rows)} mostrados)")
+        return True
+
+    def show_command(self, product_url):
+        with MatchIndex(self.path) as index:
+            cluster_id = index.cluster_of(product_url)
+            rows = index.cluster(cluster_id) if cluster_id is not None else []
+        if not rows:
+            print(f"✗ {product_url} no está en el índice de matching")
+            return False
+        print(f"🔗 match_id {cluster_id}: {len(rows)} productos en {len({row['source'] for row in rows})} tiendas")
+        for row in rows:
+            print(f"   {row['source']:<16} {self._price(row['price']):>14}  {row['name'] or ''}")
+            print(f"   {'':<16} {'':>14}  {row['product_url']}")
+        return True
+
+    def index_command(self, sources=None, since=None, until=None, latest=False):
+        """Indexa los productos de corridas anteriores (en orden cronológico)"""
+        with RunCatalog(self.build_dir) as catalog:
+            runs = catalog.find_runs(sources=sources, since=since, until=until, latest=latest)
+        if not runs:
+            print("✗ No hay corridas que coincidan con el filtro (¿falta 'python command.py runs sync'?)")
+            return False
+        runs.sort(key=lambda run: run.timestamp)
+        start_time = time.monotonic()
+        indexed = 0
+        with MatchIndex(self.path) as index:
+            for run in runs:
+                count = 0
+                try:
+                    with open_feed(run) as feed:
+                        for item in iter_feed(feed):
+                            if item.get('item_type', 'product') == 'product' and index.add(run.source, item) is not None:
+                                count += 1
+                except (OSError, ValueError) as e:
+                    print(f"✗ {run.source} {run.timestamp}: {e}")
+                    continue
+                index.commit()
+                indexed += count
+                print(f"✓ {run.source} {run.timestamp}: {count} productos")
+            stats = index.stats()
+        elapsed = time.monotonic() - start_time
+        print(f"📊 {indexed} productos indexados en {elapsed:.1f}s; "
+              f"{stats['products']} productos en {stats['clusters']} clusters")
+        return True
+
+
+class CacheCompactCommand:
+    """Comando para limpiar y compactar la cache HTTP en SQLite"""
+
+    def compact_command(self, spider=None):
+        os.environ.setdefault('SCRAPY_SETTINGS_MODULE', 'motorciclye.settings')
+        from scrapy.utils.project import data_path, get_project_settings
+
+        settings = get_project_settings()
+        try:
+            cachedir = Path(data_path(settings['HTTPCACHE_DIR']))
+        except Exception as e:
+            print(f"✗ No se pudo resolver el directorio de cache: {e}")
+            return False
+
+        pattern = f"{spider}.sqlite3" if spider else "*.sqlite3"
+        db_files = sorted(cachedir.glob(pattern))
+        if not db_files:
+            print(f"✗ No hay caches para compactar en {cachedir}/{pattern}")
+            return False
+
+        from scrapy.spiderloader import SpiderLoader
+        spider_loader = SpiderLoader.from_settings(settings)
+
+        print(f"🧹 Compactando {len(db_files)} cache(s) en {cachedir}")
+        print("-" * 60)
+        for db_file in db_files:
+            # La cache de cada spider se llama <spider>.sqlite3; sus TTL pueden diferir del proyecto
+            try:
+                spider_ttls = getattr(spider_loader.load(db_file.stem), 'HTTPCACHE_TTLS', None)
+            except KeyError:
+                spider_ttls = None
+            summary = compact_cache(
+                str(db_file),
+                expiration_secs=cache_expiration_secs(settings, spider_ttls),
+                max_bytes=settings.getint('HTTPCACHE_SQLITE_MAX_BYTES', 0),
+            )
+            before_mb = summary['file_bytes_before'] / 1024 / 1024
+            after_mb = summary['file_bytes_after'] / 1024 / 1024
+            print(f"✓ {db_file.name}: {summary['entries']} entradas, "
+                  f"{summary['expired']} expiradas eliminadas, {before_mb:.1f} MB → {after_mb:.1f} MB")
+        return True
+
+
+class OutboxDrainCommand:
+    """Comando para publicar los mensajes que quedaron pendientes en el outbox"""
+
+    def drain_command(self, spider=None):
+        cfg = outbox_config()
+        outbox_dir = Path(cfg.get('dir', 'build/outbox'))
+        pattern = f"{spider}.sqlite3" if spider else "*.sqlite3"
+        db_files = sorted(outbox_dir.glob(pattern))
+        if not db_files:
+            print(f"✗ No hay outbox en {outbox_dir}/{pattern}")
+            return False
+
+        ok = True
+        for db_file in db_files:
+            outbox = Outbox(str(db_file))
+            pending = outbox.pending()
+            if not pending:
+                print(f"✓ {db_file.name}: sin mensajes pendientes")
+                continue
+            print(f"🚀 {db_file.name}: publicando {pending} mensajes pendientes...")
+            publisher = OutboxPublisher(outbox, batch_size=cfg.get('batch_size', 100))
+            start_time = datetime.now()
+            # Un pase: se ignoran los tiempos de backoff de la corrida anterior
+            outbox.reset_backoff()
+            while publisher.publish_due():
+                pass
+            publisher.disconnect()
+            elapsed = (datetime.now() - start_time).total_seconds()
+            remaining = outbox.pending()
+            print(f"   • Publicados: {publisher.published} en {elapsed:.1f}s")
+            if remaining:
+                ok = False
+                print(f"   ✗ Quedan {remaining} pendientes ({publisher.failed_attempts} intentos fallidos)")
+            outbox.close()
+        return ok
+
+
 def show_help():
     """Mostrar ayuda del comando"""
     print("🤖 Comando para reenviar datos a RabbitMQ")
     print("")
     print("USAGE:")
     print("   python command.py resend <source> <timestamp>")
+    print("   python command.py resend-bulk [--sources GLOB ...] [--since FECHA] [--until FECHA] [--latest] [--workers N]")
+    print("   python command.py runs list [--sources GLOB ...] [--since FECHA] [--until FECHA] [--latest]")
+    print("   python command.py runs sync")
+    print("   python command.py runs retention [--archive-after-days N] [--max-total-mb N] [--dry-run]")
+    print("   python command.py diff <feed_viejo> <feed_nuevo> [--fields CAMPO ...] [-o salida.jsonl]")
+    print("   python command.py diff --source <spider> [--fields CAMPO ...] [-o salida.jsonl]")
+    print("   python command.py prices history <product_url> [--days N]")
+    print("   python command.py prices stores [--sources SPIDER ...] [--days N]")
+    print("   python command.py prices backfill [--sources GLOB ...] [--since FECHA] [--until FECHA]")
+    print("   python command.py matches list [--min-stores N] [--source SPIDER] [--limit N]")
+    print("   python command.py matches show <product_url>")
+    print("   python command.py matches index [--sources GLOB ...] [--since FECHA] [--until FECHA] [--latest]")
+    print("   python command.py cache-compact [spider]")
+    print("   python command.py outbox-drain [spider]")
     print("")
     print("ARGUMENTOS:")
     print("   source     - Nombre del spider/fuente (ej: motodelta)")
@@ -188,11 +694,34 @@ def show_help():
     print("")
     print("EJEMPLO:")
     print("   python command.py resend motodelta 20250625131936")
+    print("   python command.py resend-bulk --since 20250625 --until 20250625 --workers 16")
+    print("   python command.py resend-bulk --sources 'moto*' --latest")
     print("")
     print("DESCRIPCIÓN:")
     print("   Este comando lee el archivo build/<source>/<timestamp>/<source>.json")
     print("   y publica cada elemento en RabbitMQ usando la misma lógica que")
     print("   el pipeline de productos.")
+    print("")
+    print("   resend-bulk reenvía en paralelo todas las corridas que coinciden con")
+    print("   los filtros (globs de fuente, rango de fechas, última corrida por fuente).")
+    print("")
+    print("   runs consulta el catálogo de corridas; sync importa corridas viejas de build/")
+    print("   y retention archiva/elimina corridas según config.yml (runs.retention).")
+    print("")
+    print("   diff compara dos feeds (rutas JSON/JSONL o <spider>@<run_id>) en streaming y")
+    print("   lista productos nuevos, eliminados y modificados; --source usa las últimas dos corridas.")
+    print("")
+    print("   prices consulta el historial de precios (cambios de un producto y agregados")
+    print("   por tienda); backfill importa los feeds de corridas anteriores.")
+    print("")
+    print("   matches lista los productos agrupados entre tiendas (match_id); index")
+    print("   agrega al índice los productos de corridas anteriores.")
+    print("")
+    print("   cache-compact elimina las respuestas expiradas de la cache HTTP,")
+    print("   aplica el límite de tamaño y compacta los archivos SQLite.")
+    print("")
+    print("   outbox-drain publica los mensajes que quedaron en el outbox")
+    print("   (por ejemplo si RabbitMQ no estaba disponible durante la corrida).")
 
 
 def main():
@@ -238,12 +767,153 @@ def main():
             print("❌ Resend falló")
             sys.exit(1)
     
+    elif command == "resend-bulk":
+        parser = argparse.ArgumentParser(prog='command.py resend-bulk', description='Reenvío masivo de corridas')
+        parser.add_argument('--sources', nargs='+', help="Globs de fuentes (ej: 'moto*' fasmotos)")
+        parser.add_argument('--since', help='Desde (YYYYMMDD[HH[MM[SS]]])')
+        parser.add_argument('--until', help='Hasta, inclusive (YYYYMMDD[HH[MM[SS]]])')
+        parser.add_argument('--latest', action='store_true', help='Solo la última corrida de cada fuente')
+        parser.add_argument('--workers', type=int, default=8, help='Feeds publicados en paralelo')
+        parser.add_argument('--build-dir', help='Directorio build (por defecto build/ o motorciclye/build/)')
+        parser.add_argument('--dry-run', action='store_true', help='Solo listar las corridas seleccionadas')
+        args = parser.parse_args(sys.argv[2:])
+
+        success = BulkResendCommand(workers=max(1, args.workers)).resend_bulk_command(
+            sources=args.sources, since=args.since, until=args.until, latest=args.latest,
+            build_dir=args.build_dir, dry_run=args.dry_run,
+        )
+        sys.exit(0 if success else 1)
+
+    elif command == "runs":
+        parser = argparse.ArgumentParser(prog='command.py runs', description='Catálogo de corridas')
+        parser.add_argument('action', choices=['list', 'sync', 'retention'])
+        parser.add_argument('--sources', nargs='+', help="Globs de fuentes (ej: 'moto*')")
+        parser.add_argument('--since', help='Desde (YYYYMMDD[HH[MM[SS]]])')
+        parser.add_argument('--until', help='Hasta, inclusive (YYYYMMDD[HH[MM[SS]]])')
+        parser.add_argument('--latest', action='store_true', help='Solo la última corrida de cada fuente')
+        parser.add_argument('--all', action='store_true', help='Incluir corridas eliminadas por retención')
+        parser.add_argument('--archive-after-days', type=float, help='Archivar corridas más viejas que N días')
+        parser.add_argument('--max-total-mb', type=float, help='Presupuesto total de build/ en MB')
+        parser.add_argument('--dry-run', action='store_true', help='Mostrar qué haría la retención sin aplicarla')
+        parser.add_argument('--build-dir', help='Directorio build (por defecto build/ o motorciclye/build/)')
+        args = parser.parse_args(sys.argv[2:])
+
+        runs_cmd = RunsCommand(args.build_dir)
+        try:
+            if args.action == 'list':
+                success = runs_cmd.list_command(args.sources, args.since, args.until, args.latest, args.all)
+            elif args.action == 'sync':
+                success = runs_cmd.sync_command()
+            else:
+                success = runs_cmd.retention_command(args.archive_after_days, args.max_total_mb, args.dry_run)
+        except ValueError as e:
+            print(f"✗ {e}")
+            success = False
+        sys.exit(0 if success else 1)
+
+    elif command == "diff":
+        parser = argparse.ArgumentParser(prog='command.py diff', description='Diff entre dos corridas')
+        parser.add_argument('feeds', nargs='*', help='Feed viejo y nuevo (ruta o <spider>@<run_id>)')
+        parser.add_argument('--source', help='Comparar las últimas dos corridas de este spider')
+        parser.add_argument('--fields', nargs='+', help='Comparar solo estos campos (ej: price stock)')
+        parser.add_argument('-o', '--output', help='Escribir todos los cambios en este archivo JSON Lines')
+        parser.add_argument('--buckets', type=int, help='Cantidad de buckets en disco (por defecto según el tamaño)')
+        parser.add_argument('--limit', type=int, default=20, help='Cambios a mostrar en pantalla')
+        parser.add_argument('--build-dir', help='Directorio build (por defecto build/ o motorciclye/build/)')
+        args = parser.parse_args(sys.argv[2:])
+
+        diff_cmd = DiffCommand(args.build_dir)
+        try:
+            if args.source:
+                old, new = diff_cmd.latest_pair(args.source)
+            elif len(args.feeds) == 2:
+                old, new = args.feeds
+            else:
+                parser.error('indicar dos feeds o --source <spider>')
+            success = diff_cmd.diff_command(old, new, args.fields, args.output, args.buckets, args.limit)
+        except (ValueError, OSError) as e:
+            print(f"✗ {e}")
+            success = False
+        sys.exit(0 if success else 1)
+
+    elif command == "prices":
+        parser = argparse.ArgumentParser(prog='command.py prices', description='Historial de precios')
+        parser.add_argument('action', choices=['history', 'stores', 'backfill'])
+        parser.add_argument('product_url', nargs='?', help='URL del producto (para history)')
+        parser.add_argument('--days', type=float, help='Solo los últimos N días')
+        parser.add_argument('--sources', nargs='+', help='Tiendas (stores) o globs de fuentes (backfill)')
+        parser.add_argument('--since', help='Desde (YYYYMMDD[HH[MM[SS]]], backfill)')
+        parser.add_argument('--until', help='Hasta, inclusive (YYYYMMDD[HH[MM[SS]]], backfill)')
+        parser.add_argument('--build-dir', help='Directorio build (por defecto build/ o motorciclye/build/)')
+        args = parser.parse_args(sys.argv[2:])
+
+        prices_cmd = PricesCommand(args.build_dir)
+        try:
+            if args.action == 'history':
+                if not args.product_url:
+                    parser.error('history requiere la URL del producto')
+                success = prices_cmd.history_command(args.product_url, args.days)
+            elif args.action == 'stores':
+                success = prices_cmd.stores_command(args.sources, args.days if args.days is not None else 7)
+            else:
+                success = prices_cmd.backfill_command(args.sources, args.since, args.until)
+        except ValueError as e:
+            print(f"✗ {e}")
+            success = False
+        sys.exit(0 if success else 1)
+
+    elif command == "matches":
+        parser = argparse.ArgumentParser(prog='command.py matches', description='Matching de productos entre tiendas')
+        parser.add_argument('action', choices=['list', 'show', 'index'])
+        parser.add_argument('product_url', nargs='?', help='URL del producto (para show)')
+        parser.add_argument('--min-stores', type=int, default=2, help='Clusters con al menos N tiendas')
+        parser.add_argument('--source', help='Solo clusters que incluyen esta tienda')
+        parser.add_argument('--limit', type=int, default=50, help='Clusters a mostrar')
+        parser.add_argument('--sources', nargs='+', help="Globs de fuentes a indexar (ej: 'moto*')")
+        parser.add_argument('--since', help='Desde (YYYYMMDD[HH[MM[SS]]])')
+        parser.add_argument('--until', help='Hasta, inclusive (YYYYMMDD[HH[MM[SS]]])')
+        parser.add_argument('--latest', action='store_true', help='Solo la última corrida de cada fuente')
+        parser.add_argument('--build-dir', help='Directorio build (por defecto build/ o motorciclye/build/)')
+        args = parser.parse_args(sys.argv[2:])
+
+        matches_cmd = MatchesCommand(args.build_dir)
+        try:
+            if args.action == 'list':
+                success = matches_cmd.list_command(args.min_stores, args.source, args.limit)
+            elif args.action == 'show':
+                if not args.product_url:
+                    parser.error('show requiere la URL del producto')
+                success = matches_cmd.show_command(args.product_url)
+            else:
+                success = matches_cmd.index_command(args.sources, args.since, args.until, args.latest)
+        except ValueError as e:
+            print(f"✗ {e}")
+            success = False
+        sys.exit(0 if success else 1)
+
+    elif command == "cache-compact":
+        spider = sys.argv[2] if len(sys.argv) > 2 else None
+        success = CacheCompactCommand().compact_command(spider)
+        sys.exit(0 if success else 1)
+
+    elif command == "outbox-drain":
+        spider = sys.argv[2] if len(sys.argv) > 2 else None
+        success = OutboxDrainCommand().drain_command(spider)
+        sys.exit(0 if success else 1)
+
     else:
         print(f"✗ Comando desconocido: '{command}'")
         print("")
         print("Comandos disponibles:")
-        print("   resend - Reenviar datos desde archivo JSON a RabbitMQ")
-        print("   help   - Mostrar esta ayuda")
+        print("   resend        - Reenviar datos desde archivo JSON a RabbitMQ")
+        print("   resend-bulk   - Reenviar en paralelo muchas corridas")
+        print("   runs          - Listar, sincronizar y aplicar retención al catálogo de corridas")
+        print("   diff          - Comparar dos corridas (nuevos, eliminados, modificados)")
+        print("   prices        - Historial de precios por producto y por tienda")
+        print("   matches       - Productos agrupados entre tiendas (match_id)")
+        print("   cache-compact - Limpiar y compactar la cache HTTP")
+        print("   outbox-drain  - Publicar mensajes pendientes del outbox")
+        print("   help          - Mostrar esta ayuda")
         sys.exit(1)
 
 
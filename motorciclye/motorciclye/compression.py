@@ -0,0 +1,53 @@
+"""
+Helpers de compresión compartidos (cache HTTP, mensajes a RabbitMQ, archivos).
+
+Usa zstd si está instalado `zstandard` y zlib como alternativa. Cada dato
+comprimido se guarda junto con el nombre del codec usado para poder leerlo
+aunque cambie la configuración.
+
+Instalar dependencias:
+pip install zstandard
+"""
+
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - dependencia opcional
+    zstandard = None
+
+CODECS = ('zstd', 'zlib', 'none')
+ZSTD_LEVEL = 3
+ZLIB_LEVEL = 6
+
+
+def resolve_codec(codec: str = None) -> str:
+    """Devuelve el codec a usar, degradando zstd a zlib si no está disponible"""
+    codec = (codec or 'zstd').lower()
+    if codec not in CODECS:
+        raise ValueError(f"Codec de compresión desconocido: {codec}")
+    if codec == 'zstd' and zstandard is None:
+        return 'zlib'
+    return codec
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    if codec == 'zlib':
+        return zlib.compress(data, ZLIB_LEVEL)
+    if codec == 'none':
+        return data
+    raise ValueError(f"Codec de compresión desconocido: {codec}")
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Se requiere 'zstandard' para leer datos comprimidos con zstd")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == 'zlib':
+        return zlib.decompress(data)
+    if codec == 'none':
+        return data
+    raise ValueError(f"Codec de compresión desconocido: {codec}")
@@ -0,0 +1,143 @@
+"""
+Exporter de feeds en Parquet (columnar) para análisis.
+
+Escribe los productos con un esquema explícito (PRODUCT_SCHEMA): los campos
+anidados quedan tipados (`attrs` como map<string, string>, `images` y
+`payments` como listas, `installments` como lista de structs) y los strings
+repetidos (menú, categoría, marca) con dictionary encoding. Las filas se
+acumulan por columna y se escriben como row group cada `row_group_size`
+productos, así la memoria no crece con la corrida y pandas/polars/duckdb
+pueden leer solo las columnas que necesitan:
+
+    pd.read_parquet('build/motodelta/<ts>/motodelta.parquet', columns=['product_url', 'price'])
+
+Solo se exportan productos; el resto de los items (fuentes, etc.) sigue
+estando en el feed JSON. Se habilita en config.yml (`feeds.extra_formats`)
+y BaseSpider.init_crawler lo agrega a FEEDS junto al JSON.
+
+Instalar dependencia:
+pip install pyarrow
+"""
+
+from itemadapter import ItemAdapter
+from scrapy.exporters import BaseItemExporter
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - dependencia opcional
+    pa = None
+    pq = None
+
+DEFAULT_ROW_GROUP_SIZE = 10000
+DEFAULT_COMPRESSION = 'zstd'
+
+
+def parquet_available() -> bool:
+    return pa is not None
+
+
+def _product_schema():
+    string = pa.string()
+    return pa.schema([
+        pa.field('item_type', pa.dictionary(pa.int8(), string)),
+        pa.field('menu_name', pa.dictionary(pa.int32(), string)),
+        pa.field('menu_url', pa.dictionary(pa.int32(), string)),
+        pa.field('product_url', string, nullable=False),
+        pa.field('name', string),
+        pa.field('price', pa.float64()),
+        pa.field('brand', pa.dictionary(pa.int32(), string)),
+        pa.field('attrs', pa.map_(string, string)),
+        pa.field('payments', pa.list_(string)),
+        pa.field('discount_text', pa.dictionary(pa.int32(), string)),
+        pa.field('images', pa.list_(string)),
+        pa.field('description', string),
+        pa.field('category_name', pa.dictionary(pa.int32(), string)),
+        pa.field('category_url', pa.dictionary(pa.int32(), string)),
+        pa.field('source', pa.bool_()),
+        pa.field('discount_percent', pa.float64()),
+        pa.field('installments', pa.list_(pa.struct([
+            pa.field('count', pa.int32()),
+            pa.field('amount', pa.float64()),
+            pa.field('interest_free', pa.bool_()),
+        ]))),
+        pa.field('stock', pa.dictionary(pa.int32(), string)),
+        pa.field('match_id', pa.int64()),
+        pa.field('image_keys', pa.list_(string)),
+    ])
+
+
+PRODUCT_SCHEMA = _product_schema() if pa is not None else None
+
+
+def _attrs_to_pairs(attrs):
+    """attrs dict -> pares clave/valor; las listas de atributos sueltos quedan como claves sin valor"""
+    if attrs is None:
+        return None
+    if isinstance(attrs, dict):
+        return [(str(key), None if value is None else str(value)) for key, value in attrs.items()]
+    return [(str(value), None) for value in attrs]
+
+
+# Conversión por columna de valores del item a valores del esquema
+_CONVERTERS = {
+    'price': lambda value: None if value is None else float(value),
+    'discount_percent': lambda value: None if value is None else float(value),
+    'attrs': _attrs_to_pairs,
+    'source': lambda value: bool(value) if value is not None else None,
+}
+
+
+class ParquetItemExporter(BaseItemExporter):
+    """
+    Exporter de Scrapy que escribe productos en Parquet por row groups.
+
+    FEED_EXPORTERS = {"parquet": "motorciclye.exporters.ParquetItemExporter"}
+    FEEDS = {"out.parquet": {"format": "parquet", "item_export_kwargs": {"row_group_size": 10000}}}
+    """
+
+    def __init__(self, file, *, row_group_size=DEFAULT_ROW_GROUP_SIZE, compression=DEFAULT_COMPRESSION, **kwargs):
+        if pa is None:
+            raise RuntimeError("El exporter parquet requiere pyarrow (pip install pyarrow)")
+        super().__init__(dont_fail=True, **kwargs)
+        self.file = file
+        self.schema = PRODUCT_SCHEMA
+        self.row_group_size = max(1, int(row_group_size))
+        self.compression = compression
+        self.writer = None
+        self.rows_written = 0
+        self.row_groups = 0
+        self.skipped = 0
+        self._columns = {name: [] for name in self.schema.names}
+        self._buffered = 0
+
+    def start_exporting(self):
+        self.writer = pq.ParquetWriter(self.file, self.schema, compression=self.compression)
+
+    def export_item(self, item):
+        adapter = ItemAdapter(item)
+        if adapter.get('item_type', 'product') != 'product' or not adapter.get('product_url'):
+            self.skipped += 1
+            return
+        for name, column in self._columns.items():
+            value = adapter.get(name)
+            converter = _CONVERTERS.get(name)
+            column.append(converter(value) if converter else value)
+        self._buffered += 1
+        if self._buffered >= self.row_group_size:
+            self._flush()
+
+    def finish_exporting(self):
+        self._flush()
+        self.writer.close()
+
+    def _flush(self):
+        """Escribe lo acumulado como un row group"""
+        if not self._buffered:
+            return
+        table = pa.Table.from_pydict(self._columns, schema=self.schema)
+        self.writer.write_table(table, row_group_size=self._buffered)
+        self.rows_written += self._buffered
+        self.row_groups += 1
+        self._columns = {name: [] for name in self.schema.names}
+        self._buffered = 0
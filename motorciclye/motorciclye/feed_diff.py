@@ -0,0 +1,254 @@
+"""
+Diff entre dos corridas de un spider (feeds JSON o JSON Lines).
+
+Responde "qué cambió desde ayer" por tienda: productos nuevos, eliminados y
+modificados (precio, stock, nombre...) sin cargar ningún feed en memoria.
+
+1. Los dos feeds se leen en streaming (array JSON del JsonItemExporter o una
+   línea JSON por producto) y cada producto se indexa por su `product_url`
+   canónica (w3lib.canonicalize_url: sin fragmento, query ordenada).
+2. Cada lado se particiona en N buckets en disco según el hash de la URL,
+   guardando la URL, un hash del contenido y el producto serializado.
+3. Por cada bucket se carga el lado viejo en un dict (solo ese bucket) y se
+   recorre el nuevo: hash distinto -> `changed` con los campos modificados,
+   URL ausente -> `added`, lo que queda del viejo -> `removed`.
+
+La memoria máxima es la de un bucket de cada lado (`bucket_mb`, 64 MB por
+defecto), así que feeds de varios GB se comparan en una máquina modesta. Con
+URLs repetidas dentro de un mismo feed gana el último producto.
+
+Uso:
+    python command.py diff build/motodelta/20250624.../motodelta.json build/motodelta/20250625.../motodelta.json
+    python command.py diff --source motodelta          # últimas dos corridas del catálogo
+    python command.py diff motodelta@20250624131936 motodelta@20250625131936 --fields price stock -o cambios.jsonl
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import zlib
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional
+
+from w3lib.url import canonicalize_url
+
+CHANGE_ADDED = 'added'
+CHANGE_REMOVED = 'removed'
+CHANGE_CHANGED = 'changed'
+
+DEFAULT_BUCKET_MB = 64
+DEFAULT_BUCKETS = 64  # Si no se conoce el tamaño de los feeds (ej: leídos de un .tar.gz)
+MAX_BUCKETS = 512
+READ_CHUNK = 1 << 20
+MAX_ITEM_CHARS = 64 << 20  # Un producto nunca ocupa esto: si el buffer llega acá el feed está corrupto
+
+
+_URL_SPECIAL_CHARS = frozenset('?#% "<>\\^`{|}')
+
+
+def canonical_product_url(url: str) -> str:
+    url = url.strip()
+    # Camino rápido: URL ASCII sin query, fragmento ni escapes con esquema y host en minúsculas
+    # (canonicalize_url la devolvería igual y es lo más caro del diff)
+    if url.isascii() and _URL_SPECIAL_CHARS.isdisjoint(url):
+        host_end = url.find('/', url.find('//') + 2)
+        if host_end > 0 and url[:host_end].islower():
+            return url
+    return canonicalize_url(url)
+
+
+def iter_feed(stream, chunk_size: int = READ_CHUNK) -> Iterator[dict]:
+    """
+    Productos de un feed leído en streaming desde un stream binario o de texto.
+    Acepta un array JSON (`[{...},\\n{...}]`) o JSON Lines / objetos concatenados.
+    """
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8')
+    decoder = json.JSONDecoder()
+    buf = stream.read(chunk_size)
+    eof = not buf
+    pos = 0
+    array = None
+
+    while True:
+        # Saltear espacios (y las comas entre elementos del array)
+        length = len(buf)
+        while pos < length and (buf[pos].isspace() or (array and buf[pos] == ',')):
+            pos += 1
+        if pos == length:
+            if eof:
+                break
+            buf, pos = stream.read(chunk_size), 0
+            eof = not buf
+            continue
+        if array is None:
+            array = buf[pos] == '['
+            if array:
+                pos += 1
+            continue
+        if array and buf[pos] == ']':
+            break
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof or len(buf) - pos > MAX_ITEM_CHARS:
+                raise
+            # Objeto cortado al final del buffer: leer más y reintentar
+            more = stream.read(chunk_size)
+            eof = not more
+            buf, pos = buf[pos:] + more, 0
+            continue
+        if isinstance(obj, dict):
+            yield obj
+        pos = end
+        if pos > chunk_size:
+            buf, pos = buf[pos:], 0
+
+
+@contextmanager
+def open_feed_path(path: str):
+    """Stream binario de un feed en disco (.json, .jsonl o comprimido .gz)"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        yield f
+
+
+def _dumps(data) -> str:
+    return json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _digest(raw: str) -> str:
+    return hashlib.blake2b(raw.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def changed_fields(old: dict, new: dict, fields: Optional[List[str]] = None) -> dict:
+    """{campo: [viejo, nuevo]} de los campos que cambiaron (la URL es la clave, no se compara)"""
+    names = fields or sorted((old.keys() | new.keys()) - {'product_url'})
+    return {name: [old.get(name), new.get(name)] for name in names if old.get(name) != new.get(name)}
+
+
+def _load(row: tuple) -> dict:
+    url, raw = row
+    product = json.loads(raw)
+    product['product_url'] = json.loads(url)
+    return product
+
+
+class FeedDiff:
+    """
+    Compara dos feeds con un hash join particionado en disco.
+
+    old/new son context managers que devuelven un stream binario (ver
+    open_feed_path y run_catalog.open_feed). `records()` es un generador de
+    cambios; `stats` tiene los totales cuando termina de recorrerse.
+    """
+
+    def __init__(self, old, new, fields: Optional[List[str]] = None, buckets: Optional[int] = None,
+                 size_hint: Optional[int] = None, bucket_mb: float = DEFAULT_BUCKET_MB, tmp_dir: Optional[str] = None):
+        self.old = old
+        self.new = new
+        self.fields = list(fields) if fields else None
+        if buckets is None:
+            buckets = DEFAULT_BUCKETS if size_hint is None else -(-size_hint // int(bucket_mb * 1024 * 1024))
+        self.buckets = max(1, min(MAX_BUCKETS, buckets))
+        self.tmp_dir = tmp_dir
+        self.stats = {
+            'old_items': 0, 'new_items': 0,
+            CHANGE_ADDED: 0, CHANGE_REMOVED: 0, CHANGE_CHANGED: 0, 'unchanged': 0,
+            'price_changes': 0, 'missing_url': 0, 'duplicates': 0,
+        }
+
+    def _bucket_of(self, key: str) -> int:
+        return zlib.crc32(key.encode('utf-8')) % self.buckets
+
+    def _partition(self, source, directory: str, side: str) -> int:
+        """Escribe cada producto en su bucket: clave\\thash\\tURL\\tJSON. Devuelve cuántos leyó"""
+        files = [
+            open(os.path.join(directory, f'{side}-{i:03d}.tsv'), 'w', encoding='utf-8', newline='\n')
+            for i in range(self.buckets)
+        ]
+        count = 0
+        fields = self.fields
+        try:
+            with source as stream:
+                for product in iter_feed(stream):
+                    url = product.pop('product_url', None)
+                    if not url:
+                        self.stats['missing_url'] += 1
+                        continue
+                    key = canonical_product_url(url)
+                    # Se serializa una sola vez (sin la URL, que es la clave) y se hashea eso
+                    raw = _dumps(product)
+                    digest = _digest(raw if fields is None else _dumps([product.get(name) for name in fields]))
+                    files[self._bucket_of(key)].write(f'{key}\t{digest}\t{json.dumps(url)}\t{raw}\n')
+                    count += 1
+        finally:
+            for f in files:
+                f.close()
+        return count
+
+    @staticmethod
+    def _read_bucket(path: str) -> Iterator[tuple]:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                key, digest, url, raw = line.rstrip('\n').split('\t', 3)
+                yield key, digest, (url, raw)
+
+    def records(self) -> Iterator[dict]:
+        directory = tempfile.mkdtemp(prefix='feed-diff-', dir=self.tmp_dir)
+        try:
+            self.stats['old_items'] = self._partition(self.old, directory, 'old')
+            self.stats['new_items'] = self._partition(self.new, directory, 'new')
+            for i in range(self.buckets):
+                yield from self._join_bucket(
+                    os.path.join(directory, f'old-{i:03d}.tsv'),
+                    os.path.join(directory, f'new-{i:03d}.tsv'),
+                )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def _join_bucket(self, old_path: str, new_path: str) -> Iterator[dict]:
+        old_rows = {}
+        for key, digest, row in self._read_bucket(old_path):
+            if key in old_rows:
+                self.stats['duplicates'] += 1
+            old_rows[key] = (digest, row)
+
+        new_rows = {}
+        for key, digest, row in self._read_bucket(new_path):
+            if key in new_rows:
+                self.stats['duplicates'] += 1
+            new_rows[key] = (digest, row)
+
+        for key, (digest, row) in new_rows.items():
+            previous = old_rows.pop(key, None)
+            if previous is None:
+                self.stats[CHANGE_ADDED] += 1
+                yield {'change': CHANGE_ADDED, 'product_url': key, 'product': _load(row)}
+            elif previous[0] != digest:
+                old_product, new_product = _load(previous[1]), _load(row)
+                fields = changed_fields(old_product, new_product, self.fields)
+                if not fields:  # Solo difieren en tipos equivalentes (ej: 10 vs 10.0)
+                    self.stats['unchanged'] += 1
+                    continue
+                self.stats[CHANGE_CHANGED] += 1
+                if 'price' in fields:
+                    self.stats['price_changes'] += 1
+                yield {'change': CHANGE_CHANGED, 'product_url': key, 'fields': fields, 'product': new_product}
+            else:
+                self.stats['unchanged'] += 1
+
+        for key, (digest, row) in old_rows.items():
+            self.stats[CHANGE_REMOVED] += 1
+            yield {'change': CHANGE_REMOVED, 'product_url': key, 'product': _load(row)}
+
+
+def diff_feeds(old_path: str, new_path: str, fields: Optional[Iterable[str]] = None, **kwargs) -> FeedDiff:
+    """FeedDiff entre dos feeds en disco; el tamaño de los archivos define la cantidad de buckets"""
+    size_hint = max(os.path.getsize(old_path), os.path.getsize(new_path))
+    kwargs.setdefault('size_hint', size_hint)
+    return FeedDiff(open_feed_path(old_path), open_feed_path(new_path), fields=fields, **kwargs)
@@ -0,0 +1,190 @@
+"""
+Backends de parseo HTML para los helpers de extracción de BaseSpider.
+
+`safe_xpath_get`, `safe_xpath_getall`, `safe_xpath_pairs` (filas clave/valor
+de `parse_product_attrs`) y los medios de pago y el breadcrumb de BaseSpider
+pasan por el backend del spider:
+
+- `parsel` (por defecto): los Selector de Scrapy, para cualquier XPath.
+- `selectolax`: parser HTML5 de Lexbor (paquete `selectolax`) con selectores
+  CSS. Solo se usa para los XPaths declarados en `FAST_SELECTORS` del spider
+  (los campos calientes: nombre, precio, imágenes, atributos); el resto sigue
+  por parsel. El árbol se parsea una vez por response.
+
+`FAST_SELECTORS` mapea el XPath exacto a un CSS con la extensión de parsel
+para el resultado:
+
+    'sel::text'        nodos de texto hijos directos (como .../text())
+    'sel ::text'       todos los nodos de texto descendientes (como ...//text())
+    'sel::attr(name)'  valor del atributo (como .../@name)
+    'sel'              nodos: filas de safe_xpath_pairs, texto completo
+                       (como string(.)) o atributos de cada nodo
+
+La equivalencia se declara a mano: el parser HTML5 corrige el documento
+distinto que libxml2 (agrega tbody, cierra párrafos), por eso no se traduce
+XPath automáticamente. Como la clave es el XPath, una subclase que cambia un
+XPATH_* vuelve a parsel para ese campo hasta que declare su selector.
+
+El backend se elige por spider con HTML_BACKEND o en config.yml
+(`parsing.html_backend`, por nombre de spider). Si selectolax no está
+instalado se usa parsel. `python benchmark_parsers.py <spider>` compara el
+tiempo por página y los campos extraídos con cada backend.
+"""
+
+import re
+import weakref
+from typing import Dict, List, Optional, Tuple
+
+from .config import load_config
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # pragma: no cover - dependencia opcional
+    LexborHTMLParser = None
+
+BACKENDS = ('parsel', 'selectolax')
+
+_XML_SPACE_RE = re.compile(r'[ \t\r\n]+')
+_PSEUDO_RE = re.compile(r'^(?P<css>.*?)(?:(?P<space>\s*)::(?:(?P<text>text)|attr\((?P<attr>[^)]+)\)))?\s*$', re.S)
+
+
+def selectolax_available() -> bool:
+    return LexborHTMLParser is not None
+
+
+def normalize_space(text: Optional[str]) -> Optional[str]:
+    """normalize-space() de XPath"""
+    return _XML_SPACE_RE.sub(' ', text).strip(' ') if text is not None else None
+
+
+def html_backend_config() -> dict:
+    return (load_config().get('parsing') or {}).get('html_backend') or {}
+
+
+class FastSelector:
+    """CSS + tipo de resultado (texto directo, texto descendiente, atributo o solo nodos)"""
+
+    __slots__ = ('css', 'deep', 'attr', 'nodes_only')
+
+    def __init__(self, spec: str):
+        match = _PSEUDO_RE.match(spec)
+        if not match or not match.group('css').strip():
+            raise ValueError(f"Selector rápido inválido: {spec!r}")
+        self.css = match.group('css').strip()
+        self.attr = match.group('attr').strip() if match.group('attr') else None
+        self.nodes_only = self.attr is None and not match.group('text')
+        self.deep = bool(match.group('text')) and bool(match.group('space'))
+
+    def values(self, node) -> List[str]:
+        """Valores del selector sobre un nodo (árbol o fila), en orden de documento"""
+        values = []
+        for element in node.css(self.css):
+            if self.attr is not None:
+                value = element.attributes.get(self.attr)
+                if value is not None:
+                    values.append(value)
+                continue
+            children = element.traverse(include_text=True) if self.deep else element.iter(include_text=True)
+            values.extend(child.text(deep=False) for child in children if child.tag == '-text')
+        return values
+
+
+class ParselBackend:
+    """Selector de Scrapy (lxml) para todos los XPaths"""
+
+    name = 'parsel'
+
+    def get(self, response, xpath: str) -> Optional[str]:
+        return response.xpath(xpath).get()
+
+    def getall(self, response, xpath: str) -> List[str]:
+        return response.xpath(xpath).getall()
+
+    def pairs(self, response, rows_xpath: str, key_xpath: str, value_xpath: str) -> List[Tuple]:
+        return [(row.xpath(key_xpath).get(), row.xpath(value_xpath).get()) for row in response.xpath(rows_xpath)]
+
+    def strings(self, response, xpath: str) -> List[str]:
+        """Texto completo (string(.)) de cada nodo"""
+        return [node.xpath('string(.)').get() for node in response.xpath(xpath)]
+
+    def attribute(self, response, xpath: str, name: str) -> Optional[str]:
+        """Primer valor del atributo entre los nodos"""
+        return response.xpath(xpath).xpath(f'./@{name}').get()
+
+
+class SelectolaxBackend(ParselBackend):
+    """Lexbor + CSS para los XPaths de FAST_SELECTORS; parsel para el resto"""
+
+    name = 'selectolax'
+
+    def __init__(self, fast_selectors: Dict[str, str]):
+        self.selectors = {xpath: FastSelector(spec) for xpath, spec in fast_selectors.items()}
+        self._trees = weakref.WeakKeyDictionary()  # response -> árbol de Lexbor
+
+    def tree(self, response):
+        tree = self._trees.get(response)
+        if tree is None:
+            tree = self._trees[response] = LexborHTMLParser(response.text)
+        return tree
+
+    def get(self, response, xpath: str) -> Optional[str]:
+        selector = self.selectors.get(xpath)
+        if selector is None or selector.nodes_only:
+            return super().get(response, xpath)
+        values = selector.values(self.tree(response))
+        return values[0] if values else None
+
+    def getall(self, response, xpath: str) -> List[str]:
+        selector = self.selectors.get(xpath)
+        if selector is None or selector.nodes_only:
+            return super().getall(response, xpath)
+        return selector.values(self.tree(response))
+
+    def _nodes(self, response, xpath: str):
+        """Nodos de Lexbor de un selector de nodos declarado, o None si el XPath va por parsel"""
+        selector = self.selectors.get(xpath)
+        if selector is None or not selector.nodes_only:
+            return None
+        return self.tree(response).css(selector.css)
+
+    def strings(self, response, xpath: str) -> List[str]:
+        nodes = self._nodes(response, xpath)
+        if nodes is None:
+            return super().strings(response, xpath)
+        return [node.text(deep=True) for node in nodes]
+
+    def attribute(self, response, xpath: str, name: str) -> Optional[str]:
+        nodes = self._nodes(response, xpath)
+        if nodes is None:
+            return super().attribute(response, xpath, name)
+        return next((node.attributes[name] for node in nodes if node.attributes.get(name) is not None), None)
+
+    def pairs(self, response, rows_xpath: str, key_xpath: str, value_xpath: str) -> List[Tuple]:
+        rows, key, value = (self.selectors.get(xpath) for xpath in (rows_xpath, key_xpath, value_xpath))
+        if rows is None or key is None or value is None or key.nodes_only or value.nodes_only:
+            return super().pairs(response, rows_xpath, key_xpath, value_xpath)
+        result = []
+        for row in self.tree(response).css(rows.css):
+            keys, values = key.values(row), value.values(row)
+            result.append((keys[0] if keys else None, values[0] if values else None))
+        return result
+
+
+def make_backend(name: str, fast_selectors: Dict[str, str] = None) -> ParselBackend:
+    """Backend por nombre; selectolax sin selectores declarados o sin instalar es parsel"""
+    if name not in BACKENDS:
+        raise ValueError(f"Backend HTML desconocido: {name!r} (opciones: {', '.join(BACKENDS)})")
+    if name == 'selectolax' and fast_selectors and selectolax_available():
+        return SelectolaxBackend(fast_selectors)
+    return ParselBackend()
+
+
+def backend_name_for(spider_cls) -> str:
+    """config.yml (`parsing.html_backend.spiders`), HTML_BACKEND del spider o el default de config.yml"""
+    cfg = html_backend_config()
+    return (
+        (cfg.get('spiders') or {}).get(spider_cls.name)
+        or spider_cls.HTML_BACKEND
+        or cfg.get('default')
+        or 'parsel'
+    )
@@ -0,0 +1,304 @@
+"""
+Storage de cache HTTP sobre SQLite (un archivo por spider).
+
+Reemplaza a FilesystemCacheStorage, que crea varios archivos por respuesta y
+nunca elimina nada. Acá cada respuesta es una fila con el body comprimido
+(zstd, o zlib si `zstandard` no está instalado), y el tamaño total se limita
+con HTTPCACHE_SQLITE_MAX_BYTES eliminando las entradas usadas hace más tiempo
+(LRU). `python command.py cache-compact` elimina expiradas y compacta el archivo.
+
+SpiderTTLPolicy define la frescura por clase de request y revalida las
+entradas vencidas con requests condicionales.
+
+Settings:
+    HTTPCACHE_STORAGE = "motorciclye.httpcache.SqliteCacheStorage"
+    HTTPCACHE_SQLITE_MAX_BYTES = 2 * 1024 ** 3   # 0 = sin límite
+    HTTPCACHE_COMPRESSION = "zstd"               # zstd | zlib | none
+"""
+
+import json
+import logging
+import os
+import sqlite3
+from time import time
+from typing import Optional
+
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.project import data_path
+
+from .compression import compress, decompress, resolve_codec
+
+logger = logging.getLogger(__name__)
+
+COMMIT_EVERY = 100  # Escrituras por transacción
+TOUCH_EVERY = 500  # Accesos acumulados antes de actualizar accessed_at
+EVICT_LOW_WATER = 0.9  # Al superar el límite se libera hasta el 90%
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    fingerprint TEXT NOT NULL UNIQUE,
+    url TEXT NOT NULL,
+    method TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    response_url TEXT NOT NULL,
+    headers BLOB NOT NULL,
+    body BLOB NOT NULL,
+    codec TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+"""
+
+
+def open_cache_db(path: str) -> sqlite3.Connection:
+    """Abre (o crea) la base de cache con el esquema y pragmas recomendados"""
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def evict_lru(conn: sqlite3.Connection, total_bytes: int, max_bytes: int) -> int:
+    """Elimina las entradas menos usadas hasta quedar bajo el límite. Devuelve el nuevo total"""
+    if not max_bytes or total_bytes <= max_bytes:
+        return total_bytes
+    target = int(max_bytes * EVICT_LOW_WATER)
+    while total_bytes > target:
+        rows = conn.execute(
+            'SELECT rowid, size FROM responses ORDER BY accessed_at LIMIT 500'
+        ).fetchall()
+        if not rows:
+            break
+        victims = []
+        for rowid, size in rows:
+            victims.append((rowid,))
+            total_bytes -= size
+            if total_bytes <= target:
+                break
+        conn.executemany('DELETE FROM responses WHERE rowid = ?', victims)
+    conn.commit()
+    return max(total_bytes, 0)
+
+
+def cache_expiration_secs(settings, spider_ttls: Optional[dict] = None) -> int:
+    """
+    Antigüedad a partir de la cual cache-compact elimina entradas: con
+    SpiderTTLPolicy el TTL más largo del spider (HTTPCACHE_POLICY_TTLS más
+    HTTPCACHE_TTLS), así se conservan las vencidas que todavía se revalidan.
+    0 (no eliminar) si alguna clase nunca expira (TTL None).
+    """
+    if not settings.get('HTTPCACHE_POLICY', '').endswith('SpiderTTLPolicy'):
+        return settings.getint('HTTPCACHE_EXPIRATION_SECS')
+    ttls = dict(settings.getdict('HTTPCACHE_POLICY_TTLS'))
+    ttls.update(spider_ttls or {})
+    ttls.setdefault('default', settings.getint('HTTPCACHE_EXPIRATION_SECS'))
+    if any(ttl is None for ttl in ttls.values()):
+        return 0
+    return max(int(ttl) for ttl in ttls.values())
+
+
+def compact_cache(path: str, expiration_secs: int = 0, max_bytes: int = 0) -> dict:
+    """
+    Elimina entradas expiradas, aplica el límite de tamaño y hace VACUUM.
+    Devuelve un resumen con los bytes antes/después.
+    """
+    size_before = os.path.getsize(path)
+    conn = open_cache_db(path)
+    try:
+        expired = 0
+        if expiration_secs > 0:
+            expired = conn.execute(
+                'DELETE FROM responses WHERE stored_at < ?', (time() - expiration_secs,)
+            ).rowcount
+            conn.commit()
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        total = evict_lru(conn, total, max_bytes)
+        entries = conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        conn.execute('VACUUM')
+    finally:
+        conn.close()
+    return {
+        'path': path,
+        'expired': expired,
+        'entries': entries,
+        'data_bytes': total,
+        'file_bytes_before': size_before,
+        'file_bytes_after': os.path.getsize(path),
+    }
+
+
+class SqliteCacheStorage:
+    """Cache storage de Scrapy sobre un único archivo SQLite por spider"""
+
+    def __init__(self, settings):
+        self.cachedir = data_path(settings['HTTPCACHE_DIR'], createdir=True)
+        self.expiration_secs = settings.getint('HTTPCACHE_EXPIRATION_SECS')
+        self.max_bytes = settings.getint('HTTPCACHE_SQLITE_MAX_BYTES', 0)
+        self.codec = resolve_codec(settings.get('HTTPCACHE_COMPRESSION', 'zstd'))
+        self.conn: Optional[sqlite3.Connection] = None
+        self.total_bytes = 0
+        self._pending_writes = 0
+        self._touched = {}
+
+    def open_spider(self, spider):
+        self.db_path = os.path.join(self.cachedir, f'{spider.name}.sqlite3')
+        self.conn = open_cache_db(self.db_path)
+        self.total_bytes = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        self._fingerprinter = spider.crawler.request_fingerprinter
+        logger.debug(
+            'Usando cache SQLite en %(path)s (%(size)d bytes, codec %(codec)s)',
+            {'path': self.db_path, 'size': self.total_bytes, 'codec': self.codec},
+            extra={'spider': spider},
+        )
+
+    def close_spider(self, spider):
+        if self.conn is None:
+            return
+        self._flush_touched()
+        self.conn.commit()
+        self.conn.close()
+        self.conn = None
+
+    def retrieve_response(self, spider, request):
+        key = self._fingerprinter.fingerprint(request).hex()
+        row = self.conn.execute(
+            'SELECT status, response_url, headers, body, codec, stored_at FROM responses WHERE fingerprint = ?',
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None  # no está en cache
+        status, url, raw_headers, body, codec, stored_at = row
+        if 0 < self.expiration_secs < time() - stored_at:
+            return None  # expirada
+
+        self._touched[key] = time()
+        if len(self._touched) >= TOUCH_EVERY:
+            self._flush_touched()
+
+        headers = Headers(json.loads(raw_headers))
+        body = decompress(body, codec)
+        request.meta['cache_timestamp'] = stored_at
+        respcls = responsetypes.from_args(headers=headers, url=url, body=body)
+        return respcls(url=url, headers=headers, status=status, body=body)
+
+    def store_response(self, spider, request, response):
+        key = self._fingerprinter.fingerprint(request).hex()
+        headers = json.dumps({
+            k.decode('latin-1'): [v.decode('latin-1') for v in values]
+            for k, values in response.headers.items()
+        }).encode('utf-8')
+        body = compress(response.body, self.codec)
+        size = len(body) + len(headers)
+        now = time()
+
+        previous = self.conn.execute('SELECT size FROM responses WHERE fingerprint = ?', (key,)).fetchone()
+        self.conn.execute(
+            'INSERT OR REPLACE INTO responses '
+            '(fingerprint, url, method, status, response_url, headers, body, codec, size, stored_at, accessed_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (key, request.url, request.method, response.status, response.url, headers, body, self.codec, size, now, now),
+        )
+        self.total_bytes += size - (previous[0] if previous else 0)
+
+        self._pending_writes += 1
+        if self._pending_writes >= COMMIT_EVERY:
+            self.conn.commit()
+            self._pending_writes = 0
+        if self.max_bytes and self.total_bytes > self.max_bytes:
+            self._flush_touched()
+            self.total_bytes = evict_lru(self.conn, self.total_bytes, self.max_bytes)
+            self._pending_writes = 0
+
+    def _flush_touched(self):
+        """Actualiza accessed_at de las entradas leídas (para el orden LRU) en un solo lote"""
+        if not self._touched:
+            return
+        self.conn.executemany(
+            'UPDATE responses SET accessed_at = ? WHERE fingerprint = ?',
+            [(ts, key) for key, ts in self._touched.items()],
+        )
+        self._touched.clear()
+        self._pending_writes += 1
+
+
+# Clase de request según el callback, para los spiders que no indican meta['cache_class']
+CALLBACK_CACHE_CLASSES = {
+    'parse': 'start',
+    'parse_robots': 'start',
+    'parse_source_and_continue': 'source',
+    'parse_source_and_sitemap': 'source',
+    'parse_list_of_products': 'listing',
+    'parse_sitemap': 'listing',
+    'parse_product': 'product',
+}
+
+
+class SpiderTTLPolicy:
+    """
+    Política de cache con TTL por clase de request (start, listing, product, source).
+
+    Los TTL se configuran en HTTPCACHE_POLICY_TTLS y cada spider puede
+    sobrescribirlos con el atributo de clase HTTPCACHE_TTLS. La clase se toma de
+    meta['cache_class'] o del nombre del callback. Un TTL None nunca expira.
+
+    Cuando una entrada expira no se descarga de nuevo a ciegas: se revalida con
+    If-None-Match / If-Modified-Since y, si el servidor responde 304, se reutiliza
+    el body cacheado y se renueva su timestamp.
+
+    Settings:
+        HTTPCACHE_POLICY = "motorciclye.httpcache.SpiderTTLPolicy"
+        HTTPCACHE_POLICY_TTLS = {'listing': 1800, 'product': 43200, ...}
+    """
+
+    def __init__(self, settings):
+        self.ignore_schemes = settings.getlist('HTTPCACHE_IGNORE_SCHEMES')
+        self.ignore_http_codes = [int(x) for x in settings.getlist('HTTPCACHE_IGNORE_HTTP_CODES')]
+        self.ttls = dict(settings.getdict('HTTPCACHE_POLICY_TTLS'))
+        self.default_ttl = self.ttls.get('default', settings.getint('HTTPCACHE_EXPIRATION_SECS'))
+
+    def request_class(self, request) -> str:
+        cache_class = request.meta.get('cache_class')
+        if cache_class:
+            return cache_class
+        callback = request.callback
+        name = getattr(callback, '__name__', None) if callback is not None else 'parse'
+        return CALLBACK_CACHE_CLASSES.get(name, 'default')
+
+    def ttl_for(self, request) -> Optional[int]:
+        return self.ttls.get(self.request_class(request), self.default_ttl)
+
+    def should_cache_request(self, request):
+        if request.meta.get('cache_class') == 'none':
+            return False
+        return request.url.split(':', 1)[0] not in self.ignore_schemes
+
+    def should_cache_response(self, response, request):
+        return response.status != 304 and response.status not in self.ignore_http_codes
+
+    def is_cached_response_fresh(self, cachedresponse, request):
+        ttl = self.ttl_for(request)
+        if ttl is None:
+            return True
+        age = time() - request.meta.get('cache_timestamp', 0)
+        if age < ttl:
+            return True
+        self._set_conditional_validators(request, cachedresponse)
+        return False
+
+    def is_cached_response_valid(self, cachedresponse, response, request):
+        # 304: el contenido no cambió. 5xx: preferimos la copia vieja antes que un error
+        return response.status == 304 or response.status >= 500
+
+    @staticmethod
+    def _set_conditional_validators(request, cachedresponse):
+        etag = cachedresponse.headers.get(b'ETag')
+        if etag:
+            request.headers[b'If-None-Match'] = etag
+        last_modified = cachedresponse.headers.get(b'Last-Modified')
+        if last_modified:
+            request.headers[b'If-Modified-Since'] = last_modified
@@ -0,0 +1,264 @@
+"""
+Pipeline de imágenes con almacenamiento por contenido y deduplicación perceptual.
+
+Extiende el ImagesPipeline de Scrapy: las imágenes de `images` se descargan
+con el downloader de Scrapy (en paralelo, con el límite por dominio de
+CONCURRENT_REQUESTS_PER_DOMAIN y un slot propio por dominio de imágenes, así
+no compiten con el HTML de la tienda) y se guardan en IMAGES_STORE con clave
+por contenido:
+
+    full/<sha256[:2]>/<sha256>.jpg
+    thumbs/<thumb_id>/<sha256[:2]>/<sha256>.jpg
+
+Un índice SQLite (`images.index`) guarda URL -> imagen y, por imagen, un
+dHash perceptual de 64 bits partido en cuatro bloques de 16 bits indexados.
+Antes de guardar una imagen nueva se buscan las que comparten algún bloque
+(con `max_distance` <= 3 una imagen a esa distancia de Hamming comparte al
+menos un bloque) y si alguna está a `max_distance` o menos se reutiliza su
+clave: la misma foto publicada por varias tiendas o productos, o
+recomprimida, se guarda una sola vez. Las URLs que ya están en el índice no
+se vuelven a descargar, en esta ni en las próximas corridas.
+
+Cada producto recibe en `image_keys` las claves de sus imágenes (en el mismo
+orden que `images`, sin las que fallaron). Requiere Pillow; se habilita en
+config.yml (sección `images`).
+
+En Scrapy 2.19 media_downloaded, file_downloaded e image_downloaded son
+corrutinas y persist_file puede devolver un Deferred: los overrides son
+`async def` y esperan ambos con ensure_awaitable, como ImagesPipeline.
+"""
+
+import hashlib
+import os
+import sqlite3
+import time
+from io import BytesIO
+from typing import Optional
+from urllib.parse import urlparse
+
+from itemadapter import ItemAdapter
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Request
+from scrapy.http.request import NO_CALLBACK
+from scrapy.pipelines.images import ImageException, ImagesPipeline
+from scrapy.utils.defer import ensure_awaitable
+
+from .config import load_config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY,
+    sha256 TEXT NOT NULL UNIQUE,
+    phash INTEGER NOT NULL,
+    p0 INTEGER NOT NULL,
+    p1 INTEGER NOT NULL,
+    p2 INTEGER NOT NULL,
+    p3 INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    bytes INTEGER,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS images_p0 ON images (p0);
+CREATE INDEX IF NOT EXISTS images_p1 ON images (p1);
+CREATE INDEX IF NOT EXISTS images_p2 ON images (p2);
+CREATE INDEX IF NOT EXISTS images_p3 ON images (p3);
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    image_id INTEGER NOT NULL,
+    fetched_at REAL NOT NULL
+);
+"""
+
+DEFAULT_MAX_DISTANCE = 3  # Bits distintos del dHash para considerar dos imágenes iguales
+DEFAULT_SKIP_PATTERNS = ('placeholder', 'no-image', 'noimage')
+
+
+def images_config() -> dict:
+    return load_config().get('images') or {}
+
+
+def dhash(image) -> int:
+    """dHash de 64 bits: gradiente horizontal de la imagen en grises reducida a 9x8"""
+    small = image.convert('L').resize((9, 8))
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(8):
+        offset = row * 9
+        for col in range(8):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def _signed(value: int) -> int:
+    """uint64 -> int64 para guardarlo como INTEGER de SQLite"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _blocks(phash: int):
+    return [(phash >> shift) & 0xFFFF for shift in (48, 32, 16, 0)]
+
+
+class ImageIndex:
+    """Índice URL -> imagen y búsqueda por dHash (SQLite)"""
+
+    def __init__(self, path: str, max_distance: int = DEFAULT_MAX_DISTANCE):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.max_distance = max_distance
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def by_url(self, url: str) -> Optional[sqlite3.Row]:
+        return self.conn.execute(
+            'SELECT i.key, i.sha256 FROM urls u JOIN images i ON i.id = u.image_id WHERE u.url = ?', (url,)
+        ).fetchone()
+
+    def find(self, sha256: str, phash: int) -> Optional[sqlite3.Row]:
+        """Imagen ya guardada con el mismo contenido o a `max_distance` bits de dHash"""
+        row = self.conn.execute('SELECT id, key, sha256 FROM images WHERE sha256 = ?', (sha256,)).fetchone()
+        if row is not None or self.max_distance < 0:
+            return row
+        p0, p1, p2, p3 = _blocks(phash)
+        best = None
+        for candidate in self.conn.execute(
+            'SELECT id, key, sha256, phash FROM images WHERE p0 = ? OR p1 = ? OR p2 = ? OR p3 = ?', (p0, p1, p2, p3)
+        ):
+            distance = bin((candidate['phash'] & 0xFFFFFFFFFFFFFFFF) ^ phash).count('1')
+            if distance <= self.max_distance and (best is None or distance < best[0]):
+                best = (distance, candidate)
+        return best[1] if best else None
+
+    def add_image(self, sha256: str, phash: int, key: str, width: int, height: int, size: int) -> int:
+        p0, p1, p2, p3 = _blocks(phash)
+        return self.conn.execute(
+            'INSERT INTO images (sha256, phash, p0, p1, p2, p3, key, width, height, bytes, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (sha256, _signed(phash), p0, p1, p2, p3, key, width, height, size, time.time()),
+        ).lastrowid
+
+    def add_url(self, url: str, image_id: int):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO urls (url, image_id, fetched_at) VALUES (?, ?, ?)', (url, image_id, time.time())
+        )
+        self.conn.commit()
+
+    def stats(self) -> dict:
+        row = self.conn.execute(
+            'SELECT (SELECT COUNT(*) FROM urls), COUNT(*), COALESCE(SUM(bytes), 0) FROM images'
+        ).fetchone()
+        return {'urls': row[0], 'images': row[1], 'bytes': row[2]}
+
+
+class ContentAddressedImagesPipeline(ImagesPipeline):
+    """
+    ImagesPipeline con claves por contenido, dedupe perceptual y sin re-descargas.
+
+    ITEM_PIPELINES = {"motorciclye.images.ContentAddressedImagesPipeline": 280}
+    IMAGES_STORE = "build/images"
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        cfg = images_config()
+        self.index_path = cfg.get('index') or os.path.join('build', 'images', 'index.sqlite3')
+        self.max_distance = cfg.get('max_distance', DEFAULT_MAX_DISTANCE)
+        self.skip_patterns = tuple(cfg.get('skip_patterns', DEFAULT_SKIP_PATTERNS))
+        self.index = None
+        self._stored_keys = {}  # URL -> clave guardada, entre image_downloaded y media_downloaded
+        self.counts = {'reused': 0, 'downloaded': 0, 'deduplicated': 0}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not images_config().get('enabled'):
+            raise NotConfigured("Pipeline de imágenes deshabilitado (config.yml, images.enabled)")
+        return super().from_crawler(crawler)
+
+    def open_spider(self, spider):
+        super().open_spider()  # MediaPipeline toma el spider del crawler
+        self.index = ImageIndex(self.index_path, self.max_distance)
+
+    def close_spider(self, spider):
+        stats = self.index.stats()
+        self.index.close()
+        spider.logger.info(
+            f"ContentAddressedImagesPipeline: {self.counts['downloaded']} descargadas, "
+            f"{self.counts['deduplicated']} duplicadas, {self.counts['reused']} ya indexadas; "
+            f"índice con {stats['images']} imágenes ({stats['bytes'] / 1024 / 1024:.1f} MB) para {stats['urls']} URLs"
+        )
+
+    def get_media_requests(self, item, info):
+        adapter = ItemAdapter(item)
+        if adapter.get('item_type', 'product') != 'product':
+            return []
+        requests = []
+        for url in adapter.get(self.images_urls_field) or []:
+            if not url or any(pattern in url for pattern in self.skip_patterns):
+                continue
+            # Slot propio por dominio de imágenes y sin cache HTTP: el índice ya evita re-descargas
+            meta = {'download_slot': f'images:{urlparse(url).netloc}', 'dont_cache': True}
+            requests.append(Request(url, callback=NO_CALLBACK, meta=meta))
+        return requests
+
+    def media_to_download(self, request, info, *, item=None):
+        """Las URLs que ya están en el índice no se descargan"""
+        row = self.index.by_url(request.url)
+        if row is None:
+            return None
+        self.counts['reused'] += 1
+        return {'url': request.url, 'path': row['key'], 'checksum': row['sha256'], 'status': 'uptodate'}
+
+    async def media_downloaded(self, response, request, info, *, item=None):
+        result = await super().media_downloaded(response, request, info, item=item)
+        result['path'] = self._stored_keys.pop(request.url, result['path'])
+        return result
+
+    async def image_downloaded(self, response, request, info, *, item=None):
+        orig_image = self._ImageOps.exif_transpose(self._Image.open(BytesIO(response.body)))
+        width, height = orig_image.size
+        if width < self.min_width or height < self.min_height:
+            raise ImageException(
+                f"Imagen muy chica ({width}x{height} < {self.min_width}x{self.min_height})"
+            )
+        image, buf = self.convert_image(orig_image, response_body=BytesIO(response.body))
+        body = buf.getvalue()
+        sha256 = hashlib.sha256(body).hexdigest()
+        phash = dhash(image)
+
+        existing = self.index.find(sha256, phash)
+        if existing is not None:
+            self.counts['deduplicated'] += 1
+            self.index.add_url(request.url, existing['id'])
+            self._stored_keys[request.url] = existing['key']
+            return existing['sha256']
+
+        key = f'full/{sha256[:2]}/{sha256}.jpg'
+        headers = {'Content-Type': 'image/jpeg'}
+        await ensure_awaitable(self.store.persist_file(
+            key, buf, info, meta={'width': image.size[0], 'height': image.size[1]}, headers=headers,
+        ))
+        for thumb_id, size in self.thumbs.items():
+            thumb_image, thumb_buf = self.convert_image(image, size, response_body=buf)
+            await ensure_awaitable(self.store.persist_file(
+                f'thumbs/{thumb_id}/{sha256[:2]}/{sha256}.jpg', thumb_buf, info,
+                meta={'width': thumb_image.size[0], 'height': thumb_image.size[1]}, headers=headers,
+            ))
+        image_id = self.index.add_image(sha256, phash, key, image.size[0], image.size[1], len(body))
+        self.index.add_url(request.url, image_id)
+        self.counts['downloaded'] += 1
+        self._stored_keys[request.url] = key
+        return sha256
+
+    def item_completed(self, results, item, info):
+        adapter = ItemAdapter(item)
+        if adapter.get('item_type', 'product') == 'product' and results:
+            adapter[self.images_result_field] = [result['path'] for ok, result in results if ok]
+        return item
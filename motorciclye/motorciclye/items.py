@@ -1,12 +1,150 @@
-# Define here the models for your scraped items
-#
-# See documentation in:
-# https://docs.scrapy.org/en/latest/topics/items.html
+"""
+Modelo de items de los spiders.
 
-import scrapy
+Dataclasses con __slots__ para productos, fuentes y actualizaciones de precio:
+ocupan bastante menos memoria que un dict por item mientras viajan por el
+exporter y los pipelines, y validan los tipos al construirse, así los errores
+de esquema aparecen en la extracción y no recién en advanced_test.py.
 
+Los strings repetidos entre productos (menú, categoría, marca) se internan.
+`to_dict()` devuelve el formato JSON que ya consumen RabbitMQ y los feeds:
+todos los campos base siempre presentes (None si faltan) y los opcionales
+solo cuando tienen valor. Scrapy los soporta vía itemadapter.
+"""
 
-class MotorciclyeItem(scrapy.Item):
-    # define the fields for your item here like:
-    # name = scrapy.Field()
-    pass
+import sys
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, List, Optional, Union
+
+from itemadapter import ItemAdapter
+
+
+class ItemValidationError(ValueError):
+    """El item no respeta el esquema (tipo inválido o campo requerido vacío)"""
+
+
+def _check(item, name, types, required=False):
+    value = getattr(item, name)
+    if value is None:
+        if required:
+            raise ItemValidationError(f"{type(item).__name__}.{name} es requerido")
+        return
+    if not isinstance(value, types) or isinstance(value, bool) and bool not in types:
+        raise ItemValidationError(
+            f"{type(item).__name__}.{name} debe ser {'/'.join(t.__name__ for t in types)}, no {type(value).__name__}"
+        )
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class _WireItem:
+    __slots__ = ()
+    OPTIONAL_FIELDS = ()  # Se omiten de to_dict() cuando son None
+
+    def to_dict(self) -> dict:
+        optional = self.OPTIONAL_FIELDS
+        data = {}
+        for f in fields(self):
+            value = getattr(self, f.name)
+            if value is None and f.name in optional:
+                continue
+            data[f.name] = value
+        return data
+
+
+@dataclass(slots=True, kw_only=True)
+class ProductItem(_WireItem):
+    item_type: str = field(default='product', init=False)
+    menu_name: Optional[str] = None
+    menu_url: Optional[str] = None
+    product_url: str
+    name: Optional[str] = None
+    price: Optional[float] = None
+    brand: Optional[str] = None
+    attrs: Union[Dict[str, Any], List[str], None] = None
+    payments: Optional[List[str]] = None
+    discount_text: Optional[str] = None
+    images: Optional[List[str]] = None
+    description: Optional[str] = None
+    category_name: Optional[str] = None
+    category_url: Optional[str] = None
+    source: bool = False
+    discount_percent: Optional[float] = None
+    installments: Optional[List[dict]] = None
+    stock: Optional[str] = None
+    match_id: Optional[int] = None  # Cluster entre tiendas (ver matching.py)
+    image_keys: Optional[List[str]] = None  # Claves en IMAGES_STORE (ver images.py)
+
+    OPTIONAL_FIELDS = frozenset({'discount_percent', 'installments', 'stock', 'match_id', 'image_keys'})
+
+    def __post_init__(self):
+        _check(self, 'product_url', (str,), required=True)
+        if not self.product_url.startswith(('http://', 'https://')):
+            raise ItemValidationError(f"ProductItem.product_url no es una URL: {self.product_url}")
+        _check(self, 'price', (int, float))
+        if self.price is not None and self.price < 0:
+            raise ItemValidationError(f"ProductItem.price negativo: {self.price}")
+        _check(self, 'attrs', (dict, list))
+        _check(self, 'payments', (list,))
+        _check(self, 'images', (list,))
+        _check(self, 'installments', (list,))
+        _check(self, 'discount_percent', (int, float))
+        _check(self, 'match_id', (int,))
+        _check(self, 'image_keys', (list,))
+        _check(self, 'source', (bool,), required=True)
+        self.menu_name = _intern(self.menu_name)
+        self.menu_url = _intern(self.menu_url)
+        self.brand = _intern(self.brand)
+        self.category_name = _intern(self.category_name)
+        self.category_url = _intern(self.category_url)
+
+
+@dataclass(slots=True, kw_only=True)
+class SourceItem(_WireItem):
+    item_type: str = field(default='source', init=False)
+    source_url: str
+    name: str
+    address: Optional[str] = None
+    logo: Optional[str] = None
+    contact_methods: Dict[str, Optional[str]] = field(default_factory=dict)
+
+    def __post_init__(self):
+        _check(self, 'source_url', (str,), required=True)
+        _check(self, 'name', (str,), required=True)
+        _check(self, 'contact_methods', (dict,), required=True)
+        self.name = _intern(self.name)
+
+
+@dataclass(slots=True, kw_only=True)
+class PriceUpdateItem(_WireItem):
+    """Solo los campos volátiles de un producto (precio, descuento, cuotas, stock)"""
+    item_type: str = field(default='price_update', init=False)
+    product_url: str
+    price: Optional[float] = None
+    discount_percent: Optional[float] = None
+    discount_text: Optional[str] = None
+    installments: Optional[List[dict]] = None
+    stock: Optional[str] = None
+    spider: str
+    static_hash: Optional[str] = None  # Hash de la parte estática vigente (ver message_split.py)
+
+    OPTIONAL_FIELDS = frozenset({'installments'})
+
+    def __post_init__(self):
+        _check(self, 'product_url', (str,), required=True)
+        _check(self, 'price', (int, float))
+        _check(self, 'discount_percent', (int, float))
+        _check(self, 'discount_text', (str,))
+        _check(self, 'installments', (list,))
+        _check(self, 'spider', (str,), required=True)
+        _check(self, 'static_hash', (str,))
+        self.spider = _intern(self.spider)
+
+
+def item_to_dict(item) -> dict:
+    """Formato de wire de cualquier item (dataclass de este módulo, dict o scrapy.Item)"""
+    if isinstance(item, _WireItem):
+        return item.to_dict()
+    return ItemAdapter(item).asdict()
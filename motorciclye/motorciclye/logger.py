@@ -1,18 +1,176 @@
+"""
+Logging de spiders y pipelines.
+
+Los registros se encolan con un QueueHandler y un QueueListener los escribe
+al archivo en un thread aparte, así el reactor no hace I/O de disco por cada
+mensaje. Cada registro lleva run_id/spider (y url/event si se pasan en
+`extra`) y se escribe como JSON por línea o en texto según config.yml.
+
+Los mensajes del hot path se marcan con `extra={'event': ...}` y se limitan
+por tipo según `logging.rate_limits` (mensajes por segundo). Al cerrar el
+logger se informa cuántos se descartaron.
+"""
+
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from .config import load_config
 cfg = load_config().get('logging', {})
 
-def get_logger(name=__name__, filename=None):
+TEXT_FORMAT = '[%(asctime)s] %(levelname)s:%(name)s: %(message)s'
+_CONTEXT_FIELDS = ('run_id', 'spider', 'url', 'event')
+
+_loggers = {}  # nombre -> _LoggerState
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """Un objeto JSON por línea con los campos de contexto del registro"""
+
+    def format(self, record):
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in _CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class ContextFilter(logging.Filter):
+    """Agrega run_id y spider a todos los registros del logger"""
+
+    def __init__(self, run_id, spider):
+        super().__init__()
+        self.run_id = run_id
+        self.spider = spider
+
+    def filter(self, record):
+        record.run_id = self.run_id
+        record.spider = self.spider
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Limita los registros por tipo (`extra={'event': ...}`) a N por segundo.
+    Los registros sin event y los de nivel WARNING o superior nunca se descartan.
+    """
+
+    def __init__(self, limits):
+        super().__init__()
+        self.limits = {event: float(rate) for event, rate in (limits or {}).items()}
+        self.tokens = {}
+        self.updated = {}
+        self.dropped = {}
+
+    def filter(self, record):
+        event = getattr(record, 'event', None)
+        rate = self.limits.get(event)
+        if not rate or record.levelno >= logging.WARNING:
+            return True
+        now = time.monotonic()
+        burst = max(rate, 1.0)
+        tokens = min(burst, self.tokens.get(event, burst) + (now - self.updated.get(event, now)) * rate)
+        self.updated[event] = now
+        if tokens >= 1:
+            self.tokens[event] = tokens - 1
+            return True
+        self.tokens[event] = tokens
+        self.dropped[event] = self.dropped.get(event, 0) + 1
+        return False
+
+
+class _AsyncQueueHandler(QueueHandler):
+    """QueueHandler que solo resuelve el mensaje; el formateo se hace en el thread del listener"""
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class _LoggerState:
+    def __init__(self, filename, queue_handler, file_handler, listener, filters):
+        self.filename = filename
+        self.queue_handler = queue_handler
+        self.file_handler = file_handler
+        self.listener = listener
+        self.filters = filters
+
+
+def get_logger(name=__name__, filename=None, run_id=None):
     logger = logging.getLogger(name)
     log_filename = filename or cfg.get('filename', 'app.log')
     max_bytes = cfg.get('max_bytes', 10485760)
     backup_count = cfg.get('backup_count', 10)
 
-    if not logger.handlers:
-        handler = RotatingFileHandler(log_filename, maxBytes=max_bytes, backupCount=backup_count)
-        formatter = logging.Formatter('[%(asctime)s] %(levelname)s:%(name)s: %(message)s')
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-    logger.setLevel(logging.INFO)
-    return logger
\ No newline at end of file
+    with _lock:
+        state = _loggers.get(name)
+        if state is not None and state.filename != log_filename:
+            # Otro spider/corrida con el mismo nombre en el mismo proceso: cerrar el anterior
+            _close_state(logger, _loggers.pop(name))
+            state = None
+
+        if state is None:
+            file_handler = RotatingFileHandler(log_filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+            if cfg.get('format', 'text') == 'json':
+                file_handler.setFormatter(JsonFormatter())
+            else:
+                file_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+            log_queue = queue.SimpleQueue()
+            listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+            listener.start()
+
+            # Filtros a nivel logger: también aplican a lo que se propaga a la consola de Scrapy
+            filters = [ContextFilter(run_id, name), RateLimitFilter(cfg.get('rate_limits'))]
+            for log_filter in filters:
+                logger.addFilter(log_filter)
+            queue_handler = _AsyncQueueHandler(log_queue)
+            logger.addHandler(queue_handler)
+            _loggers[name] = _LoggerState(log_filename, queue_handler, file_handler, listener, filters)
+
+    logger.setLevel(cfg.get('level', 'INFO'))
+    return logger
+
+
+def close_logger(name):
+    """Vacía la cola, cierra el archivo y quita los handlers del logger"""
+    with _lock:
+        state = _loggers.pop(name, None)
+        if state is not None:
+            _close_state(logging.getLogger(name), state)
+
+
+def _close_state(logger, state):
+    dropped = state.filters[-1].dropped
+    if dropped:
+        summary = ', '.join(f'{event}={count}' for event, count in sorted(dropped.items()))
+        logger.info(f"Mensajes descartados por rate limit: {summary}")
+    for log_filter in state.filters:
+        logger.removeFilter(log_filter)
+    logger.removeHandler(state.queue_handler)
+    state.listener.stop()
+    state.file_handler.close()
+
+
+@atexit.register
+def _close_all():
+    for name in list(_loggers):
+        close_logger(name)
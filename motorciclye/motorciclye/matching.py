@@ -0,0 +1,416 @@
+"""
+Índice de matching de productos entre tiendas (SQLite en build/matching.sqlite3).
+
+El mismo casco o neumático aparece en varias tiendas con nombres parecidos
+pero no iguales ("Casco LS2 FF353 Rapid Negro Mate" / "CASCO FF353 RAPID
+NEGRO MATE TALLE L", marca LS2). Cada producto se normaliza (minúsculas, sin acentos, medidas
+pegadas a su unidad, sin palabras vacías; la marca y el modelo de `attrs`
+completan el nombre) y se representa como el conjunto de sus palabras. Si
+el producto no trae marca se busca en el nombre alguna marca ya conocida
+por el índice.
+
+Para no comparar todos contra todos se usa MinHash + LSH: la firma MinHash
+de cada producto se parte en `bands` bandas y cada banda es una clave de
+bucket indexada en SQLite. Los candidatos de un producto nuevo son los que
+comparten al menos un bucket; solo contra ellos se calcula la similitud
+Jaccard exacta, se descartan marcas distintas y precios muy distintos, y el
+producto se suma al cluster del mejor candidato o abre uno nuevo. El costo
+por producto no depende del tamaño del índice, así que escala a cientos de
+miles de productos y se actualiza a medida que llegan los items.
+
+El id de cluster (`match_id`) es el id del primer producto del cluster y es
+estable entre corridas. ProductMatchingPipeline lo asigna a cada producto
+antes de publicarlo; `python command.py matches` lista los clusters y
+reindexa corridas anteriores.
+
+Configuración en config.yml (sección `matching`).
+"""
+
+import hashlib
+import os
+import random
+import re
+import sqlite3
+import struct
+import unicodedata
+import zlib
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from itemadapter import ItemAdapter
+
+from .config import load_config
+from .feed_diff import canonical_product_url
+from .normalization import canonical_attr_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    product_url TEXT NOT NULL UNIQUE,
+    name TEXT,
+    brand TEXT,
+    price REAL,
+    tokens TEXT NOT NULL,
+    cluster_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS products_cluster ON products (cluster_id, source);
+CREATE TABLE IF NOT EXISTS lsh (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    PRIMARY KEY (band, bucket, product_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS lsh_product ON lsh (product_id);
+"""
+
+MATCHING_FILENAME = 'matching.sqlite3'
+
+DEFAULT_NUM_PERM = 64
+DEFAULT_BANDS = 16
+DEFAULT_THRESHOLD = 0.6
+DEFAULT_MAX_PRICE_RATIO = 2.0
+DEFAULT_MAX_BUCKET = 200  # Candidatos por bucket (los buckets de nombres genéricos pueden ser enormes)
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_SEED = 20250625  # Fijo: las firmas guardadas tienen que ser comparables entre corridas
+
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+_UNIT_RE = re.compile(r'\b(\d+(?:[.,]\d+)?)\s+(cc|mm|cm|ml|lts?|kg|hp|w|v|ah|mah)\b')
+_STOPWORDS = frozenset({
+    'a', 'al', 'c', 'con', 'de', 'del', 'el', 'en', 'la', 'las', 'los', 'o', 'p', 'para', 'por', 'sin', 'un',
+    'una', 'y', 'x', 'moto', 'motos', 'nuevo', 'nueva', 'oferta', 'original',
+})
+# Claves de attrs (canónicas) que identifican marca y modelo
+_BRAND_KEYS = ('marca', 'brand', 'fabricante')
+_MODEL_KEYS = ('modelo', 'model')
+
+
+def matching_config() -> dict:
+    return load_config().get('matching') or {}
+
+
+def matching_enabled() -> bool:
+    return bool(matching_config().get('enabled'))
+
+
+def matching_path(build_dir: str = None) -> str:
+    if build_dir is not None:
+        return os.path.join(build_dir, MATCHING_FILENAME)
+    return matching_config().get('path') or os.path.join('build', MATCHING_FILENAME)
+
+
+@lru_cache(maxsize=4096)
+def normalize_words(text: str) -> Tuple[str, ...]:
+    """'Casco LS2 FF353 Rápid 150 cc' -> ('casco', 'ls2', 'ff353', 'rapid', '150cc')"""
+    ascii_text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii').lower()
+    ascii_text = _UNIT_RE.sub(lambda m: m.group(1).replace(',', '.') + m.group(2), ascii_text)
+    words = _NON_ALNUM_RE.sub(' ', ascii_text.replace('.', '')).split()
+    return tuple(word for word in words if word not in _STOPWORDS)
+
+
+def normalize_brand(brand: Optional[str]) -> Optional[str]:
+    if not brand:
+        return None
+    words = normalize_words(brand)
+    return ' '.join(words) or None
+
+
+def _attr(attrs, keys) -> Optional[str]:
+    if not isinstance(attrs, dict):
+        return None
+    for key, value in attrs.items():
+        if canonical_attr_key(key) in keys and isinstance(value, str) and value.strip():
+            return value
+    return None
+
+
+def product_tokens(product: dict) -> Tuple[Optional[str], Tuple[str, ...]]:
+    """(marca normalizada, palabras del nombre + modelo) de un producto del feed"""
+    attrs = product.get('attrs')
+    brand = normalize_brand(product.get('brand') or _attr(attrs, _BRAND_KEYS))
+    words = list(normalize_words(product.get('name') or ''))
+    model = _attr(attrs, _MODEL_KEYS)
+    if model:
+        words.extend(word for word in normalize_words(model) if word not in words)
+    if brand:
+        # La marca se compara aparte: en el nombre solo agrega ruido
+        brand_words = set(brand.split())
+        words = [word for word in words if word not in brand_words]
+    return brand, tuple(words)
+
+
+def shingles(words: Tuple[str, ...]) -> FrozenSet[str]:
+    """Conjunto de palabras: las tiendas cambian el orden ('120/70-17 Diablo Rosso' / 'Diablo Rosso 120 70 17')"""
+    return frozenset(words)
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    intersection = len(a & b)
+    return intersection / (len(a) + len(b) - intersection)
+
+
+class MinHashLSH:
+    """Firmas MinHash de `num_perm` permutaciones partidas en `bands` bandas"""
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, bands: int = DEFAULT_BANDS):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) tiene que ser múltiplo de bands ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = random.Random(_SEED)
+        self._perms = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)
+        ]
+
+    def signature(self, items: FrozenSet[str]) -> List[int]:
+        hashes = [zlib.crc32(item.encode('utf-8')) for item in items]
+        prime = _MERSENNE_PRIME
+        return [min((a * h + b) % prime for h in hashes) & 0xFFFFFFFF for a, b in self._perms]
+
+    def buckets(self, signature: List[int]) -> List[Tuple[int, int]]:
+        """(banda, clave de bucket de 63 bits) por banda"""
+        rows = self.rows
+        result = []
+        for band in range(self.bands):
+            packed = struct.pack(f'<{rows}I', *signature[band * rows:(band + 1) * rows])
+            key = int.from_bytes(hashlib.blake2b(packed, digest_size=8).digest(), 'little') >> 1
+            result.append((band, key))
+        return result
+
+
+class MatchIndex:
+    """Acceso al índice de matching; abrir y cerrar por operación (pipeline o command.py)"""
+
+    def __init__(self, path: str = None, num_perm: int = None, bands: int = None, threshold: float = None,
+                 max_price_ratio: float = None, max_bucket: int = None):
+        cfg = matching_config()
+        self.path = path or matching_path()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self.lsh = MinHashLSH(
+            num_perm or cfg.get('num_perm', DEFAULT_NUM_PERM), bands or cfg.get('bands', DEFAULT_BANDS),
+        )
+        self._check_meta()
+        self.threshold = threshold if threshold is not None else cfg.get('threshold', DEFAULT_THRESHOLD)
+        self.max_price_ratio = max_price_ratio or cfg.get('max_price_ratio', DEFAULT_MAX_PRICE_RATIO)
+        self.max_bucket = max_bucket or cfg.get('max_bucket', DEFAULT_MAX_BUCKET)
+        self._brands = None  # Marcas conocidas, para detectarlas en nombres de productos sin marca
+
+    def _check_meta(self):
+        """Las firmas guardadas solo sirven con los mismos num_perm/bands"""
+        expected = {'num_perm': str(self.lsh.num_perm), 'bands': str(self.lsh.bands)}
+        stored = dict(self.conn.execute('SELECT key, value FROM meta').fetchall())
+        if not stored:
+            with self.conn:
+                self.conn.executemany('INSERT INTO meta (key, value) VALUES (?, ?)', expected.items())
+        elif any(stored.get(key) != value for key, value in expected.items()):
+            raise ValueError(
+                f"El índice {self.path} usa num_perm={stored.get('num_perm')} bands={stored.get('bands')}; "
+                f"borrarlo y reindexar para usar num_perm={self.lsh.num_perm} bands={self.lsh.bands}"
+            )
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def commit(self):
+        self.conn.commit()
+
+    # Indexado
+
+    def _detect_brand(self, words: Tuple[str, ...]) -> Tuple[Optional[str], Tuple[str, ...]]:
+        """Primera marca conocida que aparece en el nombre; se quita de las palabras"""
+        if self._brands is None:
+            self._brands = {
+                row[0] for row in self.conn.execute('SELECT DISTINCT brand FROM products WHERE brand IS NOT NULL')
+            }
+        for word in words:
+            if word in self._brands:
+                return word, tuple(other for other in words if other != word)
+        return None, words
+
+    def add(self, source: str, product: dict) -> Optional[int]:
+        """
+        Indexa un producto (o lo actualiza si cambió el nombre) y devuelve su id de cluster.
+        No hace commit: el pipeline confirma por lotes con commit().
+        """
+        url = product.get('product_url')
+        if not url:
+            return None
+        url = canonical_product_url(url)
+        brand, words = product_tokens(product)
+        if brand is None:
+            brand, words = self._detect_brand(words)
+        elif self._brands is not None:
+            self._brands.add(brand)
+        if not words:
+            return None
+        tokens = ' '.join(words)
+        price = product.get('price')
+
+        existing = self.conn.execute(
+            'SELECT id, brand, tokens, cluster_id FROM products WHERE product_url = ?', (url,)
+        ).fetchone()
+        if existing is not None and existing['tokens'] == tokens and existing['brand'] == brand:
+            self.conn.execute('UPDATE products SET price = ?, name = ? WHERE id = ?',
+                              (price, product.get('name'), existing['id']))
+            return existing['cluster_id']
+
+        items = shingles(words)
+        buckets = self.lsh.buckets(self.lsh.signature(items))
+        product_id = existing['id'] if existing is not None else None
+        cluster_id = self._best_cluster(buckets, brand, items, price, exclude=product_id)
+
+        if product_id is None:
+            product_id = self.conn.execute(
+                'INSERT INTO products (source, product_url, name, brand, price, tokens, cluster_id) '
+                'VALUES (?, ?, ?, ?, ?, ?, 0)',
+                (source, url, product.get('name'), brand, price, tokens),
+            ).lastrowid
+        else:
+            self.conn.execute('DELETE FROM lsh WHERE product_id = ?', (product_id,))
+        cluster_id = cluster_id or product_id
+        self.conn.execute(
+            'UPDATE products SET source = ?, name = ?, brand = ?, price = ?, tokens = ?, cluster_id = ? WHERE id = ?',
+            (source, product.get('name'), brand, price, tokens, cluster_id, product_id),
+        )
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO lsh (band, bucket, product_id) VALUES (?, ?, ?)',
+            [(band, bucket, product_id) for band, bucket in buckets],
+        )
+        return cluster_id
+
+    def _candidates(self, buckets) -> List[int]:
+        ids = set()
+        for band, bucket in buckets:
+            ids.update(row[0] for row in self.conn.execute(
+                'SELECT product_id FROM lsh WHERE band = ? AND bucket = ? LIMIT ?', (band, bucket, self.max_bucket)
+            ))
+        return list(ids)
+
+    def _best_cluster(self, buckets, brand, items, price, exclude=None) -> Optional[int]:
+        """Cluster del candidato más parecido que supera el umbral, o None"""
+        ids = [product_id for product_id in self._candidates(buckets) if product_id != exclude]
+        best_score, best_cluster = 0.0, None
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT brand, price, tokens, cluster_id FROM products WHERE id IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            )
+            for row in rows:
+                if brand and row['brand'] and brand != row['brand']:
+                    continue
+                if price and row['price'] and max(price, row['price']) / min(price, row['price']) > self.max_price_ratio:
+                    continue
+                score = jaccard(items, shingles(tuple(row['tokens'].split())))
+                if score >= self.threshold and score > best_score:
+                    best_score, best_cluster = score, row['cluster_id']
+        return best_cluster
+
+    # Consultas
+
+    def cluster_of(self, product_url: str) -> Optional[int]:
+        row = self.conn.execute(
+            'SELECT cluster_id FROM products WHERE product_url = ?', (canonical_product_url(product_url),)
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def cluster(self, cluster_id: int) -> List[sqlite3.Row]:
+        return self.conn.execute(
+            'SELECT source, product_url, name, brand, price FROM products WHERE cluster_id = ? ORDER BY price',
+            (cluster_id,),
+        ).fetchall()
+
+    def clusters(self, min_stores: int = 2, source: str = None, limit: int = 50) -> List[sqlite3.Row]:
+        """Clusters con productos de al menos `min_stores` tiendas (opcionalmente incluyendo `source`)"""
+        sql = (
+            'SELECT cluster_id, COUNT(*) AS products, COUNT(DISTINCT source) AS stores, '
+            'MIN(price) AS min_price, MAX(price) AS max_price, MIN(name) AS name '
+            'FROM products GROUP BY cluster_id HAVING stores >= ?'
+        )
+        params = [min_stores]
+        if source:
+            sql += ' AND SUM(source = ?) > 0'
+            params.append(source)
+        sql += ' ORDER BY stores DESC, products DESC LIMIT ?'
+        params.append(limit)
+        return self.conn.execute(sql, params).fetchall()
+
+    def stats(self) -> Dict[str, int]:
+        row = self.conn.execute(
+            'SELECT COUNT(*), COUNT(DISTINCT cluster_id) FROM products'
+        ).fetchone()
+        return {'products': row[0], 'clusters': row[1]}
+
+
+class ProductMatchingPipeline:
+    """Pipeline que asigna a cada producto el id de cluster entre tiendas (match_id)"""
+
+    def __init__(self):
+        cfg = matching_config()
+        self.enabled = bool(cfg.get('enabled'))
+        self.batch_size = cfg.get('batch_size', 500)
+        self.index = None
+        self.pending = 0
+        self.matched = 0
+
+    def open_spider(self, spider):
+        """Se ejecuta cuando se abre el spider"""
+        if not self.enabled:
+            return
+        try:
+            self.index = MatchIndex()
+        except (sqlite3.Error, ValueError) as e:
+            spider.logger.error(f"ProductMatchingPipeline: No se pudo abrir el índice de matching: {e}")
+            return
+        spider.logger.info(f"ProductMatchingPipeline: Indexando productos en {self.index.path}")
+
+    def process_item(self, item, spider):
+        """Se ejecuta por cada item. Solo procesa items de tipo 'product'"""
+        adapter = ItemAdapter(item)
+        if self.index is None or adapter.get('item_type') != 'product':
+            return item
+        try:
+            match_id = self.index.add(spider.name, adapter.asdict())
+        except sqlite3.Error as e:
+            spider.logger.error(f"ProductMatchingPipeline: Error indexando producto: {e}",
+                                extra={'url': adapter.get('product_url')})
+            return item
+        if match_id is not None:
+            adapter['match_id'] = match_id
+            self.matched += 1
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.index.commit()
+            self.pending = 0
+        return item
+
+    def close_spider(self, spider):
+        """Se ejecuta al finalizar el spider"""
+        if self.index is None:
+            return
+        stats = self.index.stats()
+        self.index.close()
+        spider.logger.info(
+            f"ProductMatchingPipeline: {self.matched} productos indexados; "
+            f"índice con {stats['products']} productos en {stats['clusters']} clusters"
+        )
@@ -0,0 +1,126 @@
+"""
+Codecs de mensajes para RabbitMQ.
+
+Serializa los items con el formato configurado en config.yml (`rabbitmq.codec`)
+y opcionalmente los comprime (`rabbitmq.compression`, ver compression.py).
+Cada mensaje lleva content_type, content_encoding y la versión del formato en
+los headers AMQP, así los consumidores pueden decodificarlo con decode_message
+sin conocer la configuración del crawler.
+
+Codecs:
+- json: stdlib, UTF-8 sin escapar (formato histórico)
+- orjson: mismo JSON, varias veces más rápido (si no está instalado se usa json)
+- msgpack: binario, más chico (si no está instalado se usa json)
+
+Instalar dependencias:
+pip install orjson msgpack
+"""
+
+import json
+from functools import lru_cache
+
+import pika
+
+from .compression import compress, decompress, resolve_codec
+from .config import load_config
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependencia opcional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - dependencia opcional
+    msgpack = None
+
+MESSAGE_VERSION = 1
+VERSION_HEADER = 'x-message-version'
+
+CONTENT_TYPE_JSON = 'application/json'
+CONTENT_TYPE_MSGPACK = 'application/msgpack'
+CONTENT_ENCODING_IDENTITY = 'identity'
+
+CODECS = ('json', 'orjson', 'msgpack')
+
+
+def _json_dumps(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+def _orjson_dumps(obj) -> bytes:
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _msgpack_dumps(obj) -> bytes:
+    return msgpack.packb(obj, use_bin_type=True)
+
+
+def resolve_format(codec: str = None) -> str:
+    """Devuelve el codec a usar, degradando a json si la librería no está instalada"""
+    codec = (codec or 'json').lower()
+    if codec not in CODECS:
+        raise ValueError(f"Codec de mensajes desconocido: {codec}")
+    if codec == 'orjson' and orjson is None:
+        return 'json'
+    if codec == 'msgpack' and msgpack is None:
+        return 'json'
+    return codec
+
+
+class MessageCodec:
+    """Serializa (y comprime) mensajes y arma las propiedades AMQP correspondientes"""
+
+    def __init__(self, codec: str = 'json', compression: str = 'none'):
+        self.codec = resolve_format(codec)
+        self.compression = resolve_codec(compression or 'none')
+        self._dumps = {'json': _json_dumps, 'orjson': _orjson_dumps, 'msgpack': _msgpack_dumps}[self.codec]
+        self.content_type = CONTENT_TYPE_MSGPACK if self.codec == 'msgpack' else CONTENT_TYPE_JSON
+        self.content_encoding = CONTENT_ENCODING_IDENTITY if self.compression == 'none' else self.compression
+        # Las propiedades son las mismas para todos los mensajes: se arman una sola vez
+        self.properties = pika.BasicProperties(
+            content_type=self.content_type,
+            content_encoding=self.content_encoding,
+            headers={VERSION_HEADER: MESSAGE_VERSION},
+        )
+
+    def properties_for(self, message_id: str) -> pika.BasicProperties:
+        """Propiedades del codec con message_id (clave de idempotencia)"""
+        return pika.BasicProperties(
+            content_type=self.content_type,
+            content_encoding=self.content_encoding,
+            headers=self.properties.headers,
+            message_id=message_id,
+        )
+
+    def encode(self, obj) -> bytes:
+        body = self._dumps(obj)
+        if self.compression != 'none':
+            body = compress(body, self.compression)
+        return body
+
+    def __repr__(self):
+        return f'MessageCodec({self.codec!r}, {self.compression!r})'
+
+
+def decode_message(body: bytes, content_type: str = None, content_encoding: str = None):
+    """
+    Decodifica un mensaje publicado con MessageCodec a partir de sus propiedades AMQP.
+    Sin propiedades se asume el formato histórico (JSON sin comprimir).
+    """
+    if content_encoding and content_encoding != CONTENT_ENCODING_IDENTITY:
+        body = decompress(body, content_encoding)
+    if content_type == CONTENT_TYPE_MSGPACK:
+        if msgpack is None:
+            raise RuntimeError("Se requiere 'msgpack' para leer mensajes application/msgpack")
+        return msgpack.unpackb(body, raw=False)
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+@lru_cache(maxsize=1)
+def get_message_codec() -> MessageCodec:
+    """Codec configurado en config.yml (compartido por pipelines y command.py)"""
+    cfg = load_config()['rabbitmq']
+    return MessageCodec(cfg.get('codec', 'json'), cfg.get('compression', 'none'))
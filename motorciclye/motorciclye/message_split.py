@@ -0,0 +1,115 @@
+"""
+Mensajes de producto divididos en parte estática y parte volátil.
+
+Entre corridas solo cambian precio, descuento (porcentaje y texto), cuotas y
+stock; descripción, imágenes, atributos y medios de pago casi nunca. Con
+`rabbitmq.split.enabled` el pipeline de productos publica:
+
+- `<prefix>.<volatile_key>.<spider>`: un PriceUpdateItem chico (product_url,
+  price, discount_percent, discount_text, installments, stock, spider,
+  static_hash) por cada producto scrapeado.
+- `<prefix>.<static_key>.<spider>`: el producto sin los campos volátiles,
+  solo cuando el hash de su contenido cambió respecto del último publicado
+  (o el producto es nuevo).
+
+El hash cubre solo el contenido propio del producto (STATIC_HASH_FIELDS). El
+menú y la categoría por los que se llegó, match_id e image_keys dependen del
+recorrido o del enriquecimiento y viajan en el mensaje estático, pero no lo
+republican: si no, un producto listado en dos categorías cambiaría de hash
+según cuál se visitó primero.
+
+Los hashes publicados se guardan en SQLite por spider (`split.dir`), así
+una corrida diaria sin cambios de catálogo publica solo mensajes volátiles.
+`static_hash` en el mensaje volátil permite a los consumidores detectar que
+les falta la parte estática (por ejemplo tras perder su base) y pedir un
+`python command.py resend`, que sigue publicando productos completos.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Optional, Tuple
+
+from .config import load_config
+from .items import PriceUpdateItem
+
+VOLATILE_FIELDS = ('price', 'discount_percent', 'discount_text', 'installments', 'stock')
+STATIC_HASH_FIELDS = ('product_url', 'name', 'brand', 'attrs', 'description', 'images', 'payments')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS static_hashes (
+    product_url TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    published_at REAL NOT NULL
+);
+"""
+
+
+def split_config() -> dict:
+    return (load_config().get('rabbitmq') or {}).get('split') or {}
+
+
+def static_hash(static: dict) -> str:
+    """Hash estable del contenido propio del producto (claves ordenadas, independiente del codec)"""
+    content = {key: static.get(key) for key in STATIC_HASH_FIELDS}
+    raw = json.dumps(content, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.blake2b(raw.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def split_product(product: dict, spider_name: str) -> Tuple[dict, dict, str]:
+    """Producto completo -> (parte estática, parte volátil, hash de la estática)"""
+    static = {key: value for key, value in product.items() if key not in VOLATILE_FIELDS}
+    static['item_type'] = 'product_static'
+    digest = static_hash(static)
+    volatile = PriceUpdateItem(
+        product_url=product['product_url'],
+        price=product.get('price'),
+        discount_percent=product.get('discount_percent'),
+        discount_text=product.get('discount_text'),
+        installments=product.get('installments'),
+        stock=product.get('stock'),
+        spider=spider_name,
+        static_hash=digest,
+    ).to_dict()
+    return static, volatile, digest
+
+
+class StaticHashStore:
+    """Último hash estático publicado por producto (SQLite por spider)"""
+
+    def __init__(self, spider_name: str, directory: str = None):
+        directory = directory or split_config().get('dir') or os.path.join('build', 'static_hashes')
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f'{spider_name}.sqlite3')
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self.hashes: Dict[str, str] = dict(self.conn.execute('SELECT product_url, hash FROM static_hashes'))
+        self._dirty = {}
+
+    def get(self, product_url: str) -> Optional[str]:
+        return self.hashes.get(product_url)
+
+    def remember(self, product_url: str, digest: str, flush_every: int = 500):
+        self.hashes[product_url] = digest
+        self._dirty[product_url] = digest
+        if len(self._dirty) >= flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self._dirty:
+            return
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO static_hashes (product_url, hash, published_at) VALUES (?, ?, ?)',
+                [(url, digest, now) for url, digest in self._dirty.items()],
+            )
+        self._dirty = {}
+
+    def close(self):
+        self.flush()
+        self.conn.close()
@@ -0,0 +1,92 @@
+"""
+Normalización memoizada de campos de texto repetitivos.
+
+Textos como "6 cuotas sin interés", "20% OFF", los nombres de menú/categoría
+y las claves de atributos se repiten en miles de productos. Cada texto
+distinto se normaliza una sola vez (caches LRU acotados) y los resultados se
+internan con sys.intern, así los items comparten las mismas instancias.
+
+- normalize_text: colapsa espacios y quita bordes ("  Cascos \\n" -> "Cascos")
+- canonical_attr_key: clave de atributo canónica ("Cilindrada (cc)" -> "cilindrada_cc"),
+  solo para uso interno (matching); los mensajes publican las claves originales
+- parse_discount: porcentaje de descuento ("20% OFF" -> 20.0)
+- parse_installments: cuotas ("6 cuotas sin interés de $ 1.234" -> count=6, amount=1234.0)
+"""
+
+import re
+import sys
+import unicodedata
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+from .prices import STATUS_OK, PRICE_PARSER
+
+CACHE_SIZE = 4096  # Textos distintos por función
+
+_SPACES_RE = re.compile(r'\s+')
+_KEY_INVALID_RE = re.compile(r'[^a-z0-9]+')
+_DISCOUNT_RE = re.compile(r'\b(\d{1,3}(?:[.,]\d+)?)\s*%')  # \b: "100% OFF" es 100, no 00
+_INSTALLMENTS_RE = re.compile(r'(\d{1,2})\s*(?:x|cuotas?)\b', re.IGNORECASE)
+_INTEREST_FREE_RE = re.compile(r'sin\s+inter[eé]s|0\s*%\s*inter[eé]s', re.IGNORECASE)
+
+
+class Installments(NamedTuple):
+    count: int
+    amount: Optional[float]  # Monto de cada cuota, si el texto lo indica
+    interest_free: bool
+
+    def to_dict(self) -> dict:
+        return {'count': self.count, 'amount': self.amount, 'interest_free': self.interest_free}
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def normalize_text(text: str) -> str:
+    return sys.intern(_SPACES_RE.sub(' ', text).strip())
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def canonical_attr_key(key: str) -> str:
+    """Minúsculas, sin acentos y con '_' como único separador"""
+    ascii_key = unicodedata.normalize('NFKD', key).encode('ascii', 'ignore').decode('ascii')
+    return sys.intern(_KEY_INVALID_RE.sub('_', ascii_key.lower()).strip('_'))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_discount(text: str) -> Optional[float]:
+    match = _DISCOUNT_RE.search(text)
+    if not match:
+        return None
+    return float(match.group(1).replace(',', '.'))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_installments(text: str) -> Optional[Installments]:
+    match = _INSTALLMENTS_RE.search(text)
+    if not match:
+        return None
+    price = PRICE_PARSER.parse(text)
+    amount = price.value if price.status == STATUS_OK and price.installments else None
+    return Installments(int(match.group(1)), amount, bool(_INTEREST_FREE_RE.search(text)))
+
+
+def normalize_attrs(attrs):
+    """
+    Dict de atributos con valores normalizados; las claves quedan como las publica
+    la tienda (solo internadas), los consumidores del mensaje las usan tal cual
+    """
+    if isinstance(attrs, dict):
+        return {
+            sys.intern(key) if isinstance(key, str) else key: normalize_text(value) if isinstance(value, str) else value
+            for key, value in attrs.items()
+        }
+    if isinstance(attrs, list):
+        return [normalize_text(value) if isinstance(value, str) else value for value in attrs]
+    return attrs
+
+
+def cache_stats() -> dict:
+    """Hits/misses por función, para loguear al cerrar el spider"""
+    return {
+        func.__name__: func.cache_info()._asdict()
+        for func in (normalize_text, canonical_attr_key, parse_discount, parse_installments)
+    }
@@ -0,0 +1,309 @@
+"""
+Outbox durable para los mensajes a RabbitMQ.
+
+Los pipelines no publican directamente: guardan cada mensaje en una base
+SQLite (WAL) por spider y un thread publicador los envía en segundo plano,
+con reintentos y backoff exponencial si el broker no está disponible o es
+lento. El canal del publicador usa publisher confirms (confirm_delivery) y
+los mensajes van con mandatory: un mensaje se borra del outbox recién cuando
+el broker confirmó que lo encoló. Un nack o un mensaje sin cola destino
+(NackError, UnroutableError) queda en el outbox y se reintenta con backoff,
+igual que una caída del broker (o del crawler), así que no se pierden items:
+lo pendiente se publica al final de la corrida, en la próxima o con
+`python command.py outbox-drain`.
+
+Cada mensaje lleva una clave de idempotencia en `message_id` (run_id + spider
++ URL del producto, o número de envelope) para que los consumidores puedan
+descartar duplicados si un mensaje se publica dos veces.
+
+Configuración en config.yml (sección `outbox`).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+import pika
+from pika.exceptions import NackError, UnroutableError
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+from .config import load_config
+from .rabbit_connection import get_rabbit_connection, publish_message
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    message_id TEXT NOT NULL UNIQUE,
+    routing_key TEXT NOT NULL,
+    body BLOB NOT NULL,
+    content_type TEXT,
+    content_encoding TEXT,
+    headers TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_next_attempt ON outbox (next_attempt_at, id);
+"""
+
+
+def outbox_config() -> dict:
+    return load_config().get('outbox') or {}
+
+
+def outbox_enabled() -> bool:
+    return bool(outbox_config().get('enabled'))
+
+
+def idempotency_key(*parts) -> str:
+    """Clave estable para message_id a partir de run_id, spider, URL, etc."""
+    raw = '\x1f'.join('' if part is None else str(part) for part in parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def outbox_path(spider_name: str) -> str:
+    directory = outbox_config().get('dir', os.path.join('build', 'outbox'))
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f'{spider_name}.sqlite3')
+
+
+class Outbox:
+    """Cola durable de mensajes sobre SQLite. Cada thread usa su propia conexión"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connect()  # Crea el esquema desde el thread que abre el outbox
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def put(self, message_id: str, routing_key: str, body: bytes, properties: Optional[pika.BasicProperties] = None):
+        """Guarda un mensaje; si ya había uno con la misma clave se reemplaza"""
+        conn = self._connect()
+        conn.execute(
+            'INSERT OR REPLACE INTO outbox '
+            '(message_id, routing_key, body, content_type, content_encoding, headers, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (
+                message_id,
+                routing_key,
+                body if isinstance(body, bytes) else body.encode('utf-8'),
+                getattr(properties, 'content_type', None),
+                getattr(properties, 'content_encoding', None),
+                json.dumps(properties.headers) if properties is not None and properties.headers else None,
+                time.time(),
+            ),
+        )
+        conn.commit()
+
+    def due(self, limit: int = 100) -> list:
+        conn = self._connect()
+        return conn.execute(
+            'SELECT id, message_id, routing_key, body, content_type, content_encoding, headers, attempts '
+            'FROM outbox WHERE next_attempt_at <= ? ORDER BY id LIMIT ?',
+            (time.time(), limit),
+        ).fetchall()
+
+    def ack(self, ids):
+        conn = self._connect()
+        conn.executemany('DELETE FROM outbox WHERE id = ?', [(i,) for i in ids])
+        conn.commit()
+
+    def retry_later(self, row_id: int, attempts: int, delay: float, error: str):
+        conn = self._connect()
+        conn.execute(
+            'UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?',
+            (attempts, time.time() + delay, error[:500], row_id),
+        )
+        conn.commit()
+
+    def reset_backoff(self):
+        """Hace que todos los mensajes pendientes puedan reintentarse ya"""
+        conn = self._connect()
+        conn.execute('UPDATE outbox SET next_attempt_at = 0')
+        conn.commit()
+
+    def pending(self) -> int:
+        return self._connect().execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class OutboxPublisher(threading.Thread):
+    """Thread que publica lo pendiente del outbox con su propia conexión a RabbitMQ"""
+
+    def __init__(self, outbox: Outbox, batch_size: int = 100, poll_interval: float = 0.5, max_backoff: float = 300):
+        super().__init__(name=f'outbox-publisher-{os.path.basename(outbox.path)}', daemon=True)
+        self.outbox = outbox
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff
+        self.published = 0
+        self.failed_attempts = 0
+        self._stop_event = threading.Event()
+        self._drain_deadline = None
+        self._connection = None
+        self._channel = None
+
+    def run(self):
+        try:
+            while True:
+                sent = self.publish_due()
+                if self._stop_event.is_set():
+                    if not sent or time.monotonic() >= self._drain_deadline:
+                        break
+                elif not sent:
+                    self._stop_event.wait(self.poll_interval)
+        finally:
+            self.disconnect()
+            self.outbox.close()
+
+    def stop(self, drain_timeout: float = 30):
+        """Pide al thread que publique lo pendiente (hasta drain_timeout segundos) y termine"""
+        self._drain_deadline = time.monotonic() + drain_timeout
+        self._stop_event.set()
+        self.join(drain_timeout + 5)
+
+    def publish_due(self) -> int:
+        """Publica un lote de mensajes vencidos. Devuelve cuántos se publicaron"""
+        rows = self.outbox.due(self.batch_size)
+        if not rows:
+            return 0
+        published = []
+        try:
+            for row_id, message_id, routing_key, body, content_type, content_encoding, headers, attempts in rows:
+                properties = pika.BasicProperties(
+                    content_type=content_type,
+                    content_encoding=content_encoding,
+                    headers=json.loads(headers) if headers else None,
+                    message_id=message_id,
+                )
+                try:
+                    # Con confirm_delivery vuelve recién con el ack del broker
+                    publish_message(self._get_channel(), routing_key, body, properties, mandatory=True)
+                except UnroutableError as e:
+                    # Sin cola destino (todavía): el canal sigue sano, se reintenta este y se sigue con el resto
+                    self._retry_later(row_id, message_id, attempts, e)
+                    continue
+                except NackError as e:
+                    # El broker rechazó el mensaje (sin recursos): se reintenta con backoff sin reconectar
+                    self._retry_later(row_id, message_id, attempts, e)
+                    break
+                except Exception as e:
+                    # Se reintenta este mensaje más tarde y se reconecta para el resto
+                    self._retry_later(row_id, message_id, attempts, e)
+                    self.disconnect()
+                    break
+                published.append(row_id)
+        finally:
+            if published:
+                self.outbox.ack(published)
+                self.published += len(published)
+        return len(published)
+
+    def _retry_later(self, row_id: int, message_id: str, attempts: int, error: Exception):
+        self.failed_attempts += 1
+        delay = min(self.max_backoff, 2 ** attempts)
+        self.outbox.retry_later(row_id, attempts + 1, delay, repr(error))
+        logger.warning(f"Outbox: error publicando {message_id} (intento {attempts + 1}, reintento en {delay}s): {error!r}")
+
+    def _get_channel(self):
+        if self._channel is None or self._channel.is_closed:
+            self._connection = get_rabbit_connection()
+            self._channel = self._connection.channel()
+            self._channel.confirm_delivery()
+        return self._channel
+
+    def disconnect(self):
+        for resource in (self._channel, self._connection):
+            try:
+                if resource is not None and resource.is_open:
+                    resource.close()
+            except Exception:
+                pass
+        self._channel = None
+        self._connection = None
+
+
+_outboxes = {}
+_outboxes_lock = threading.Lock()
+
+
+def get_outbox(spider_name: str) -> Outbox:
+    """Outbox compartido por los pipelines del spider en este proceso"""
+    with _outboxes_lock:
+        if spider_name not in _outboxes:
+            _outboxes[spider_name] = Outbox(outbox_path(spider_name))
+        return _outboxes[spider_name]
+
+
+class OutboxExtension:
+    """
+    Arranca el publicador del outbox al abrir el spider y, al cerrarlo (después de
+    los pipelines), publica lo pendiente hasta `drain_timeout_secs`.
+
+    EXTENSIONS = {"motorciclye.outbox.OutboxExtension": 500}
+    """
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.publisher = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        cfg = outbox_config()
+        if not cfg.get('enabled'):
+            raise NotConfigured('Outbox deshabilitado en config.yml')
+        extension = cls(cfg)
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        outbox = get_outbox(spider.name)
+        pending = outbox.pending()
+        if pending:
+            spider.logger.info(f"Outbox: {pending} mensajes pendientes de corridas anteriores")
+        self.publisher = OutboxPublisher(
+            outbox,
+            batch_size=self.cfg.get('batch_size', 100),
+            poll_interval=self.cfg.get('poll_interval_secs', 0.5),
+            max_backoff=self.cfg.get('max_backoff_secs', 300),
+        )
+        self.publisher.start()
+
+    def spider_closed(self, spider):
+        if self.publisher is None:
+            return
+        self.publisher.stop(self.cfg.get('drain_timeout_secs', 30))
+        pending = get_outbox(spider.name).pending()
+        spider.logger.info(
+            f"Outbox: {self.publisher.published} mensajes publicados, {self.publisher.failed_attempts} intentos fallidos, "
+            f"{pending} pendientes"
+        )
+        if pending:
+            spider.logger.warning(
+                f"Outbox: quedaron {pending} mensajes sin publicar; se envían en la próxima corrida "
+                f"o con 'python command.py outbox-drain {spider.name}'"
+            )
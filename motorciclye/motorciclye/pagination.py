@@ -0,0 +1,139 @@
+"""
+Estrategias de paginación para los listados de productos.
+
+- next_link: sigue el link "siguiente" página por página (comportamiento original).
+- offset: calcula todas las páginas desde la primera usando el total de resultados
+  y URLs por offset (estilo MercadoLibre/MercadoShops: `_Desde_N`).
+- page_number: calcula todas las páginas desde la primera usando el número de la
+  última página (`?page=N` o una plantilla de URL).
+
+Las estrategias de fan-out devuelven todas las URLs de una vez para que Scrapy
+las descargue en paralelo hasta el límite de concurrencia por dominio. Las páginas
+generadas se marcan en meta para no volver a expandirse.
+"""
+
+import re
+from abc import ABC, abstractmethod
+from typing import List, NamedTuple, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+FANOUT_META_KEY = 'pagination_fanout'
+
+_DIGITS_RE = re.compile(r'\d+')
+_DESDE_RE = re.compile(r'_Desde_\d+')
+
+
+def _to_int(text: Optional[str]) -> Optional[int]:
+    """Convierte textos como '1.234 resultados' a 1234"""
+    if not text:
+        return None
+    digits = ''.join(_DIGITS_RE.findall(text))
+    return int(digits) if digits else None
+
+
+class PageUrls(NamedTuple):
+    """URLs de páginas a programar; fanout indica si fueron calculadas de una vez"""
+    urls: List[str]
+    fanout: bool = False
+
+
+class PaginationStrategy(ABC):
+    """Estrategia base: devuelve las URLs de las páginas siguientes a programar"""
+
+    def __init__(self, spider):
+        self.spider = spider
+
+    @abstractmethod
+    def next_page_urls(self, response, items_in_page: int) -> PageUrls:
+        """URLs a programar a partir de un listado con `items_in_page` productos"""
+
+    def _next_link(self, response) -> PageUrls:
+        next_page = self.spider.safe_xpath_get(response, self.spider.XPATH_NEXT_PAGE)
+        return PageUrls([response.urljoin(next_page)] if next_page else [])
+
+
+class NextLinkPagination(PaginationStrategy):
+    """Sigue el link de página siguiente (secuencial)"""
+
+    def next_page_urls(self, response, items_in_page):
+        return self._next_link(response)
+
+
+class OffsetPagination(PaginationStrategy):
+    """
+    Fan-out por offset (`_Desde_N`). Usa XPATH_TOTAL_RESULTS para conocer el total
+    y PAGINATION_PAGE_SIZE (o la cantidad de productos de la primera página) como
+    tamaño de página. Si no encuentra el total, vuelve a seguir el link siguiente.
+    """
+
+    def next_page_urls(self, response, items_in_page):
+        if response.meta.get(FANOUT_META_KEY):
+            return PageUrls([])
+        total = _to_int(self.spider.safe_xpath_get(response, self.spider.XPATH_TOTAL_RESULTS))
+        page_size = self.spider.PAGINATION_PAGE_SIZE or items_in_page
+        if not total or not page_size:
+            return self._next_link(response)
+
+        limit = self.spider.PAGINATION_MAX_PAGES
+        urls = []
+        for offset in range(page_size + 1, total + 1, page_size):
+            if limit and len(urls) + 1 >= limit:
+                break
+            urls.append(self.build_url(response.url, offset))
+        return PageUrls(urls, fanout=True)
+
+    @staticmethod
+    def build_url(url: str, offset: int) -> str:
+        """Agrega o reemplaza el segmento `_Desde_N` en el path de la URL"""
+        scheme, netloc, path, query, _ = urlsplit(url)
+        segment = f'_Desde_{offset}'
+        if _DESDE_RE.search(path):
+            path = _DESDE_RE.sub(segment, path)
+        else:
+            path = path.rstrip('/') + '/' + segment
+        return urlunsplit((scheme, netloc, path, query, ''))
+
+
+class PageNumberPagination(PaginationStrategy):
+    """
+    Fan-out por número de página. Usa XPATH_LAST_PAGE para conocer la última página
+    y construye las URLs con PAGINATION_URL_TEMPLATE (ej: '{url}page/{page}/', donde
+    {url} es la URL del listado sin query y terminada en '/') o, si no está definida,
+    con el parámetro de query PAGINATION_PARAM.
+    """
+
+    def next_page_urls(self, response, items_in_page):
+        if response.meta.get(FANOUT_META_KEY):
+            return PageUrls([])
+        last_page = _to_int(self.spider.safe_xpath_get(response, self.spider.XPATH_LAST_PAGE))
+        if not last_page:
+            return self._next_link(response)
+        if self.spider.PAGINATION_MAX_PAGES:
+            last_page = min(last_page, self.spider.PAGINATION_MAX_PAGES)
+        return PageUrls([self.build_url(response.url, page) for page in range(2, last_page + 1)], fanout=True)
+
+    def build_url(self, url: str, page: int) -> str:
+        template = self.spider.PAGINATION_URL_TEMPLATE
+        if template:
+            base_url = url.split('?', 1)[0].split('#', 1)[0].rstrip('/') + '/'
+            return template.format(url=base_url, page=page)
+        scheme, netloc, path, query, _ = urlsplit(url)
+        params = [(k, v) for k, v in parse_qsl(query, keep_blank_values=True) if k != self.spider.PAGINATION_PARAM]
+        params.append((self.spider.PAGINATION_PARAM, str(page)))
+        return urlunsplit((scheme, netloc, path, urlencode(params), ''))
+
+
+PAGINATION_STRATEGIES = {
+    'next_link': NextLinkPagination,
+    'offset': OffsetPagination,
+    'page_number': PageNumberPagination,
+}
+
+
+def get_pagination_strategy(spider) -> PaginationStrategy:
+    """Instancia la estrategia configurada en PAGINATION_STRATEGY del spider"""
+    name = getattr(spider, 'PAGINATION_STRATEGY', None) or 'next_link'
+    try:
+        return PAGINATION_STRATEGIES[name](spider)
+    except KeyError:
+        raise ValueError(f"Estrategia de paginación desconocida: {name}")
@@ -0,0 +1,254 @@
+"""
+Extracción de productos en un pool de procesos.
+
+Con `parsing.process_pool.enabled` el XPath de las páginas de producto no
+corre en el thread del reactor: BaseSpider.parse_product envía el body de la
+response a un ProcessPoolExecutor y el worker ejecuta
+`extract_product_fields` del spider sobre una response reconstruida. El
+reactor solo programa requests, arma el ProductItem con los campos devueltos
+(normalización y validación, que son baratas) y corre los pipelines, así el
+parseo escala con los cores disponibles.
+
+Los bodies grandes (>= `shared_memory_min_bytes`) viajan por memoria
+compartida (multiprocessing.shared_memory) en lugar de copiarse por el pipe
+del pool; los chicos se envían pickleados. Del meta de la request solo se
+envían los valores simples (str, números, listas, dicts).
+
+En el worker el spider se crea sin crawler: `extract_product_fields` solo
+puede usar la response y los atributos de clase (XPaths, etc.). Los logs de
+INFO o más del worker y los incrementos de `self.crawler.stats` se devuelven
+con el resultado y se aplican en el spider del proceso principal. Los errores de `extract_product_fields` vuelven como ExtractionError
+(el spider los maneja con handle_product_error, igual que en el reactor); solo
+si falla el pool en sí (proceso caído, un valor no pickleable, la memoria
+compartida) el error es PoolError y el producto se parsea en el reactor.
+"""
+
+import logging
+import multiprocessing
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Optional
+
+from scrapy.http import Request
+from scrapy.utils.misc import load_object
+from twisted.internet import defer
+from twisted.python.failure import Failure
+
+from .config import load_config
+
+DEFAULT_SHM_MIN_BYTES = 64 * 1024
+
+_SIMPLE_TYPES = (str, int, float, bool, type(None))
+
+# Estado de cada proceso worker
+_worker_spider = None
+
+
+class ExtractionError(Exception):
+    """extract_product_fields falló en el worker; `error` es la excepción original"""
+
+    @property
+    def error(self) -> Exception:
+        return self.args[0]
+
+
+class PoolError(Exception):
+    """Falla del pool y no de la extracción: proceso caído, pickling o memoria compartida"""
+
+
+def process_pool_config() -> dict:
+    return (load_config().get('parsing') or {}).get('process_pool') or {}
+
+
+def _object_path(obj) -> str:
+    return f'{obj.__module__}.{obj.__qualname__}'
+
+
+def _simple(value) -> bool:
+    if isinstance(value, _SIMPLE_TYPES):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(_simple(item) for item in value)
+    if isinstance(value, dict):
+        return all(isinstance(key, str) and _simple(item) for key, item in value.items())
+    return False
+
+
+def simple_meta(meta: dict) -> dict:
+    """Meta de la request sin objetos que no se pueden enviar al worker (drivers, callbacks, etc.)"""
+    return {key: value for key, value in meta.items() if isinstance(key, str) and _simple(value)}
+
+
+class _BufferedLogger:
+    """Logger del spider en el worker: guarda los mensajes de INFO o más para el proceso principal"""
+
+    def __init__(self):
+        self.records = []
+
+    def log(self, level, msg, *args, **kwargs):
+        if level >= logging.INFO:
+            self.records.append((level, msg % args if args else str(msg)))
+
+    def debug(self, msg, *args, **kwargs):
+        pass
+
+    def info(self, msg, *args, **kwargs):
+        self.log(logging.INFO, msg, *args)
+
+    def warning(self, msg, *args, **kwargs):
+        self.log(logging.WARNING, msg, *args)
+
+    def error(self, msg, *args, **kwargs):
+        self.log(logging.ERROR, msg, *args)
+
+    exception = error
+
+    def critical(self, msg, *args, **kwargs):
+        self.log(logging.CRITICAL, msg, *args)
+
+
+class _BufferedStats:
+    """Stats del spider en el worker: guarda los incrementos para sumarlos en el proceso principal"""
+
+    def __init__(self):
+        self.values = {}
+
+    def inc_value(self, key, count=1, start=0, spider=None):
+        self.values[key] = self.values.get(key, start) + count
+
+
+class _DetachedCrawler:
+    """Lo único del crawler disponible en el worker: las stats buffereadas"""
+
+    def __init__(self):
+        self.stats = _BufferedStats()
+
+
+def detached_spider(spider_cls):
+    """Spider sin __init__ ni crawler real, para llamar extract_product_fields fuera de una corrida"""
+    spider = spider_cls.__new__(spider_cls)
+    spider.logger = _BufferedLogger()
+    spider.crawler = _DetachedCrawler()
+    spider._pagination = None
+    return spider
+
+
+def _init_worker(spider_path: str):
+    global _worker_spider
+    _worker_spider = detached_spider(load_object(spider_path))
+
+
+def _extract(response_path, url, status, encoding, meta, shm_name, body_size, body):
+    """Se ejecuta en el worker: reconstruye la response y extrae los campos del producto"""
+    if shm_name is not None:
+        # Los workers spawn comparten el resource tracker del proceso principal, que libera el bloque
+        shm = shared_memory.SharedMemory(name=shm_name)
+        try:
+            body = bytes(shm.buf[:body_size])
+        finally:
+            shm.close()
+    response_cls = load_object(response_path)
+    response = response_cls(url=url, status=status, body=body, encoding=encoding, request=Request(url, meta=meta))
+    logger = _worker_spider.logger
+    logger.records = []
+    stats = _worker_spider.crawler.stats
+    stats.values = {}
+    try:
+        data = _worker_spider.extract_product_fields(response)
+    except Exception as e:
+        try:
+            pickle.dumps(e)
+        except Exception:
+            e = RuntimeError(repr(e))  # La excepción original no puede volver al proceso principal
+        raise ExtractionError(e) from None
+    return data, logger.records, stats.values
+
+
+class ParsePool:
+    """ProcessPoolExecutor de extracción para un spider; extract() devuelve un Deferred"""
+
+    def __init__(self, spider_cls, workers: int = None, shm_min_bytes: int = DEFAULT_SHM_MIN_BYTES):
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.shm_min_bytes = shm_min_bytes
+        # spawn: el proceso principal ya tiene threads (reactor, outbox, logging) y fork no es seguro
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(_object_path(spider_cls),),
+        )
+        self.submitted = 0
+        self.shared_bytes = 0
+
+    @classmethod
+    def from_config(cls, spider_cls) -> Optional['ParsePool']:
+        cfg = process_pool_config()
+        if not cfg.get('enabled'):
+            return None
+        return cls(spider_cls, cfg.get('workers') or None, cfg.get('shared_memory_min_bytes', DEFAULT_SHM_MIN_BYTES))
+
+    def extract(self, response) -> defer.Deferred:
+        """
+        Deferred con (campos del producto, logs y stats del worker); falla con ExtractionError
+        o PoolError (ver el docstring del módulo)
+        """
+        body = response.body
+        shm = None
+        if len(body) >= self.shm_min_bytes:
+            try:
+                shm = shared_memory.SharedMemory(create=True, size=len(body))
+            except OSError as e:
+                raise PoolError(f"Sin memoria compartida para {len(body)} bytes: {e!r}") from e
+            shm.buf[:len(body)] = body
+            self.shared_bytes += len(body)
+        try:
+            future = self.executor.submit(
+                _extract,
+                _object_path(type(response)),
+                response.url,
+                response.status,
+                getattr(response, 'encoding', None),
+                simple_meta(response.meta),
+                shm.name if shm is not None else None,
+                len(body),
+                None if shm is not None else body,
+            )
+        except Exception as e:
+            # Pool caído (BrokenProcessPool) o cerrado
+            self._release(shm)
+            raise PoolError(repr(e)) from e
+        self.submitted += 1
+        deferred = defer.Deferred()
+
+        def _done(done_future):
+            # Import diferido: importar el spider no tiene que instalar el reactor
+            from twisted.internet import reactor
+            self._release(shm)
+            reactor.callFromThread(self._fire, deferred, done_future)
+
+        future.add_done_callback(_done)
+        return deferred
+
+    @staticmethod
+    def _fire(deferred, future):
+        error = future.exception()
+        if error is not None and not isinstance(error, ExtractionError):
+            # BrokenProcessPool, pickling de argumentos o resultado, memoria compartida en el worker
+            pool_error = PoolError(repr(error))
+            pool_error.__cause__ = error
+            error = pool_error
+        if error is not None:
+            deferred.errback(Failure(error))
+        else:
+            deferred.callback(future.result())
+
+    @staticmethod
+    def _release(shm):
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,286 @@
+"""
+Historial de precios local (SQLite en build/price_history.sqlite3).
+
+PriceHistoryPipeline agrega una observación (producto, tienda, fecha, precio,
+descuento, stock) por cada producto scrapeado, así la evolución de precio de
+un producto es una consulta y no abrir un feed JSON por corrida.
+
+Para que la base quede chica solo se guardan los cambios: si el precio, el
+descuento y el stock son iguales a la última observación del producto no se
+agrega una fila, solo se actualiza `last_seen` en `latest`. Las observaciones
+están en una tabla WITHOUT ROWID con clave (product_id, observed_at), así el
+historial de un producto es un range scan sobre la clave primaria, y los
+agregados por tienda se calculan sobre `latest` (una fila por producto): el
+tiempo de consulta no depende de cuántas corridas haya.
+
+La fecha de cada observación es la del run_id de la corrida, igual para
+todos los productos de la corrida. Las corridas anteriores se importan con
+`python command.py prices backfill` desde el catálogo (ver run_catalog.py).
+
+Configuración en config.yml (sección `price_history`).
+"""
+
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from itemadapter import ItemAdapter
+
+from .config import load_config
+from .feed_diff import canonical_product_url
+from .items import item_to_dict
+from .runs import TIMESTAMP_FORMAT
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    product_url TEXT NOT NULL UNIQUE
+);
+CREATE INDEX IF NOT EXISTS products_source ON products (source, id);
+CREATE TABLE IF NOT EXISTS observations (
+    product_id INTEGER NOT NULL,
+    observed_at INTEGER NOT NULL,
+    price REAL,
+    discount_percent REAL,
+    stock TEXT,
+    PRIMARY KEY (product_id, observed_at)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS observations_observed_at ON observations (observed_at, product_id);
+CREATE TABLE IF NOT EXISTS latest (
+    product_id INTEGER PRIMARY KEY,
+    observed_at INTEGER NOT NULL,
+    last_seen INTEGER NOT NULL,
+    price REAL,
+    discount_percent REAL,
+    stock TEXT
+);
+CREATE TABLE IF NOT EXISTS imported_runs (
+    source TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    PRIMARY KEY (source, run_id)
+) WITHOUT ROWID;
+"""
+
+HISTORY_FILENAME = 'price_history.sqlite3'
+
+
+def price_history_config() -> dict:
+    return load_config().get('price_history') or {}
+
+
+def price_history_enabled() -> bool:
+    return bool(price_history_config().get('enabled'))
+
+
+def history_path(build_dir: str = None) -> str:
+    if build_dir is not None:
+        return os.path.join(build_dir, HISTORY_FILENAME)
+    return price_history_config().get('path') or os.path.join('build', HISTORY_FILENAME)
+
+
+def run_epoch(run_id: Optional[str]) -> int:
+    """Fecha de la corrida (YYYYmmddHHMMSS) en segundos; sin run_id, ahora"""
+    if run_id:
+        try:
+            return int(datetime.strptime(run_id, TIMESTAMP_FORMAT).timestamp())
+        except ValueError:
+            pass
+    return int(time.time())
+
+
+class PriceHistory:
+    """Acceso a la base de historial; abrir y cerrar por operación (pipeline o command.py)"""
+
+    def __init__(self, path: str = None):
+        self.path = path or history_path()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self._latest = {}  # source -> {product_url: (product_id, observed_at, price, discount, stock)}
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Escritura
+
+    def _latest_for(self, source: str) -> dict:
+        """Última observación de cada producto de la tienda, cargada una vez por tienda"""
+        latest = self._latest.get(source)
+        if latest is None:
+            latest = {
+                row[0]: tuple(row[1:])
+                for row in self.conn.execute(
+                    'SELECT p.product_url, p.id, l.observed_at, l.price, l.discount_percent, l.stock '
+                    'FROM products p LEFT JOIN latest l ON l.product_id = p.id WHERE p.source = ?',
+                    (source,),
+                )
+            }
+            self._latest[source] = latest
+        return latest
+
+    def record(self, source: str, observed_at: int, rows: Iterable[tuple]) -> dict:
+        """
+        Guarda observaciones (product_url, price, discount_percent, stock) de una tienda
+        en una sola transacción. Devuelve cuántas cambiaron, no cambiaron o se ignoraron
+        por ser más viejas que la última observación del producto.
+        """
+        latest = self._latest_for(source)
+        summary = {'changed': 0, 'unchanged': 0, 'stale': 0}
+        seen = []
+        with self.conn:
+            for product_url, price, discount, stock in rows:
+                if not product_url:
+                    continue
+                current = latest.get(product_url)
+                if current is None:
+                    product_id = self.conn.execute(
+                        'INSERT INTO products (source, product_url) VALUES (?, ?) '
+                        'ON CONFLICT (product_url) DO UPDATE SET source = excluded.source RETURNING id',
+                        (source, product_url),
+                    ).fetchone()[0]
+                    current = (product_id, None, None, None, None)
+                product_id, last_at = current[0], current[1]
+                if last_at is not None and observed_at < last_at:
+                    summary['stale'] += 1
+                    continue
+                if last_at is not None and current[2:] == (price, discount, stock):
+                    summary['unchanged'] += 1
+                    seen.append((observed_at, product_id))
+                    continue
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO observations (product_id, observed_at, price, discount_percent, stock) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (product_id, observed_at, price, discount, stock),
+                )
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO latest (product_id, observed_at, last_seen, price, discount_percent, stock) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (product_id, observed_at, observed_at, price, discount, stock),
+                )
+                latest[product_url] = (product_id, observed_at, price, discount, stock)
+                summary['changed'] += 1
+            self.conn.executemany('UPDATE latest SET last_seen = MAX(last_seen, ?) WHERE product_id = ?', seen)
+        return summary
+
+    def is_imported(self, source: str, run_id: str) -> bool:
+        return self.conn.execute(
+            'SELECT 1 FROM imported_runs WHERE source = ? AND run_id = ?', (source, run_id)
+        ).fetchone() is not None
+
+    def mark_imported(self, source: str, run_id: str):
+        with self.conn:
+            self.conn.execute('INSERT OR IGNORE INTO imported_runs (source, run_id) VALUES (?, ?)', (source, run_id))
+
+    # Consultas
+
+    def history(self, product_url: str, since: Optional[int] = None) -> List[sqlite3.Row]:
+        """Cambios de precio/descuento/stock de un producto, del más viejo al más nuevo"""
+        sql = ('SELECT p.source, o.observed_at, o.price, o.discount_percent, o.stock '
+               'FROM products p JOIN observations o ON o.product_id = p.id WHERE p.product_url = ?')
+        params = [canonical_product_url(product_url)]
+        if since is not None:
+            # Se incluye el último cambio anterior a `since`: es el precio vigente al inicio del período
+            sql += (' AND o.observed_at >= COALESCE((SELECT MAX(observed_at) FROM observations '
+                    'WHERE product_id = p.id AND observed_at <= ?), ?)')
+            params += [since, since]
+        return self.conn.execute(sql + ' ORDER BY o.observed_at', params).fetchall()
+
+    def store_summary(self, sources: Optional[List[str]] = None, since: Optional[int] = None) -> List[sqlite3.Row]:
+        """
+        Agregados por tienda sobre la última observación de cada producto (productos,
+        con precio, precio mínimo/promedio/máximo, descuento promedio) y cuántos
+        productos cambiaron desde `since`
+        """
+        since = since if since is not None else 0
+        sql = (
+            'SELECT p.source, COUNT(*) AS products, COUNT(l.price) AS priced, '
+            'MIN(l.price) AS min_price, AVG(l.price) AS avg_price, MAX(l.price) AS max_price, '
+            'AVG(l.discount_percent) AS avg_discount, MAX(l.last_seen) AS last_seen, '
+            'SUM(CASE WHEN l.observed_at >= ? THEN 1 ELSE 0 END) AS changed_since '
+            'FROM products p JOIN latest l ON l.product_id = p.id'
+        )
+        params = [since]
+        if sources:
+            sql += f" WHERE p.source IN ({', '.join('?' * len(sources))})"
+            params += list(sources)
+        return self.conn.execute(sql + ' GROUP BY p.source ORDER BY p.source', params).fetchall()
+
+
+def observation_row(product: dict) -> tuple:
+    """(product_url canónica, price, discount_percent, stock) de un producto del feed"""
+    url = product.get('product_url')
+    return (
+        canonical_product_url(url) if url else None,
+        product.get('price'),
+        product.get('discount_percent'),
+        product.get('stock'),
+    )
+
+
+class PriceHistoryPipeline:
+    """Pipeline que guarda el precio de cada producto en el historial local"""
+
+    def __init__(self):
+        cfg = price_history_config()
+        self.enabled = bool(cfg.get('enabled'))
+        self.batch_size = cfg.get('batch_size', 500)
+        self.store = None
+        self.buffer = []
+        self.observed_at = None
+        self.totals = {'changed': 0, 'unchanged': 0, 'stale': 0}
+
+    def open_spider(self, spider):
+        """Se ejecuta cuando se abre el spider"""
+        if not self.enabled:
+            return
+        try:
+            self.store = PriceHistory()
+        except sqlite3.Error as e:
+            spider.logger.error(f"PriceHistoryPipeline: No se pudo abrir el historial de precios: {e}")
+            return
+        self.observed_at = run_epoch(getattr(spider, 'run_id', None))
+        spider.logger.info(f"PriceHistoryPipeline: Guardando historial de precios en {self.store.path}")
+
+    def process_item(self, item, spider):
+        """Se ejecuta por cada item. Solo procesa items de tipo 'product'"""
+        if self.store is not None and ItemAdapter(item).get('item_type') == 'product':
+            self.buffer.append(observation_row(item_to_dict(item)))
+            if len(self.buffer) >= self.batch_size:
+                self._flush(spider)
+        return item
+
+    def _flush(self, spider):
+        rows, self.buffer = self.buffer, []
+        try:
+            summary = self.store.record(spider.name, self.observed_at, rows)
+        except sqlite3.Error as e:
+            spider.logger.error(f"PriceHistoryPipeline: Error guardando {len(rows)} observaciones: {e}")
+            return
+        for key, value in summary.items():
+            self.totals[key] += value
+
+    def close_spider(self, spider):
+        """Se ejecuta al finalizar el spider"""
+        if self.store is None:
+            return
+        if self.buffer:
+            self._flush(spider)
+        if getattr(spider, 'run_id', None):
+            self.store.mark_imported(spider.name, spider.run_id)
+        self.store.close()
+        spider.logger.info(
+            f"PriceHistoryPipeline: {self.totals['changed']} cambios de precio/stock, "
+            f"{self.totals['unchanged']} sin cambios"
+        )
@@ -0,0 +1,198 @@
+"""
+Motor de normalización de precios con reglas de locale (es-AR por defecto).
+
+Reemplaza la limpieza por regex en cada llamada de BaseSpider.clean_price y
+la lógica propia de cada spider. Todos los patrones se compilan una sola vez.
+
+Reglas es-AR:
+- '.' separa miles y ',' decimales: "$ 1.234,56" -> 1234.56, "$ 1.234" -> 1234.0
+- Si aparecen ambos separadores, el último es el decimal ("1,234.56" -> 1234.56)
+- Un único separador seguido de exactamente 3 dígitos es de miles
+- "consultar", "sin stock", "agotado", etc. devuelven value=None con su status
+- "6 cuotas de $ 1.234,56" se reconoce como precio en cuotas
+- Los porcentajes no son precios: "Oferta 20% OFF $ 1.000" -> 1000.0
+
+Los textos que no son del formato común ("Consultar", "Sin stock", leyendas de
+cuotas, monedas) se repiten mucho en un catálogo: su resultado se memoiza en
+un cache LRU acotado por parser.
+"""
+
+import re
+from functools import lru_cache
+from typing import Iterable, List, NamedTuple, Optional
+
+STATUS_OK = 'ok'
+STATUS_EMPTY = 'empty'
+STATUS_CONSULT = 'consultar'
+STATUS_OUT_OF_STOCK = 'sin_stock'
+STATUS_INVALID = 'invalid'
+
+
+class ParsedPrice(NamedTuple):
+    value: Optional[float]
+    status: str
+    currency: Optional[str] = None
+    installments: Optional[int] = None  # Si el texto es un precio en cuotas, value es el monto de cada cuota
+
+
+class LocaleRules(NamedTuple):
+    currencies: dict  # símbolo (en minúsculas) -> código ISO
+    default_currency: str
+    sentinels: dict  # regex -> status
+
+
+ES_AR = LocaleRules(
+    currencies={'$': 'ARS', 'ar$': 'ARS', 'ars': 'ARS', 'u$s': 'USD', 'us$': 'USD', 'usd': 'USD', 'u$d': 'USD'},
+    default_currency='ARS',
+    sentinels={
+        r'consult|a convenir': STATUS_CONSULT,
+        r'sin\s+stock|agotado|no\s+disponible|sin\s+existencia': STATUS_OUT_OF_STOCK,
+    },
+)
+
+LOCALES = {'es-AR': ES_AR}
+
+GENERAL_CACHE_SIZE = 4096
+
+
+class PriceParser:
+    """Parser de precios con patrones precompilados para un locale"""
+
+    def __init__(self, locale: str = 'es-AR', cache_size: int = GENERAL_CACHE_SIZE):
+        self.rules = LOCALES[locale]
+        if cache_size:
+            self._parse_general = lru_cache(maxsize=cache_size)(self._parse_general)
+        # Camino rápido para el formato más común: "$ 1.234.567" / "$ 1.234,56" / "1234"
+        self._simple_re = re.compile(r'\$?\s*(\d{1,3}(?:\.\d{3})+|\d+)(?:,(\d{1,2}))?')
+        self._number_re = re.compile(r'\d[\d.,\u00a0\u202f]*\d|\d')
+        # Con '%' en el texto se saltean los porcentajes ("20% OFF $ 1.000", "0% interés")
+        self._number_no_percent_re = re.compile(r'(?:\d[\d.,\u00a0\u202f]*\d|\d)(?![\d.,]*\s*%)')
+        # El camino general trabaja sobre el texto en minúsculas: sin re.IGNORECASE, que es más lento
+        symbols = sorted(self.rules.currencies, key=len, reverse=True)
+        self._currency_re = re.compile('|'.join(re.escape(s) for s in symbols))
+        # Un solo patrón con un grupo por status: match.lastgroup indica cuál coincidió
+        self._sentinel_re = re.compile(
+            '|'.join(f'(?P<{status}>{pattern})' for pattern, status in self.rules.sentinels.items())
+        )
+        self._installments_re = re.compile(r'(\d{1,2})\s*(?:x|cuotas?)\b')
+
+    def parse(self, text) -> ParsedPrice:
+        """Parsea un texto de precio; nunca lanza excepciones"""
+        if text is None:
+            return ParsedPrice(None, STATUS_EMPTY)
+        if isinstance(text, (int, float)):
+            return ParsedPrice(float(text), STATUS_OK, self.rules.default_currency)
+        text = text.strip()
+        if not text:
+            return ParsedPrice(None, STATUS_EMPTY)
+        value = self._parse_simple(text)
+        if value is not None:
+            return ParsedPrice(value, STATUS_OK, self.rules.default_currency)
+        return ParsedPrice(*self._parse_general(text))
+
+    def _parse_general(self, text: str) -> tuple:
+        """
+        Texto sin espacios alrededor que no es del formato común: sentinels,
+        monedas y cuotas. Devuelve una tupla con los campos de ParsedPrice
+        """
+        text = text.lower()
+        # Sentinels, cuotas y monedas que no son '$' necesitan letras: sin letras solo queda el número
+        has_letters = text.upper() != text
+        if has_letters:
+            sentinel = self._sentinel_re.search(text)
+            if sentinel:
+                return None, sentinel.lastgroup, None, None
+
+        number_re = self._number_no_percent_re if '%' in text else self._number_re
+        installments = None
+        number = None
+        if has_letters and ('x' in text or 'cuota' in text):
+            match = self._installments_re.search(text)
+            if match:
+                # En "6 cuotas de $ 1.234" el monto de la cuota está después de la cantidad
+                installments = int(match.group(1))
+                number = number_re.search(text, match.end())
+                if number is None:
+                    text = text[:match.start()] + text[match.end():]
+        if number is None:
+            number = number_re.search(text)
+        if not number:
+            return None, STATUS_INVALID, None, None
+        value = self.to_number(number.group())
+        if value is None:
+            return None, STATUS_INVALID, None, None
+
+        currency = self._currency_re.search(text) if has_letters else None
+        currency = self.rules.currencies[currency.group()] if currency else self.rules.default_currency
+        return value, STATUS_OK, currency, installments
+
+    def _parse_simple(self, text: str) -> Optional[float]:
+        if text.isdigit():
+            return float(text)
+        if text[0] != '$' and not text[0].isdigit():
+            return None
+        simple = self._simple_re.fullmatch(text)
+        if simple is None:
+            return None
+        integer, fraction = simple.groups()
+        integer = integer.replace('.', '')
+        return float(f'{integer}.{fraction}' if fraction else integer)
+
+    def to_number(self, token: str) -> Optional[float]:
+        """Convierte '1.234,56' / '1,234.56' / '1.234' a float según las reglas del locale"""
+        value = self._parse_simple(token)  # Miles con '.' y decimales con ',' (lo más común)
+        if value is not None:
+            return value
+        if '\u00a0' in token or '\u202f' in token:
+            token = token.replace('\u00a0', '').replace('\u202f', '')
+        last_dot = token.rfind('.')
+        last_comma = token.rfind(',')
+        if last_dot == -1 and last_comma == -1:
+            return float(token)
+
+        if last_dot != -1 and last_comma != -1:
+            decimal = '.' if last_dot > last_comma else ','
+        else:
+            sep = '.' if last_dot != -1 else ','
+            decimals = len(token) - max(last_dot, last_comma) - 1
+            if token.count(sep) > 1 or decimals == 3:
+                decimal = None  # Solo separadores de miles
+            else:
+                decimal = sep
+
+        if decimal is None:
+            integer, fraction = token, ''
+        else:
+            integer, _, fraction = token.rpartition(decimal)
+        integer = integer.replace('.', '').replace(',', '')
+        if not integer.isdigit() or (fraction and not fraction.isdigit()):
+            return None
+        return float(f'{integer}.{fraction}' if fraction else integer)
+
+    def to_float(self, text) -> Optional[float]:
+        """Atajo: devuelve solo el valor (None para vacíos, sentinels e inválidos)"""
+        if text.__class__ is str:
+            text = text.strip()
+            if not text:
+                return None
+            value = self._parse_simple(text)
+            if value is not None:
+                return value
+            # Sin armar el ParsedPrice: solo hace falta el valor
+            return self._parse_general(text)[0]
+        return self.parse(text).value
+
+    def parse_many(self, texts: Iterable) -> List[ParsedPrice]:
+        """API batch para validadores y post-procesamiento de feeds"""
+        parse = self.parse
+        return [parse(text) for text in texts]
+
+    def to_floats(self, texts: Iterable) -> List[Optional[float]]:
+        to_float = self.to_float
+        return [to_float(text) for text in texts]
+
+
+# Parser compartido para el locale por defecto
+PRICE_PARSER = PriceParser()
+parse_price = PRICE_PARSER.parse
+parse_prices = PRICE_PARSER.parse_many
@@ -1,6 +1,12 @@
-import json
 import time
 from datetime import datetime
+from itemadapter import ItemAdapter
+from twisted.internet import task
+from .envelope import EnvelopeBatcher
+from .items import item_to_dict
+from .message_codecs import MessageCodec, get_message_codec
+from .message_split import StaticHashStore, split_product
+from .outbox import get_outbox, idempotency_key, outbox_enabled
 from .rabbit_connection import get_rabbit_connection, publish_message
 from .config import load_config
 
@@ -9,43 +15,171 @@ class ProductProcessedPipeline:
     
     def __init__(self):
         self.processed_count = 0
-        self.connection = get_rabbit_connection()
-        self.channel = self.connection.channel()
+        self.outbox = None
+        self.connection = None
+        self.channel = None
+        if not outbox_enabled():
+            # Sin outbox se publica directo desde el pipeline
+            self.connection = get_rabbit_connection()
+            self.channel = self.connection.channel()
+        self.codec = get_message_codec()
+        cfg = load_config()['rabbitmq']
+        self.routing_key_prefix = cfg['routing_key_prefix']
+        self.envelope_cfg = cfg.get('envelope') or {}
+        self.split_cfg = cfg.get('split') or {}
+        self.batchers = {}  # kind -> EnvelopeBatcher ('products', o 'static'/'volatile' en modo split)
+        self.flush_loop = None
+        self.static_hashes = None
+        self._pending_static = {}  # product_url -> hash en sobres estáticos todavía no publicados
+        self.static_published = 0
+        self.static_skipped = 0
         
     
     def open_spider(self, spider):
         """Se ejecuta cuando se abre el spider"""
-        spider.logger.info(f"ProductProcessedPipeline: Iniciando publicación de productos para spider {spider.name}")
+        spider.logger.info(f"ProductProcessedPipeline: Iniciando publicación de productos para spider {spider.name} ({self.codec})")
+        if outbox_enabled():
+            self.outbox = get_outbox(spider.name)
+        if self.split_cfg.get('enabled'):
+            # Modo split: volátil siempre, estático solo si cambió (ver message_split.py)
+            self.static_hashes = StaticHashStore(spider.name, self.split_cfg.get('dir'))
+            spider.logger.info(
+                f"ProductProcessedPipeline: Modo split ({len(self.static_hashes.hashes)} hashes estáticos conocidos)"
+            )
+        if self.envelope_cfg.get('enabled'):
+            # Modo envelope: varios productos por mensaje (ver envelope.py)
+            codec = MessageCodec(self.codec.codec, self.envelope_cfg.get('compression', self.codec.compression))
+            kinds = ('static', 'volatile') if self.static_hashes is not None else ('products',)
+            for kind in kinds:
+                self.batchers[kind] = EnvelopeBatcher(
+                    codec,
+                    source=spider.name,
+                    run_id=getattr(spider, 'run_id', None),
+                    max_items=self.envelope_cfg.get('max_items', 200),
+                    max_wait_ms=self.envelope_cfg.get('max_wait_ms', 1000),
+                )
+            batcher = self.batchers[kinds[0]]
+            self.flush_loop = task.LoopingCall(self._flush_due_envelope, spider)
+            self.flush_loop.start(max(batcher.max_wait / 2, 0.05), now=False)
+            spider.logger.info(
+                f"ProductProcessedPipeline: Modo envelope ({batcher.max_items} productos / "
+                f"{batcher.max_wait * 1000:.0f} ms, {codec})"
+            )
     
     def process_item(self, item, spider):
         """Se ejecuta por cada item. Solo procesa items de tipo 'product'"""
         # Solo procesar si es un producto
-        if item.get('item_type') == 'product':
+        adapter = ItemAdapter(item)
+        if adapter.get('item_type') == 'product':
             self.processed_count += 1
             
             # Log básico
-            spider.logger.info(f"Pipeline: Procesando producto #{self.processed_count}: {item.get('name', 'Sin nombre')}")
+            spider.logger.info(
+                "Pipeline: Procesando producto #%d: %s", self.processed_count, adapter.get('name') or 'Sin nombre',
+                extra={'event': 'product_processed', 'url': adapter.get('product_url')}
+            )
             
             # Publicar en RabbitMQ
             self._publish_product_to_rabbitmq(item, spider)
         
         return item
     
+    def _routing_key(self, kind, spider):
+        """<prefix>.products.<spider>, o las claves de split.static_key / split.volatile_key"""
+        name = self.split_cfg.get(f'{kind}_key', kind) if kind != 'products' else 'products'
+        return f'{self.routing_key_prefix}.{name}.{spider.name}'
+
     def _publish_product_to_rabbitmq(self, product_item, spider):
-        cfg = load_config()['rabbitmq']
+        product = item_to_dict(product_item)
+        if self.static_hashes is None:
+            self._publish_message('products', product, spider)
+            return
+        url = product.get('product_url')
+        static, volatile, digest = split_product(product, spider.name)
+        if self.static_hashes.get(url) != digest and self._pending_static.get(url) != digest:
+            if 'static' in self.batchers:
+                # El hash se guarda cuando se publique el sobre que lo contiene
+                self._pending_static[url] = digest
+                self._publish_message('static', static, spider)
+            elif self._publish_message('static', static, spider):
+                self.static_hashes.remember(url, digest)
+            self.static_published += 1
+        else:
+            self.static_skipped += 1
+        self._publish_message('volatile', volatile, spider)
 
+    def _publish_message(self, kind, message_data, spider):
+        """Publica un mensaje (o lo agrega al sobre de su tipo). True si quedó publicado"""
+        batcher = self.batchers.get(kind)
+        if batcher is not None:
+            self._publish_envelope(batcher.add(message_data), kind, spider)
+            return False
+        url = message_data.get('product_url')
         try:
-            message = json.dumps(product_item, ensure_ascii=False)
-            routing_key = f'{cfg["routing_key_prefix"]}.products.{spider.name}'
-            publish_message(self.channel, routing_key, message)
-            spider.logger.info(f"Publicado producto en RabbitMQ: {product_item.get('name', 'Sin nombre')}")
+            message = self.codec.encode(message_data)
+            parts = (url,) if kind == 'products' else (kind, url)
+            message_id = idempotency_key(getattr(spider, 'run_id', None), spider.name, *parts)
+            self._send(self._routing_key(kind, spider), message, self.codec.properties, message_id)
+            spider.logger.info(
+                "Publicado producto en RabbitMQ: %s", message_data.get('name') or url,
+                extra={'event': 'product_published', 'url': url}
+            )
+            return True
         except Exception as e:
-            spider.logger.error(f"Error publicando producto: {e}")
+            spider.logger.error(f"Error publicando producto: {e}", extra={'url': url})
+            return False
         
     
+    def _flush_due_envelope(self, spider):
+        for kind, batcher in self.batchers.items():
+            if batcher.due():
+                self._publish_envelope(batcher.flush(), kind, spider)
+
+    def _publish_envelope(self, envelope, kind, spider):
+        if envelope is None:
+            return
+        try:
+            parts = ('envelope', envelope.seq) if kind == 'products' else ('envelope', kind, envelope.seq)
+            message_id = idempotency_key(getattr(spider, 'run_id', None), spider.name, *parts)
+            self._send(self._routing_key(kind, spider), envelope.body, envelope.properties, message_id)
+            spider.logger.info(
+                "Publicado envelope #%d en RabbitMQ: %d productos, %d bytes", envelope.seq, envelope.count, len(envelope.body),
+                extra={'event': 'envelope_published'}
+            )
+        except Exception as e:
+            spider.logger.error(f"Error publicando envelope #{envelope.seq} ({envelope.count} productos): {e}")
+            if kind == 'static':
+                self._pending_static = {}  # Se vuelven a publicar en la próxima corrida
+            return
+        if kind == 'static':
+            # El sobre estático lleva todo lo pendiente: recién ahora se guardan los hashes
+            for url, digest in self._pending_static.items():
+                self.static_hashes.remember(url, digest)
+            self._pending_static = {}
+
+    def _send(self, routing_key, body, properties, message_id):
+        """Guarda el mensaje en el outbox (lo publica OutboxExtension) o lo publica directo"""
+        if self.outbox is not None:
+            self.outbox.put(message_id, routing_key, body, properties)
+        else:
+            publish_message(self.channel, routing_key, body, properties)
+
     def close_spider(self, spider):
         """Se ejecuta al finalizar el spider"""
+        if self.batchers:
+            if self.flush_loop.running:
+                self.flush_loop.stop()
+            for kind, batcher in self.batchers.items():
+                self._publish_envelope(batcher.flush(), kind, spider)
+                spider.logger.info(f"Pipeline: Envelopes publicados ({kind}): {batcher.seq}")
+        if self.static_hashes is not None:
+            self.static_hashes.close()
+            spider.logger.info(
+                f"Pipeline: Partes estáticas publicadas: {self.static_published}, "
+                f"sin cambios (solo volátil): {self.static_skipped}"
+            )
         if self.processed_count > 0:
             spider.logger.info(f"Pipeline: Total productos publicados en RabbitMQ: {self.processed_count}")
-        self.channel.close()
-        self.connection.close()
+        if self.connection is not None:
+            self.channel.close()
+            self.connection.close()
@@ -1,6 +1,10 @@
 import pika
 import os
+import queue
 import sys
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))))
 from .config import load_config
 
@@ -15,10 +19,91 @@ def get_rabbit_connection():
     )
     return pika.BlockingConnection(parameters)
 
-def publish_message(channel, routing_key, message):
-    cfg = load_config()['rabbitmq']
+@lru_cache(maxsize=1)
+def get_exchange():
+    return load_config()['rabbitmq']['exchange']
+
+def publish_message(channel, routing_key, message, properties=None, mandatory=False):
+    """
+    Publica el mensaje; properties lleva content_type/encoding del codec (ver message_codecs.py).
+    En un canal con confirm_delivery() vuelve recién con el ack del broker; con
+    mandatory=True un mensaje sin cola destino levanta UnroutableError
+    """
     channel.basic_publish(
-        exchange=cfg['exchange'],
+        exchange=get_exchange(),
         routing_key=routing_key,
-        body=message
+        body=message,
+        properties=properties,
+        mandatory=mandatory
     )
+
+
+class ChannelPool:
+    """
+    Pool de conexiones/canales para publicar desde varios threads.
+    Las conexiones de pika no son thread-safe: cada canal se usa en un solo
+    thread a la vez y las conexiones se crean a demanda hasta `size`.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._all = []
+
+    @contextmanager
+    def channel(self):
+        connection, channel = self._acquire()
+        try:
+            yield channel
+        except Exception:
+            # La conexión puede haber quedado en mal estado: se descarta y se recrea
+            self._discard(connection)
+            raise
+        else:
+            self._idle.put((connection, channel))
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if not create:
+            return self._idle.get()
+        try:
+            connection = get_rabbit_connection()
+            channel = connection.channel()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+        with self._lock:
+            self._all.append(connection)
+        return connection, channel
+
+    def _discard(self, connection):
+        with self._lock:
+            self._created -= 1
+            if connection in self._all:
+                self._all.remove(connection)
+        try:
+            if connection.is_open:
+                connection.close()
+        except Exception:
+            pass
+
+    def close(self):
+        with self._lock:
+            connections, self._all = self._all, []
+            self._created = 0
+        for connection in connections:
+            try:
+                if connection.is_open:
+                    connection.close()
+            except Exception:
+                pass
@@ -0,0 +1,134 @@
+"""
+Perfiles de render para Chrome headless (selenium_middleware.py).
+
+Para extraer productos alcanza con el DOM, pero Chrome descarga y decodifica
+todo lo que pide la página: imágenes, fuentes, video y los scripts de
+analytics, publicidad y widgets, que además siguen ejecutándose y pidiendo
+recursos mientras esperamos. Un perfil (`rendering.profiles` en config.yml)
+define qué se evita:
+
+- block_resource_types: tipos de recurso que no se descargan (image, font,
+  media, stylesheet). Se bloquean por extensión de URL con
+  Network.setBlockedURLs de DevTools: el bloqueo lo resuelve el navegador, sin
+  atender un evento de intercepción por request desde Python.
+- block_url_patterns: patrones de URL (comodín `*`) de analytics, publicidad y
+  chats que tampoco se descargan.
+- disable_images: Chrome no carga ni decodifica imágenes (preferencia de
+  contenido y blink-settings), también las que no se bloquean por extensión
+  (URLs sin extensión, data URIs, CDNs de imágenes).
+- cache_mb / cache_dir: cache HTTP en disco del driver por spider. El JS y el
+  CSS estáticos del sitio se descargan en la primera página y las siguientes
+  los toman de la cache; el cache no se deshabilita aunque DevTools esté activo.
+
+El perfil por defecto es `rendering.profile`; un spider puede elegir otro con
+RENDER_PROFILE. El perfil `full` no bloquea nada (para depurar un sitio que
+deja de renderizar bien).
+
+SeleniumMiddleware (que renderiza las SeleniumRequest) se registra solo para
+los spiders de `rendering.spiders` o con SELENIUM_RENDER = True: el resto
+descarga sus SeleniumRequest por HTTP plano, sin abrir Chrome.
+"""
+
+import os
+from typing import List, Optional
+
+from .config import load_config
+
+SELENIUM_MIDDLEWARE_PATH = 'motorciclye.selenium_middleware.SeleniumMiddleware'
+# Después de SessionHandoffMiddleware (450) y antes de HttpCacheMiddleware (900)
+SELENIUM_MIDDLEWARE_PRIORITY = 600
+
+# Extensiones de URL de cada tipo de recurso que se puede bloquear
+RESOURCE_TYPE_EXTENSIONS = {
+    'image': ('jpg', 'jpeg', 'png', 'gif', 'webp', 'avif', 'svg', 'ico', 'bmp'),
+    'font': ('woff', 'woff2', 'ttf', 'otf', 'eot'),
+    'media': ('mp4', 'webm', 'ogg', 'ogv', 'mp3', 'wav', 'm4a', 'm3u8'),
+    'stylesheet': ('css',),
+}
+
+
+def rendering_config() -> dict:
+    return load_config().get('rendering') or {}
+
+
+def rendering_enabled(spider) -> bool:
+    """config.yml (`rendering.spiders`) o SELENIUM_RENDER del spider"""
+    return spider.name in (rendering_config().get('spiders') or []) or getattr(spider, 'SELENIUM_RENDER', False)
+
+
+def apply_rendering_settings(settings):
+    """Agrega SeleniumMiddleware a los DOWNLOADER_MIDDLEWARES del spider; se aplica en from_crawler"""
+    middlewares = dict(settings.getdict('DOWNLOADER_MIDDLEWARES'))
+    middlewares.setdefault(SELENIUM_MIDDLEWARE_PATH, SELENIUM_MIDDLEWARE_PRIORITY)
+    settings.set('DOWNLOADER_MIDDLEWARES', middlewares, priority='spider')
+
+
+class RenderProfile:
+    """Recursos que Chrome no descarga ni procesa al renderizar una página"""
+
+    def __init__(self, name: str = 'full', block_resource_types=(), block_url_patterns=(),
+                 disable_images: bool = False, cache_mb: int = 0, cache_dir: Optional[str] = None):
+        unknown = set(block_resource_types) - set(RESOURCE_TYPE_EXTENSIONS)
+        if unknown:
+            raise ValueError(f"Tipos de recurso desconocidos en el perfil {name}: {', '.join(sorted(unknown))}")
+        self.name = name
+        self.block_resource_types = tuple(block_resource_types)
+        self.block_url_patterns = tuple(block_url_patterns)
+        self.disable_images = disable_images
+        self.cache_mb = cache_mb
+        self.cache_dir = cache_dir
+
+    @classmethod
+    def from_config(cls, name: Optional[str] = None) -> 'RenderProfile':
+        """Perfil `name` de config.yml (`rendering.profile` si es None); sin config, el perfil full"""
+        cfg = rendering_config()
+        name = name or cfg.get('profile') or 'full'
+        profiles = cfg.get('profiles') or {}
+        if name not in profiles and name != 'full':
+            raise ValueError(f"Perfil de render desconocido: {name}")
+        return cls(name, **(profiles.get(name) or {}))
+
+    @classmethod
+    def for_spider(cls, spider_cls) -> 'RenderProfile':
+        return cls.from_config(getattr(spider_cls, 'RENDER_PROFILE', None))
+
+    def blocked_urls(self) -> List[str]:
+        """Patrones para Network.setBlockedURLs: extensiones de los tipos bloqueados (con y sin query) y URLs"""
+        patterns = []
+        for resource_type in self.block_resource_types:
+            for extension in RESOURCE_TYPE_EXTENSIONS[resource_type]:
+                patterns.extend((f'*.{extension}', f'*.{extension}?*'))
+        patterns.extend(self.block_url_patterns)
+        return patterns
+
+    def cache_path(self, spider_name: str) -> Optional[str]:
+        if not self.cache_mb or not self.cache_dir:
+            return None
+        return os.path.abspath(os.path.join(self.cache_dir, spider_name))
+
+    def apply_options(self, chrome_options, spider_name: str):
+        """Flags y preferencias de Chrome del perfil; se aplican antes de crear el driver"""
+        if self.disable_images:
+            chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+            chrome_options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+        if 'media' in self.block_resource_types:
+            chrome_options.add_argument('--autoplay-policy=user-gesture-required')
+            chrome_options.add_argument('--mute-audio')
+        cache_path = self.cache_path(spider_name)
+        if cache_path:
+            os.makedirs(cache_path, exist_ok=True)
+            chrome_options.add_argument(f'--disk-cache-dir={cache_path}')
+            chrome_options.add_argument(f'--disk-cache-size={int(self.cache_mb * 1024 * 1024)}')
+
+    def apply_driver(self, driver):
+        """Bloqueo de URLs por DevTools; vale para todas las páginas que cargue el driver"""
+        blocked = self.blocked_urls()
+        if not blocked:
+            return
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setCacheDisabled', {'cacheDisabled': False})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': blocked})
+
+    def __repr__(self):
+        return (f'RenderProfile({self.name!r}, types={list(self.block_resource_types)}, '
+                f'patterns={len(self.block_url_patterns)}, images={not self.disable_images}, cache_mb={self.cache_mb})')
@@ -0,0 +1,319 @@
+"""
+Catálogo de corridas de los spiders (SQLite en build/catalog.sqlite3).
+
+Las rutas se guardan relativas al directorio build, así el catálogo sirve
+tanto desde la raíz del proyecto (spiders) como desde la del repo (command.py).
+
+BaseSpider registra cada corrida al iniciar y al terminar: spider, run_id,
+fechas, motivo de cierre, cantidad de items, tamaños del feed y del log,
+stats de Scrapy y rutas. Listar, consultar y reenviar corridas pasa a ser
+una consulta al catálogo en lugar de recorrer build/.
+
+La política de retención comprime en build/archive/<spider>/<run_id>.tar.gz
+las corridas más viejas que `archive_after_days` y, si el total supera
+`max_total_mb`, elimina los archivos más viejos (la corrida queda en el
+catálogo marcada como eliminada). Las corridas archivadas se pueden reenviar
+igual: el feed se lee directamente desde el .tar.gz.
+
+Las corridas anteriores al catálogo se importan con `python command.py runs sync`.
+"""
+
+import fnmatch
+import json
+import os
+import shutil
+import sqlite3
+import tarfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from .config import load_config
+from .runs import TIMESTAMP_FORMAT, RunRef, parse_time_bound, scan_runs
+
+STATUS_RUNNING = 'running'
+STATUS_FINISHED = 'finished'
+STATUS_ARCHIVED = 'archived'
+STATUS_DELETED = 'deleted'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    spider TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    finish_reason TEXT,
+    item_count INTEGER,
+    run_dir TEXT,
+    feed_path TEXT,
+    feed_bytes INTEGER,
+    log_path TEXT,
+    log_bytes INTEGER,
+    archive_path TEXT,
+    archive_bytes INTEGER,
+    stats TEXT,
+    PRIMARY KEY (spider, run_id)
+);
+CREATE INDEX IF NOT EXISTS runs_run_id ON runs (run_id);
+"""
+
+
+CATALOG_FILENAME = 'catalog.sqlite3'
+
+
+def retention_config() -> dict:
+    return (load_config().get('runs') or {}).get('retention') or {}
+
+
+def _size(path: Optional[str]) -> Optional[int]:
+    try:
+        return os.path.getsize(path) if path else None
+    except OSError:
+        return None
+
+
+class RunCatalog:
+    """Acceso al catálogo; abrir y cerrar por operación (lo usan spiders y command.py)"""
+
+    def __init__(self, build_dir: str = 'build'):
+        self.build_dir = build_dir
+        self.path = os.path.join(build_dir, CATALOG_FILENAME)
+        os.makedirs(build_dir, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _rel(self, path: Optional[str]) -> Optional[str]:
+        return os.path.relpath(path, self.build_dir) if path else None
+
+    def _abs(self, path: Optional[str]) -> Optional[str]:
+        return os.path.join(self.build_dir, path) if path else None
+
+    # Registro desde los spiders
+
+    def register_start(self, spider: str, run_id: str, run_dir: str, feed_path: str, log_path: str):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO runs (spider, run_id, status, started_at, run_dir, feed_path, log_path) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (spider, run_id, STATUS_RUNNING, datetime.now().isoformat(timespec='seconds'),
+             self._rel(run_dir), self._rel(feed_path), self._rel(log_path)),
+        )
+        self.conn.commit()
+
+    def register_finish(self, spider: str, run_id: str, reason: str, stats: dict = None):
+        stats = stats or {}
+        self.conn.execute(
+            'UPDATE runs SET status = ?, finished_at = ?, finish_reason = ?, item_count = ?, stats = ? '
+            'WHERE spider = ? AND run_id = ?',
+            (
+                STATUS_FINISHED,
+                datetime.now().isoformat(timespec='seconds'),
+                reason,
+                stats.get('item_scraped_count', 0),
+                json.dumps(stats, default=str),
+                spider,
+                run_id,
+            ),
+        )
+        self.conn.commit()
+        self.update_sizes(spider, run_id)
+
+    def update_sizes(self, spider: str, run_id: str):
+        """Actualiza los tamaños del feed y el log (el feed se cierra después del spider)"""
+        row = self.conn.execute(
+            'SELECT feed_path, log_path FROM runs WHERE spider = ? AND run_id = ?', (spider, run_id)
+        ).fetchone()
+        if row is None:
+            return
+        self.conn.execute(
+            'UPDATE runs SET feed_bytes = ?, log_bytes = ? WHERE spider = ? AND run_id = ?',
+            (_size(self._abs(row['feed_path'])), _size(self._abs(row['log_path'])), spider, run_id),
+        )
+        self.conn.commit()
+
+    def sync(self, build_dir: str) -> int:
+        """Importa las corridas de build/ que todavía no están en el catálogo. Devuelve cuántas agregó"""
+        known = {(r['spider'], r['run_id']) for r in self.conn.execute('SELECT spider, run_id FROM runs')}
+        added = 0
+        for run in scan_runs(build_dir):
+            if (run.source, run.timestamp) in known:
+                continue
+            log_path = os.path.join(run.run_dir, 'app.log')
+            started_at = datetime.strptime(run.timestamp, TIMESTAMP_FORMAT).isoformat()
+            self.conn.execute(
+                'INSERT INTO runs (spider, run_id, status, started_at, item_count, run_dir, feed_path, feed_bytes, '
+                'log_path, log_bytes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (run.source, run.timestamp, STATUS_FINISHED, started_at, None, self._rel(run.run_dir),
+                 self._rel(run.feed_path), _size(run.feed_path),
+                 self._rel(log_path) if os.path.exists(log_path) else None, _size(log_path)),
+            )
+            added += 1
+        self.conn.commit()
+        return added
+
+    # Consultas
+
+    def query(self, sources: Optional[List[str]] = None, since: Optional[str] = None, until: Optional[str] = None,
+              latest: bool = False, include_deleted: bool = False, include_running: bool = True) -> List[sqlite3.Row]:
+        """Corridas filtradas por globs de spider, rango de run_id (fecha) y/o la última por spider"""
+        sql = 'SELECT * FROM runs WHERE 1 = 1'
+        params = []
+        since, until = parse_time_bound(since), parse_time_bound(until, end=True)
+        if since:
+            sql += ' AND run_id >= ?'
+            params.append(since)
+        if until:
+            sql += ' AND run_id <= ?'
+            params.append(until)
+        if not include_deleted:
+            sql += ' AND status != ?'
+            params.append(STATUS_DELETED)
+        if not include_running:
+            sql += ' AND status != ?'
+            params.append(STATUS_RUNNING)
+        sql += ' ORDER BY spider, run_id'
+        rows = [
+            row for row in self.conn.execute(sql, params)
+            if not sources or any(fnmatch.fnmatchcase(row['spider'], pattern) for pattern in sources)
+        ]
+        if latest:
+            by_spider = {}
+            for row in rows:
+                by_spider[row['spider']] = row  # Ordenadas por run_id: queda la última
+            rows = list(by_spider.values())
+        return rows
+
+    def find_runs(self, sources=None, since=None, until=None, latest=False) -> List[RunRef]:
+        """Corridas reenviables (con feed en disco o archivado) como RunRef"""
+        runs = []
+        for row in self.query(sources, since, until, latest, include_running=False):
+            runs.append(RunRef(
+                row['spider'], row['run_id'], self._abs(row['feed_path']), self._abs(row['run_dir']),
+                self._abs(row['archive_path']),
+            ))
+        return runs
+
+    # Retención
+
+    def apply_retention(self, archive_after_days: float = None, max_total_mb: float = None,
+                        archive_dir: str = None, dry_run: bool = False) -> dict:
+        """
+        Archiva corridas viejas y elimina archivos por encima del presupuesto. Devuelve un resumen;
+        las corridas cuyo directorio ya no existe van en `missing` (y se marcan eliminadas)
+        """
+        cfg = retention_config()
+        archive_after_days = cfg.get('archive_after_days', 7) if archive_after_days is None else archive_after_days
+        max_total_mb = cfg.get('max_total_mb', 0) if max_total_mb is None else max_total_mb
+        archive_dir = archive_dir or os.path.join(self.build_dir, 'archive')
+        summary = {'archived': [], 'deleted': [], 'missing': [], 'bytes_before': self.total_bytes(), 'bytes_after': None}
+
+        cutoff = (datetime.now() - timedelta(days=archive_after_days)).strftime(TIMESTAMP_FORMAT)
+        to_archive = self.conn.execute(
+            'SELECT * FROM runs WHERE status = ? AND run_id < ? ORDER BY run_id', (STATUS_FINISHED, cutoff)
+        ).fetchall()
+        for row in to_archive:
+            run = (row['spider'], row['run_id'])
+            if dry_run:
+                summary['archived' if self._run_dir_exists(row) else 'missing'].append(run)
+            elif self._archive(row, archive_dir):
+                summary['archived'].append(run)
+            else:
+                summary['missing'].append(run)
+                self._set_status(row, STATUS_DELETED)
+
+        if max_total_mb:
+            budget = max_total_mb * 1024 * 1024
+            total = self.total_bytes()
+            # Se eliminan primero las corridas archivadas más viejas
+            for row in self.conn.execute(
+                'SELECT * FROM runs WHERE status = ? ORDER BY run_id', (STATUS_ARCHIVED,)
+            ).fetchall():
+                if total <= budget:
+                    break
+                total -= row['archive_bytes'] or 0
+                summary['deleted'].append((row['spider'], row['run_id']))
+                if not dry_run:
+                    self._delete_archive(row)
+
+        summary['bytes_after'] = self.total_bytes()
+        return summary
+
+    def total_bytes(self) -> int:
+        row = self.conn.execute(
+            'SELECT COALESCE(SUM(CASE WHEN status = ? THEN archive_bytes '
+            'ELSE COALESCE(feed_bytes, 0) + COALESCE(log_bytes, 0) END), 0) FROM runs WHERE status != ?',
+            (STATUS_ARCHIVED, STATUS_DELETED),
+        ).fetchone()
+        return row[0] or 0
+
+    def _run_dir_exists(self, row) -> bool:
+        run_dir = self._abs(row['run_dir'])
+        return bool(run_dir) and os.path.isdir(run_dir)
+
+    def _set_status(self, row, status: str):
+        self.conn.execute(
+            'UPDATE runs SET status = ? WHERE spider = ? AND run_id = ?', (status, row['spider'], row['run_id'])
+        )
+        self.conn.commit()
+
+    def _archive(self, row, archive_dir: str) -> bool:
+        """Comprime el directorio de la corrida; False si el directorio ya no existe"""
+        if not self._run_dir_exists(row):
+            return False
+        run_dir = self._abs(row['run_dir'])
+        target_dir = os.path.join(archive_dir, row['spider'])
+        os.makedirs(target_dir, exist_ok=True)
+        archive_path = os.path.join(target_dir, f"{row['run_id']}.tar.gz")
+        tmp_path = archive_path + '.tmp'
+        with tarfile.open(tmp_path, 'w:gz') as tar:
+            tar.add(run_dir, arcname=row['run_id'])
+        os.replace(tmp_path, archive_path)
+        self.conn.execute(
+            'UPDATE runs SET status = ?, archive_path = ?, archive_bytes = ? WHERE spider = ? AND run_id = ?',
+            (STATUS_ARCHIVED, self._rel(archive_path), _size(archive_path), row['spider'], row['run_id']),
+        )
+        self.conn.commit()
+        shutil.rmtree(run_dir)
+        return True
+
+    def _delete_archive(self, row):
+        archive_path = self._abs(row['archive_path'])
+        if archive_path and os.path.exists(archive_path):
+            os.remove(archive_path)
+        self.conn.execute(
+            'UPDATE runs SET status = ?, archive_bytes = 0 WHERE spider = ? AND run_id = ?',
+            (STATUS_DELETED, row['spider'], row['run_id']),
+        )
+        self.conn.commit()
+
+
+@contextmanager
+def open_feed(run: RunRef):
+    """Stream binario del feed JSON de una corrida, del directorio o de su .tar.gz"""
+    if run.archive_path and not (run.feed_path and os.path.exists(run.feed_path)):
+        with tarfile.open(run.archive_path, 'r:gz') as tar:
+            member = tar.extractfile(f'{run.timestamp}/{run.source}.json')
+            if member is None:
+                raise FileNotFoundError(f'{run.source}.json no está en {run.archive_path}')
+            yield member
+    else:
+        with open(run.feed_path, 'rb') as f:
+            yield f
+
+
+def load_feed(run: RunRef) -> list:
+    """Items del feed JSON de una corrida, leído del directorio o de su .tar.gz"""
+    with open_feed(run) as f:
+        data = json.load(f)
+    return data if isinstance(data, list) else [data]
@@ -0,0 +1,64 @@
+"""
+Índice de corridas de los spiders (build/<spider>/<YYYYmmddHHMMSS>/).
+
+Recorre el directorio build una sola vez (dos niveles con os.scandir) y arma
+la lista de corridas con su feed, en lugar de probar rutas candidatas por
+cada corrida. La selección por glob de spider, rango de fechas o última
+corrida la hace el catálogo de corridas (run_catalog.py).
+"""
+
+import os
+import re
+from typing import Iterable, List, NamedTuple, Optional
+
+RUN_DIR_RE = re.compile(r'^\d{14}$')
+TIMESTAMP_FORMAT = '%Y%m%d%H%M%S'
+DEFAULT_BUILD_DIRS = ('build', os.path.join('motorciclye', 'build'))
+
+
+class RunRef(NamedTuple):
+    source: str
+    timestamp: str
+    feed_path: str
+    run_dir: str
+    archive_path: Optional[str] = None  # .tar.gz si la corrida fue archivada (ver run_catalog.py)
+
+
+def find_build_dir(candidates: Iterable[str] = DEFAULT_BUILD_DIRS) -> Optional[str]:
+    """Primer directorio build existente (se ejecuta desde la raíz del repo o del proyecto)"""
+    for candidate in candidates:
+        if os.path.isdir(candidate):
+            return candidate
+    return None
+
+
+def scan_runs(build_dir: str) -> List[RunRef]:
+    """Todas las corridas con feed JSON del directorio build, ordenadas por spider y fecha"""
+    runs = []
+    with os.scandir(build_dir) as sources:
+        for source in sources:
+            if not source.is_dir():
+                continue
+            with os.scandir(source.path) as run_dirs:
+                for run_dir in run_dirs:
+                    if not run_dir.is_dir() or not RUN_DIR_RE.match(run_dir.name):
+                        continue
+                    feed_path = os.path.join(run_dir.path, f'{source.name}.json')
+                    if os.path.isfile(feed_path):
+                        runs.append(RunRef(source.name, run_dir.name, feed_path, run_dir.path))
+    runs.sort(key=lambda run: (run.source, run.timestamp))
+    return runs
+
+
+def parse_time_bound(text: Optional[str], end: bool = False) -> Optional[str]:
+    """
+    Normaliza '20250625', '2025-06-25', '202506251319' o '20250625131936' a 14 dígitos.
+    Con end=True se completa hasta el final del período ('20250625' -> '20250625235959').
+    """
+    if not text:
+        return None
+    digits = re.sub(r'\D', '', text)
+    if len(digits) not in (8, 10, 12, 14):
+        raise ValueError(f"Fecha inválida: '{text}' (formatos: YYYYMMDD, YYYYMMDDHH, YYYYMMDDHHMM, YYYYMMDDHHMMSS)")
+    return digits + ('235959' if end else '000000')[len(digits) - 8:]
+
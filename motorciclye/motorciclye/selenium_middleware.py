@@ -2,6 +2,18 @@
 Middleware para usar Selenium cuando hay bloqueo anti-bot severo.
 Solo usar si las otras estrategias no funcionan.
 
+Renderiza las SeleniumRequest (reemplaza al middleware de scrapy-selenium). Se
+registra solo para los spiders de `rendering.spiders` en config.yml o con
+SELENIUM_RENDER = True (BaseSpider.from_crawler, ver render_profile.py); en el
+resto las SeleniumRequest van por HTTP plano. Chrome se configura con el
+perfil de render del spider (render_profile.py, sección `rendering` de
+config.yml): recursos y URLs bloqueados, imágenes sin decodificar y cache en
+disco de los estáticos entre páginas.
+
+Si el spider declara XHR_PATTERNS (o la request trae `meta['xhr_patterns']`)
+las respuestas JSON de esas llamadas quedan en `response.meta['xhr']` y la
+espera termina apenas llegan, en lugar de dormir unos segundos (xhr_capture.py).
+
 Instalar dependencias:
 pip install selenium
 pip install scrapy-selenium
@@ -9,74 +21,111 @@ pip install scrapy-selenium
 
 from scrapy import signals
 from scrapy.http import HtmlResponse
+from scrapy_selenium import SeleniumRequest
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import time
-import random
+
+from .render_profile import RenderProfile
+from .xhr_capture import XhrCapture, enable_logging, xhr_config
+
+
+def create_driver(profile: RenderProfile, spider_name: str = 'default', capture_xhr: bool = False):
+    """Chrome headless con las opciones anti-detección y el perfil de render; None si no se pudo iniciar"""
+    chrome_options = Options()
+    chrome_options.add_argument('--headless')  # Ejecutar sin interfaz gráfica
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--disable-gpu')
+    chrome_options.add_argument('--window-size=1920,1080')
+    chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+    
+    # Configuraciones anti-detección
+    chrome_options.add_argument('--disable-blink-features=AutomationControlled')
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    chrome_options.add_experimental_option('useAutomationExtension', False)
+
+    # Recursos que no se descargan ni procesan (imágenes, fuentes, video, analytics)
+    profile.apply_options(chrome_options, spider_name)
+    if capture_xhr:
+        enable_logging(chrome_options)
+    
+    try:
+        driver = webdriver.Chrome(options=chrome_options)
+        # Ejecutar script para ocultar el hecho de que es un webdriver
+        driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        profile.apply_driver(driver)
+        return driver
+    except Exception as e:
+        print(f"Error inicializando Selenium: {e}")
+        return None
 
 
 class SeleniumMiddleware:
     """Middleware para usar Selenium con Chrome en modo headless"""
     
-    def __init__(self):
-        chrome_options = Options()
-        chrome_options.add_argument('--headless')  # Ejecutar sin interfaz gráfica
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--disable-gpu')
-        chrome_options.add_argument('--window-size=1920,1080')
-        chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
-        
-        # Configuraciones anti-detección
-        chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-        chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        chrome_options.add_experimental_option('useAutomationExtension', False)
-        
-        try:
-            self.driver = webdriver.Chrome(options=chrome_options)
-            # Ejecutar script para ocultar el hecho de que es un webdriver
-            self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-        except Exception as e:
-            print(f"Error inicializando Selenium: {e}")
-            self.driver = None
+    def __init__(self, crawler, profile: RenderProfile = None, spider_name: str = 'default', stats=None,
+                 xhr_patterns=(), capture_xhr: bool = False):
+        self.crawler = crawler
+        self.profile = profile or RenderProfile()
+        self.stats = stats
+        self.xhr_patterns = list(xhr_patterns)
+        # El log de performance solo se activa si algún spider o request captura XHR
+        self.xhr_capture = XhrCapture() if capture_xhr or self.xhr_patterns else None
+        self.driver = create_driver(self.profile, spider_name, capture_xhr=bool(self.xhr_capture))
     
     @classmethod
     def from_crawler(cls, crawler):
-        middleware = cls()
+        spider_cls = crawler.spidercls
+        xhr_patterns = getattr(spider_cls, 'XHR_PATTERNS', None) or ()
+        spider_name = getattr(spider_cls, 'name', None) or 'default'
+        middleware = cls(
+            crawler,
+            profile=RenderProfile.for_spider(spider_cls),
+            spider_name=spider_name,
+            stats=crawler.stats,
+            xhr_patterns=xhr_patterns,
+            capture_xhr=spider_name in (xhr_config().get('spiders') or []),
+        )
         crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
         return middleware
     
-    def process_request(self, request, spider):
-        """Solo usar Selenium para motosport si está configurado"""
-        if not self.driver:
+    def process_request(self, request):
+        """Selenium para las SeleniumRequest; el resto sigue por HTTP"""
+        if not self.driver or not isinstance(request, SeleniumRequest):
             return None
-            
-        # Solo usar Selenium para el spider motosport
-        if getattr(spider, 'name', '') == 'motosport':
-            return self._selenium_request(request, spider)
-        
-        return None
+        return self._selenium_request(request, self.crawler.spider)
     
     def _selenium_request(self, request, spider):
         """Procesar request con Selenium"""
         try:
             spider.logger.info(f"Usando Selenium para: {request.url}")
+            started = time.monotonic()
+            xhr_patterns = request.meta.get('xhr_patterns', self.xhr_patterns) if self.xhr_capture else None
+            if xhr_patterns:
+                self.xhr_capture.reset(self.driver)
             
             # Navegar a la página
             self.driver.get(request.url)
-            
-            # Simular comportamiento humano
-            time.sleep(random.uniform(2, 5))
-            
-            # Scroll para simular lectura
-            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight/3);")
-            time.sleep(random.uniform(1, 2))
-            
+
+            if xhr_patterns:
+                # Esperar solo hasta que lleguen las llamadas buscadas
+                request.meta['xhr'] = self._capture_xhr(request, xhr_patterns)
+
+            # Mismo contrato que scrapy-selenium: wait_until/wait_time, screenshot y script
+            if request.wait_until:
+                WebDriverWait(self.driver, request.wait_time).until(request.wait_until)
+            if request.screenshot:
+                request.meta['screenshot'] = self.driver.get_screenshot_as_png()
+            if request.script:
+                self.driver.execute_script(request.script)
+
             # Obtener el HTML final
             body = self.driver.page_source
+            self._record_render(started)
             
             # Crear respuesta Scrapy
             return HtmlResponse(
@@ -89,14 +138,26 @@ class SeleniumMiddleware:
         except Exception as e:
             spider.logger.error(f"Error con Selenium: {e}")
             return None
+
+    def _capture_xhr(self, request, patterns) -> list:
+        captured = self.xhr_capture.wait(self.driver, patterns, timeout=request.meta.get('xhr_timeout'))
+        if self.stats is not None:
+            self.stats.inc_value('rendering/xhr_captured', len(captured))
+            if len({item['pattern'] for item in captured}) < len(set(patterns)):
+                self.stats.inc_value('rendering/xhr_timeouts')
+        return captured
+
+    def _record_render(self, started: float):
+        if self.stats is not None:
+            self.stats.inc_value('rendering/pages')
+            self.stats.inc_value('rendering/ms', int((time.monotonic() - started) * 1000))
     
     def spider_closed(self, spider):
         """Cerrar el driver cuando termine el spider"""
         if self.driver:
+            if self.stats is not None and self.stats.get_value('rendering/pages'):
+                pages = self.stats.get_value('rendering/pages')
+                spider.logger.info(f"Render ({self.profile.name}): {pages} páginas, "
+                                   f"{self.stats.get_value('rendering/ms', 0) / pages:.0f} ms por página")
             self.driver.quit()
 
-
-# Para habilitar este middleware, agregar a settings.py o custom_settings:
-# 'DOWNLOADER_MIDDLEWARES': {
-#     'motorciclye.selenium_middleware.SeleniumMiddleware': 600,
-# }
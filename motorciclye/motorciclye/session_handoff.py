@@ -0,0 +1,271 @@
+"""
+Traspaso de sesión del navegador a HTTP.
+
+Algunas tiendas solo piden un navegador real para pasar el chequeo anti-bot
+inicial (Cloudflare, Incapsula, etc.): con requests planos devuelven 403 y
+renderizar todo el crawl con Selenium es varias veces más lento.
+SessionHandoffMiddleware:
+
+1. En la primera request a cada dominio abre Chrome (perfil de render del
+   spider, selenium_middleware.create_driver), carga esa URL y espera a que el
+   chequeo termine.
+2. Exporta las cookies del navegador al cookie jar de Scrapy del dominio
+   (CookiesMiddleware) y guarda el User-Agent, Accept-Language y los client
+   hints (Sec-CH-UA*) del navegador.
+3. El resto del crawl va por HTTP plano con esas cookies y headers, que el
+   sitio ve como el mismo navegador.
+4. Si una response parece un bloqueo (status de `block_statuses` o una marca de
+   `block_markers` en el body) se vuelve a renderizar el dominio y la request se
+   reintenta una vez con la sesión nueva. Los bloqueos de requests enviadas con
+   una sesión anterior no disparan otro render.
+
+El render corre en un thread (no bloquea el reactor) y con un lock, así las
+requests concurrentes a un dominio sin sesión esperan al mismo render. El
+navegador se cierra después de cada traspaso salvo `keep_browser`.
+
+Se activa por spider con SESSION_HANDOFF = True o en config.yml
+(`session_handoff.spiders`); BaseSpider agrega el middleware a
+DOWNLOADER_MIDDLEWARES.
+"""
+
+import time
+from http.cookiejar import Cookie
+from typing import Dict, Optional
+
+from scrapy import signals
+from scrapy.downloadermiddlewares.cookies import CookiesMiddleware
+from scrapy.http import TextResponse
+from scrapy.utils.defer import maybe_deferred_to_future
+from scrapy.utils.httpobj import urlparse_cached
+from twisted.internet import defer, threads
+
+from .config import load_config
+from .render_profile import RenderProfile
+
+MIDDLEWARE_PATH = 'motorciclye.session_handoff.SessionHandoffMiddleware'
+# Después de RotateUserAgentMiddleware (400) y antes de CookiesMiddleware (700)
+MIDDLEWARE_PRIORITY = 450
+
+DEFAULT_BLOCK_STATUSES = [403, 429, 503]
+DEFAULT_BLOCK_MARKERS = ['_cf_chl_opt', 'Just a moment...', '_Incapsula_Resource', 'px-captcha']
+MARKER_SCAN_BYTES = 64 * 1024  # Las páginas de chequeo son chicas; no se recorre el body entero
+
+# Headers del navegador que el sitio compara con la sesión del chequeo
+BROWSER_HEADERS_SCRIPT = """
+const data = navigator.userAgentData;
+return {
+    userAgent: navigator.userAgent,
+    languages: navigator.languages || [],
+    brands: data ? data.brands.map(b => `"${b.brand}";v="${b.version}"`).join(', ') : null,
+    mobile: data ? data.mobile : null,
+    platform: data ? data.platform : null,
+};
+"""
+
+
+def session_handoff_config() -> dict:
+    return load_config().get('session_handoff') or {}
+
+
+def is_enabled(spider) -> bool:
+    """config.yml (`session_handoff.spiders`) o SESSION_HANDOFF del spider"""
+    return spider.name in (session_handoff_config().get('spiders') or []) or getattr(spider, 'SESSION_HANDOFF', False)
+
+
+def apply_settings(settings):
+    """
+    Agrega el middleware a los DOWNLOADER_MIDDLEWARES del spider y evita que la
+    cache HTTP guarde bloqueos; se aplica en from_crawler
+    """
+    middlewares = dict(settings.getdict('DOWNLOADER_MIDDLEWARES'))
+    middlewares.setdefault(MIDDLEWARE_PATH, MIDDLEWARE_PRIORITY)
+    settings.set('DOWNLOADER_MIDDLEWARES', middlewares, priority='spider')
+    block_statuses = session_handoff_config().get('block_statuses', DEFAULT_BLOCK_STATUSES)
+    ignored = set(settings.getlist('HTTPCACHE_IGNORE_HTTP_CODES')) | {int(status) for status in block_statuses}
+    settings.set('HTTPCACHE_IGNORE_HTTP_CODES', sorted(ignored), priority='spider')
+
+
+def browser_cookie(data: dict, host: str) -> Cookie:
+    """Cookie de Selenium (get_cookies) -> http.cookiejar.Cookie"""
+    domain = data.get('domain') or host
+    expires = data.get('expiry')
+    return Cookie(
+        version=0, name=data['name'], value=data['value'], port=None, port_specified=False,
+        domain=domain, domain_specified=domain.startswith('.'), domain_initial_dot=domain.startswith('.'),
+        path=data.get('path') or '/', path_specified=True, secure=bool(data.get('secure')),
+        expires=int(expires) if expires else None, discard=not expires, comment=None, comment_url=None,
+        rest={'HttpOnly': None} if data.get('httpOnly') else {},
+    )
+
+
+def browser_headers(info: dict) -> Dict[str, str]:
+    """Headers de requests HTTP equivalentes a los del navegador que pasó el chequeo"""
+    headers = {'User-Agent': info['userAgent']}
+    languages = info.get('languages') or []
+    if languages:
+        # es-AR, es;q=0.9, en;q=0.8 ...
+        headers['Accept-Language'] = ','.join(
+            lang if i == 0 else f'{lang};q={max(1 - i / 10, 0.1):.1f}' for i, lang in enumerate(languages)
+        )
+    if info.get('brands'):
+        headers['Sec-CH-UA'] = info['brands']
+        headers['Sec-CH-UA-Mobile'] = '?1' if info.get('mobile') else '?0'
+        headers['Sec-CH-UA-Platform'] = f'"{info.get("platform") or ""}"'
+    return headers
+
+
+class BrowserSession:
+    """Cookies y headers exportados del navegador para un dominio"""
+
+    def __init__(self, cookies, headers: Dict[str, str], generation: int):
+        self.cookies = cookies
+        self.headers = headers
+        self.generation = generation
+        self.stale = False
+
+
+class SessionHandoffMiddleware:
+    """Renderiza una vez por dominio y sigue por HTTP con la sesión del navegador"""
+
+    def __init__(self, crawler, profile: RenderProfile, spider_name: str):
+        cfg = session_handoff_config()
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.profile = profile
+        self.spider_name = spider_name
+        self.block_statuses = set(cfg.get('block_statuses', DEFAULT_BLOCK_STATUSES))
+        self.block_markers = [marker.encode('utf-8') for marker in cfg.get('block_markers', DEFAULT_BLOCK_MARKERS)]
+        self.render_timeout = cfg.get('render_timeout_secs', 20)
+        self.max_renders = cfg.get('max_renders', 5)
+        self.keep_browser = cfg.get('keep_browser', False)
+        self.sessions: Dict[str, BrowserSession] = {}
+        self.renders: Dict[str, int] = {}
+        self.driver = None
+        self._lock = defer.DeferredLock()  # Un navegador: un render a la vez
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        spider_cls = crawler.spidercls
+        middleware = cls(crawler, RenderProfile.for_spider(spider_cls), getattr(spider_cls, 'name', None) or 'default')
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    async def process_request(self, request):
+        spider = self.crawler.spider
+        if not is_enabled(spider) or request.meta.get('dont_handoff'):
+            return None
+        host = urlparse_cached(request).hostname
+        if not host:
+            return None
+        if self._needs_render(host):
+            await maybe_deferred_to_future(self._lock.acquire())
+            try:
+                if self._needs_render(host):  # Otra request pudo renderizar mientras esperaba
+                    rendered = await maybe_deferred_to_future(threads.deferToThread(self._render, request.url, host, spider))
+                    if rendered is not None:
+                        # En el thread del reactor: la sesión nueva se ve recién con las cookies en el jar
+                        self._start_session(request, host, *rendered)
+            finally:
+                self._lock.release()
+        session = self.sessions.get(host)
+        if session is None:
+            return None
+        if not self._cookies_middleware():
+            # Sin CookiesMiddleware (COOKIES_ENABLED = False) las cookies van en el header
+            request.headers['Cookie'] = '; '.join(f"{c['name']}={c['value']}" for c in session.cookies)
+        for name, value in session.headers.items():
+            request.headers[name] = value
+        request.meta['handoff_generation'] = session.generation
+        self.stats.inc_value('session_handoff/http_requests')
+        return None
+
+    def process_response(self, request, response):
+        if 'handoff_generation' not in request.meta or not self._is_blocked(response):
+            return response
+        spider = self.crawler.spider
+        host = urlparse_cached(request).hostname
+        self.stats.inc_value('session_handoff/blocked')
+        # La marca es la URL: un meta copiado a las requests hijas no cuenta como reintento
+        if request.meta.get('handoff_retry_of') == request.url:
+            spider.logger.warning(f"Bloqueado también con la sesión renovada ({response.status}): {request.url}")
+            return response
+        session = self.sessions.get(host)
+        if session is not None and session.generation == request.meta['handoff_generation']:
+            spider.logger.info(f"Bloqueo detectado en {host} ({response.status}), renovando sesión en el navegador")
+            session.stale = True
+        retry = request.replace(dont_filter=True)
+        retry.meta['handoff_retry_of'] = request.url
+        retry.meta['dont_cache'] = True
+        return retry
+
+    def _needs_render(self, host: str) -> bool:
+        session = self.sessions.get(host)
+        if session is not None and not session.stale:
+            return False
+        # Con el tope de renders se sigue con la última sesión (o sin sesión)
+        return self.renders.get(host, 0) < self.max_renders
+
+    def _is_blocked(self, response) -> bool:
+        if response.status in self.block_statuses:
+            return True
+        if isinstance(response, TextResponse):
+            head = response.body[:MARKER_SCAN_BYTES]
+            return any(marker in head for marker in self.block_markers)
+        return False
+
+    def _render(self, url: str, host: str, spider):
+        """Thread del render: carga la URL, espera que pase el chequeo y devuelve (cookies, headers)"""
+        # Import diferido: BaseSpider importa este módulo y Selenium solo hace falta al renderizar
+        from .selenium_middleware import create_driver
+
+        self.renders[host] = self.renders.get(host, 0) + 1
+        started = time.monotonic()
+        if self.driver is None:
+            self.driver = create_driver(self.profile, self.spider_name)
+            if self.driver is None:
+                return None
+        try:
+            self.driver.get(url)
+            deadline = started + self.render_timeout
+            while self._page_blocked() and time.monotonic() < deadline:
+                time.sleep(0.5)
+            cookies = self.driver.get_cookies()
+            headers = browser_headers(self.driver.execute_script(BROWSER_HEADERS_SCRIPT))
+        except Exception as e:
+            spider.logger.error(f"Error renderizando {url} para el traspaso de sesión: {e}")
+            return None
+        finally:
+            if not self.keep_browser:
+                self._quit()
+        self.stats.inc_value('session_handoff/renders')
+        spider.logger.info(f"Sesión de {host} traspasada a HTTP: {len(cookies)} cookies, "
+                           f"render de {time.monotonic() - started:.1f}s")
+        return cookies, headers
+
+    def _page_blocked(self) -> bool:
+        source = self.driver.page_source.encode('utf-8')[:MARKER_SCAN_BYTES]
+        return any(marker in source for marker in self.block_markers)
+
+    def _cookies_middleware(self) -> Optional[CookiesMiddleware]:
+        for middleware in self.crawler.engine.downloader.middleware.middlewares:
+            if isinstance(middleware, CookiesMiddleware):
+                return middleware
+        return None
+
+    def _start_session(self, request, host: str, cookies, headers: Dict[str, str]):
+        """Cookies del navegador al jar de Scrapy que usa la request (meta cookiejar) y sesión nueva del dominio"""
+        middleware = self._cookies_middleware()
+        if middleware is not None:
+            jar = middleware.jars[request.meta.get('cookiejar')]
+            for data in cookies:
+                jar.jar.set_cookie(browser_cookie(data, host))
+        previous = self.sessions.get(host)
+        self.sessions[host] = BrowserSession(cookies, headers, (previous.generation + 1) if previous else 1)
+
+    def _quit(self):
+        if self.driver is not None:
+            self.driver.quit()
+            self.driver = None
+
+    def spider_closed(self, spider):
+        self._quit()
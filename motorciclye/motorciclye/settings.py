@@ -58,15 +58,23 @@ ROBOTSTXT_OBEY = False
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
-#EXTENSIONS = {
+EXTENSIONS = {
 #    "scrapy.extensions.telnet.TelnetConsole": None,
-#}
+    # Publica en segundo plano lo que los pipelines guardan en el outbox (ver outbox.py)
+    "motorciclye.outbox.OutboxExtension": 500,
+}
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 ITEM_PIPELINES = {
     "motorciclye.source_pipeline.SourceProcessedPipeline": 200,  # Se ejecuta primero
+    # Asigna match_id entre tiendas antes de publicar (config.yml, sección `matching`)
+    "motorciclye.matching.ProductMatchingPipeline": 250,
+    # Descarga imágenes y agrega image_keys antes de publicar (config.yml, sección `images`)
+    "motorciclye.images.ContentAddressedImagesPipeline": 280,
     "motorciclye.product_pipeline.ProductProcessedPipeline": 300,  # Se ejecuta después
+    # Historial de precios local (se habilita en config.yml, sección `price_history`)
+    "motorciclye.price_history.PriceHistoryPipeline": 400,
 }
 
 # Enable and configure the AutoThrottle extension (disabled by default)
@@ -85,10 +93,40 @@ ITEM_PIPELINES = {
 # Enable and configure HTTP caching (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
 HTTPCACHE_ENABLED = True
-HTTPCACHE_EXPIRATION_SECS = 60 * 60 # 1 hour
+# La expiración la decide la política por clase de request (HTTPCACHE_POLICY_TTLS);
+# el storage guarda las entradas vencidas para poder revalidarlas con 304.
+HTTPCACHE_EXPIRATION_SECS = 0
+HTTPCACHE_POLICY = "motorciclye.httpcache.SpiderTTLPolicy"
+HTTPCACHE_POLICY_TTLS = {
+    'start': 6 * 60 * 60,  # Home / menú
+    'listing': 30 * 60,  # Listados (precios que cambian seguido)
+    'product': 12 * 60 * 60,  # Producto: se revalida en cada corrida diaria
+    'source': 7 * 24 * 60 * 60,  # Datos de contacto de la tienda
+    'default': 60 * 60,
+}
 HTTPCACHE_DIR = "httpcache"
 HTTPCACHE_IGNORE_HTTP_CODES = []
-HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+# Un archivo SQLite por spider con bodies comprimidos y límite de tamaño (LRU).
+# `python command.py cache-compact` elimina expiradas y compacta los archivos.
+HTTPCACHE_STORAGE = "motorciclye.httpcache.SqliteCacheStorage"
+HTTPCACHE_SQLITE_MAX_BYTES = 2 * 1024 ** 3  # 2 GB por spider (0 = sin límite)
+HTTPCACHE_COMPRESSION = "zstd"  # zstd | zlib | none
+
+# Imágenes de productos (ver images.py): se descargan las URLs de `images` y las
+# claves guardadas quedan en `image_keys`
+IMAGES_STORE = "build/images"
+IMAGES_URLS_FIELD = "images"
+IMAGES_RESULT_FIELD = "image_keys"
+IMAGES_THUMBS = {
+    "small": (150, 150),
+    "medium": (480, 480),
+}
+IMAGES_MIN_WIDTH = 50
+IMAGES_MIN_HEIGHT = 50
 
 # Set settings whose default value is deprecated to a future-proof value
 FEED_EXPORT_ENCODING = "utf-8"
+# Formatos de feed propios (se habilitan en config.yml, sección `feeds`)
+FEED_EXPORTERS = {
+    "parquet": "motorciclye.exporters.ParquetItemExporter",
+}
@@ -1,5 +1,6 @@
 from scrapy import signals
 from scrapy.exceptions import NotConfigured
+from itemadapter import ItemAdapter
 
 class ProductSignalMiddleware:
     """Middleware que usa señales para reaccionar a eventos del spider"""
@@ -31,7 +32,11 @@ class ProductSignalMiddleware:
     def item_scraped(self, item, response, spider):
         """Se ejecuta cada vez que se extrae un item (producto)"""
         self.products_count += 1
-        spider.logger.info(f'ProductSignalMiddleware: Producto extraído #{self.products_count}: {item.get("name", "Sin nombre")}')
+        adapter = ItemAdapter(item)
+        spider.logger.info(
+            'ProductSignalMiddleware: Producto extraído #%d: %s', self.products_count, adapter.get("name") or "Sin nombre",
+            extra={'event': 'item_scraped', 'url': adapter.get('product_url')}
+        )
         
         # Aquí puedes agregar tu lógica personalizada
         # Por ejemplo, enviar una notificación cada N productos
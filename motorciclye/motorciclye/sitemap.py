@@ -0,0 +1,159 @@
+"""
+Descubrimiento de productos a partir de robots.txt / sitemap.xml.
+
+Los sitemaps (y los índices de sitemaps, incluidos los .xml.gz) se procesan
+en streaming: el cuerpo se descomprime por bloques y se alimenta a un parser
+XML incremental, descartando cada <url>/<sitemap> apenas se lee. Así la
+memoria no depende del tamaño del sitemap.
+
+El estado incremental (fecha de la última corrida exitosa) se guarda en
+build/<spider>/sitemap_state.json y se usa para programar solo los productos
+cuyo <lastmod> es posterior.
+"""
+
+import json
+import os
+import re
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, List, Optional
+from xml.etree.ElementTree import XMLPullParser, ParseError
+
+CHUNK_SIZE = 64 * 1024
+MAX_SITEMAP_BYTES = 50 * 1024 * 1024  # Límite del protocolo sitemaps (sin comprimir)
+
+_GZIP_MAGIC = b'\x1f\x8b'
+_ROBOTS_SITEMAP_RE = re.compile(r'^\s*sitemap\s*:\s*(\S+)', re.IGNORECASE | re.MULTILINE)
+
+
+@dataclass(frozen=True)
+class SitemapEntry:
+    """Entrada de un sitemap: una URL (urlset) o un sitemap hijo (sitemapindex)"""
+    loc: str
+    lastmod: Optional[datetime] = None
+    is_sitemap: bool = False
+
+
+def sitemaps_from_robots(robots_text: str) -> List[str]:
+    """Extrae las URLs declaradas con 'Sitemap:' en un robots.txt"""
+    return _ROBOTS_SITEMAP_RE.findall(robots_text or '')
+
+
+def parse_lastmod(value: Optional[str]) -> Optional[datetime]:
+    """Convierte un <lastmod> W3C (fecha o fecha+hora) a datetime UTC"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def _iter_chunks(body: bytes) -> Iterator[bytes]:
+    """Devuelve el cuerpo en bloques, descomprimiendo gzip por partes si corresponde"""
+    view = memoryview(body)
+    if body[:2] != _GZIP_MAGIC:
+        for start in range(0, len(view), CHUNK_SIZE):
+            yield bytes(view[start:start + CHUNK_SIZE])
+        return
+
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    total = 0
+    for start in range(0, len(view), CHUNK_SIZE):
+        data = decompressor.decompress(view[start:start + CHUNK_SIZE], CHUNK_SIZE * 4)
+        while True:
+            total += len(data)
+            if total > MAX_SITEMAP_BYTES:
+                raise ValueError('Sitemap descomprimido supera el tamaño máximo permitido')
+            if data:
+                yield data
+            if not decompressor.unconsumed_tail:
+                break
+            data = decompressor.decompress(decompressor.unconsumed_tail, CHUNK_SIZE * 4)
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+
+def _local(tag: str) -> str:
+    """Nombre del tag sin namespace"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def iter_sitemap(body: bytes) -> Iterator[SitemapEntry]:
+    """
+    Recorre un sitemap o índice de sitemaps en streaming.
+
+    Cada <url> produce un SitemapEntry con is_sitemap=False y cada <sitemap>
+    uno con is_sitemap=True. Los elementos se liberan apenas se procesan.
+    """
+    parser = XMLPullParser(events=('start', 'end'))
+    root = None
+    for chunk in _iter_chunks(body):
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if event == 'start':
+                if root is None:
+                    root = elem
+                continue
+            tag = _local(elem.tag)
+            if tag not in ('url', 'sitemap'):
+                continue
+            loc = lastmod = None
+            for child in elem:
+                child_tag = _local(child.tag)
+                if child_tag == 'loc':
+                    loc = (child.text or '').strip()
+                elif child_tag == 'lastmod':
+                    lastmod = child.text
+            if loc:
+                yield SitemapEntry(loc=loc, lastmod=parse_lastmod(lastmod), is_sitemap=(tag == 'sitemap'))
+            elem.clear()
+            if root is not None:
+                # Evita que el root acumule los hijos ya procesados
+                root.clear()
+    try:
+        parser.close()
+    except ParseError:
+        pass
+
+
+def matches_any(url: str, patterns: Iterable[re.Pattern]) -> bool:
+    """Verifica si la URL coincide con alguno de los patrones compilados"""
+    return any(pattern.search(url) for pattern in patterns)
+
+
+class SitemapState:
+    """Estado incremental del descubrimiento por sitemap para un spider"""
+
+    def __init__(self, spider_name: str, base_dir: str = 'build'):
+        self.path = os.path.join(base_dir, spider_name, 'sitemap_state.json')
+        self.last_run: Optional[datetime] = None
+        self.started_at = datetime.now(timezone.utc)
+
+    def load(self) -> 'SitemapState':
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.last_run = parse_lastmod(json.load(f).get('last_run'))
+        except (OSError, ValueError):
+            self.last_run = None
+        return self
+
+    def is_changed(self, lastmod: Optional[datetime]) -> bool:
+        """Un producto sin <lastmod> o sin corrida previa siempre se considera cambiado"""
+        return self.last_run is None or lastmod is None or lastmod > self.last_run
+
+    def save(self):
+        """Registra el inicio de esta corrida como punto de corte de la próxima"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'last_run': self.started_at.isoformat()}, f)
+        os.replace(tmp_path, self.path)
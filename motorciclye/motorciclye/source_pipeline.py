@@ -1,6 +1,9 @@
-import json
 import time
 from datetime import datetime
+from itemadapter import ItemAdapter
+from .items import item_to_dict
+from .message_codecs import get_message_codec
+from .outbox import get_outbox, idempotency_key, outbox_enabled
 from .rabbit_connection import get_rabbit_connection, publish_message
 from .config import load_config
 
@@ -9,22 +12,31 @@ class SourceProcessedPipeline:
     
     def __init__(self):
         self.sources_processed = 0
-        self.connection = get_rabbit_connection()
-        self.channel = self.connection.channel()
+        self.outbox = None
+        self.connection = None
+        self.channel = None
+        if not outbox_enabled():
+            # Sin outbox se publica directo desde el pipeline
+            self.connection = get_rabbit_connection()
+            self.channel = self.connection.channel()
+        self.codec = get_message_codec()
         
     
     def open_spider(self, spider):
         """Se ejecuta cuando se abre el spider"""
         spider.logger.info(f"SourceProcessedPipeline: Iniciando publicación de fuentes para spider {spider.name}")
+        if outbox_enabled():
+            self.outbox = get_outbox(spider.name)
     
     def process_item(self, item, spider):
         """Se ejecuta por cada item. Solo procesa items de tipo 'source'"""
         # Solo procesar si es información de fuente
-        if item.get('item_type') == 'source':
+        adapter = ItemAdapter(item)
+        if adapter.get('item_type') == 'source':
             self.sources_processed += 1
             
             # Log básico
-            spider.logger.info(f"SourcePipeline: Procesando fuente #{self.sources_processed}: {item.get('name', 'Sin nombre')}")
+            spider.logger.info(f"SourcePipeline: Procesando fuente #{self.sources_processed}: {adapter.get('name') or 'Sin nombre'}")
             
             # Publicar en RabbitMQ
             self._publish_source_to_rabbitmq(item, spider)
@@ -37,11 +49,16 @@ class SourceProcessedPipeline:
         """
         cfg = load_config()['rabbitmq']
 
+        source = item_to_dict(source_item)
         try:
-            source_message = json.dumps(source_item, ensure_ascii=False)
+            source_message = self.codec.encode(source)
             routing_key = f'{cfg["routing_key_prefix"]}.sources'
-            publish_message(self.channel, routing_key, source_message)
-            spider.logger.info(f"Publicado fuente en RabbitMQ: {source_item.get('name', 'Sin nombre')}")
+            if self.outbox is not None:
+                message_id = idempotency_key(getattr(spider, 'run_id', None), spider.name, 'source', source.get('source_url'))
+                self.outbox.put(message_id, routing_key, source_message, self.codec.properties)
+            else:
+                publish_message(self.channel, routing_key, source_message, self.codec.properties)
+            spider.logger.info(f"Publicado fuente en RabbitMQ: {source.get('name') or 'Sin nombre'}")
         except Exception as e:
             spider.logger.error(f"Error publicando fuente: {e}")
         
@@ -50,5 +67,6 @@ class SourceProcessedPipeline:
         """Se ejecuta al finalizar el spider"""
         if self.sources_processed > 0:
             spider.logger.info(f"SourcePipeline: Total fuentes publicadas en RabbitMQ: {self.sources_processed}")
-        self.channel.close()
-        self.connection.close()
+        if self.connection is not None:
+            self.channel.close()
+            self.connection.close()
@@ -1,10 +1,21 @@
 import os
 import scrapy
-import re
 from datetime import datetime
 from typing import Optional, List, Dict, Any
-from ..logger import get_logger
+from ..logger import close_logger, get_logger
+from ..pagination import get_pagination_strategy
+from ..prices import PRICE_PARSER
+from ..normalization import cache_stats, normalize_attrs, normalize_text, parse_discount, parse_installments
+from ..items import ItemValidationError, ProductItem
+from ..run_catalog import RunCatalog
+from ..config import load_config
+from ..exporters import parquet_available
+from ..parse_pool import ExtractionError, ParsePool, PoolError
+from .. import bounded_memory, session_handoff
+from ..render_profile import apply_rendering_settings, rendering_enabled
+from ..html_backends import backend_name_for, make_backend, normalize_space
 from scrapy import signals
+from scrapy.utils.defer import maybe_deferred_to_future
 
 class BaseSpider(scrapy.Spider):
     """
@@ -19,6 +30,8 @@ class BaseSpider(scrapy.Spider):
     logger = None
     products = []
     source = None  # Información de la fuente, se puede sobrescribir en subclases
+    parse_pool = None  # Pool de procesos de extracción (config.yml, parsing.process_pool)
+    job_dir = None  # JOBDIR de la corrida en modo de memoria acotada
 
     # XPATHS como atributos de clase
     XPATH_MENU_ITEMS = None
@@ -43,6 +56,43 @@ class BaseSpider(scrapy.Spider):
     XPATH_BREADCRUMB_LAST = None
     HANDLE_PAGINATION = True  # Habilitar paginación por defecto
 
+    # Estrategia de paginación: 'next_link' (secuencial), 'offset' o 'page_number' (fan-out)
+    PAGINATION_STRATEGY = 'next_link'
+    XPATH_TOTAL_RESULTS = None  # Total de resultados del listado (estrategia 'offset')
+    XPATH_LAST_PAGE = None  # Número de la última página (estrategia 'page_number')
+    PAGINATION_PAGE_SIZE = None  # Productos por página; None = los de la primera página
+    PAGINATION_PARAM = 'page'  # Parámetro de query para 'page_number'
+    PAGINATION_URL_TEMPLATE = None  # Plantilla para 'page_number', ej: '{url}page/{page}/'
+    PAGINATION_MAX_PAGES = None  # Límite de páginas por listado (None = sin límite)
+
+    # Backend de parseo de los helpers safe_xpath_* (ver html_backends.py): 'parsel' o 'selectolax'
+    # None = el de config.yml (parsing.html_backend)
+    HTML_BACKEND = None
+    # XPath -> selector CSS para el backend selectolax, ej: {'//h1/text()': 'h1::text'}
+    FAST_SELECTORS = {}
+
+    # Memoria acotada para catálogos muy grandes (ver bounded_memory.py); también
+    # con `-a bounded_memory=1` o en config.yml (bounded_memory.spiders)
+    BOUNDED_MEMORY = False
+
+    # Renderizar las SeleniumRequest en Chrome (SeleniumMiddleware); también en
+    # config.yml (rendering.spiders). Sin esto van por HTTP plano
+    SELENIUM_RENDER = False
+    # Perfil de render de Chrome para SeleniumRequest (ver render_profile.py)
+    # None = el de config.yml (rendering.profile)
+    RENDER_PROFILE = None
+    # Regex de URLs de llamadas XHR/JSON a capturar al renderizar (ver xhr_capture.py);
+    # los payloads quedan en response.meta['xhr'] (helper xhr_payloads)
+    XHR_PATTERNS = []
+
+    # Pasar el chequeo anti-bot en el navegador una vez por dominio y seguir por HTTP
+    # con sus cookies y headers (ver session_handoff.py); también en config.yml
+    SESSION_HANDOFF = False
+
+    # TTL de cache por clase de request; se combinan con HTTPCACHE_POLICY_TTLS
+    # ej: {'listing': 15 * 60, 'product': 24 * 60 * 60}
+    HTTPCACHE_TTLS = {}
+
     # URLs a ignorar (optimizado con set para O(1) lookup)
     ignored_urls = set()
     
@@ -54,6 +104,14 @@ class BaseSpider(scrapy.Spider):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.logger = None  # Se inicializa en init_crawler
+        self._pagination = None
+
+    @property
+    def pagination(self):
+        """Estrategia de paginación configurada para el spider (se crea una sola vez)"""
+        if self._pagination is None:
+            self._pagination = get_pagination_strategy(self)
+        return self._pagination
 
     # Mapping de campos a métodos
     product_field_mapping = {
@@ -67,16 +125,42 @@ class BaseSpider(scrapy.Spider):
         'category_name': 'parse_product_category_name',
         'brand': 'parse_product_brand',
         'attrs': 'parse_product_attrs',
-        'discount': 'parse_product_discount_text',
+        'discount_text': 'parse_product_discount_text',
+        'payments': 'parse_product_payments',
         'category_url': 'parse_product_category_url',
         'stock': 'parse_product_stock',
     }
 
+    # Campos de texto que se repiten entre productos y se normalizan/internan
+    REPEATED_TEXT_FIELDS = ('menu_name', 'category_name', 'brand', 'discount_text')
+
+    @classmethod
+    def update_settings(cls, settings):
+        super().update_settings(settings)
+        if cls.HTTPCACHE_TTLS:
+            ttls = dict(settings.getdict('HTTPCACHE_POLICY_TTLS'))
+            ttls.update(cls.HTTPCACHE_TTLS)
+            settings.set('HTTPCACHE_POLICY_TTLS', ttls, priority='spider')
+
     @classmethod
     def from_crawler(cls, crawler, *args, **kwargs):
         spider = super().from_crawler(crawler, *args, **kwargs)
         spider.init_crawler()
+        if bounded_memory.is_enabled(spider):
+            spider.job_dir = bounded_memory.job_dir_for(spider.name, spider.run_id)
+            bounded_memory.apply_settings(crawler.settings, spider.job_dir)
+            spider.logger.info(f"Modo de memoria acotada: colas y dupefilter en {spider.job_dir}")
+        if rendering_enabled(spider):
+            apply_rendering_settings(crawler.settings)
+            spider.logger.info("Render con Selenium para las SeleniumRequest")
+        if session_handoff.is_enabled(spider):
+            session_handoff.apply_settings(crawler.settings)
+            spider.logger.info("Traspaso de sesión: render en el navegador por dominio y crawl por HTTP")
+        spider.parse_pool = ParsePool.from_config(cls)
+        if spider.parse_pool is not None:
+            spider.logger.info(f"Extracción de productos en {spider.parse_pool.workers} procesos")
         crawler.signals.connect(spider.on_feed_exporter_closed, signal=signals.feed_exporter_closed)
+        crawler.signals.connect(spider.on_engine_stopped, signal=signals.engine_stopped)
         return spider
 
     def init_crawler(self):
@@ -89,26 +173,98 @@ class BaseSpider(scrapy.Spider):
 
         # Configurar archivo de log y output en el directorio build
         output_filename = os.path.join(build_dir, f'{self.name}.json')
-        self.logger = get_logger(self.name, f'{os.path.join(build_dir, 'app.log')}')
+        log_filename = os.path.join(build_dir, 'app.log')
+        self.run_id = timestamp
+        self.logger = get_logger(self.name, log_filename, run_id=timestamp)
         self.output_filename = output_filename
         self.logger.info(f"Directorio de build creado: {build_dir}")
+        self._update_run_catalog('register_start', build_dir, output_filename, log_filename)
         
-        self.crawler.settings.set('FEEDS', {
+        feeds = {
             output_filename: {
                 'format': 'json',
                 'overwrite': True
             }
-        })
+        }
+        feeds.update(self.extra_feeds(build_dir))
+        self.crawler.settings.set('FEEDS', feeds)
+
+    def extra_feeds(self, build_dir: str) -> Dict[str, dict]:
+        """Feeds adicionales al JSON según config.yml (`feeds.extra_formats`)"""
+        cfg = load_config().get('feeds') or {}
+        feeds = {}
+        for feed_format in cfg.get('extra_formats') or []:
+            if feed_format != 'parquet':
+                self.logger.warning(f"Formato de feed desconocido en config.yml: {feed_format}")
+                continue
+            if not parquet_available():
+                self.logger.warning("Feed parquet deshabilitado: falta pyarrow (pip install pyarrow)")
+                continue
+            parquet_cfg = cfg.get('parquet') or {}
+            feeds[os.path.join(build_dir, f'{self.name}.parquet')] = {
+                'format': 'parquet',
+                'overwrite': True,
+                'item_classes': [ProductItem],
+                'item_export_kwargs': {
+                    'row_group_size': parquet_cfg.get('row_group_size', 10000),
+                    'compression': parquet_cfg.get('compression', 'zstd'),
+                },
+            }
+        return feeds
         
 
     def parse_product(self, response):
+        """
+        Extrae el producto con extract_product_fields, en el reactor o en el pool
+        de procesos si está habilitado (ver parse_pool.py).
+        """
+        self.logger.info("Parseando producto: %s", response.url, extra={'event': 'product_parsed', 'url': response.url})
+        if self.parse_pool is not None:
+            return self._parse_product_in_pool(response)
+        return self._parse_product_inline(response)
+
+    def _parse_product_inline(self, response):
+        try:
+            data = self.extract_product_fields(response)
+        except Exception as e:
+            self.handle_product_error(response, e)
+            return
+        yield from self._emit_product(data)
+
+    async def _parse_product_in_pool(self, response):
+        try:
+            data, records, stats = await maybe_deferred_to_future(self.parse_pool.extract(response))
+        except ExtractionError as e:
+            self.handle_product_error(response, e.error)
+            return
+        except PoolError as e:
+            self.logger.warning(f"Pool de extracción falló, se parsea en el reactor: {e}", extra={'url': response.url})
+            for product in self._parse_product_inline(response):
+                yield product
+            return
+        for level, message in records:
+            self.logger.log(level, message)
+        for key, count in stats.items():
+            self.crawler.stats.inc_value(key, count)
+        for product in self._emit_product(data):
+            yield product
+
+    def _emit_product(self, data: dict):
+        data['source'] = getattr(self, 'source_parsed', False)
+        product = self.build_product(data)
+        if product is not None:
+            yield product
+
+    def handle_product_error(self, response, error: Exception):
+        """Error extrayendo un producto: por defecto se loguea y se descarta"""
+        self.logger.error(f"Error al parsear producto: {response.url} - {error}")
+
+    def extract_product_fields(self, response) -> dict:
         """
         Extrae todos los campos de un producto usando el mapeo de métodos.
-        Optimizado para manejo de errores y logging.
+        Puede correr en un proceso del pool: usar solo la response y atributos de clase.
         """
-        self.logger.info(f"Parseando producto: {response.url}")
-        data = {'source': self.name}  # Agregar source por defecto
-        
+        data = {}
         for field, method_name in self.product_field_mapping.items():
             try:
                 method = getattr(self, method_name, None)
@@ -120,13 +276,20 @@ class BaseSpider(scrapy.Spider):
                     self.logger.debug(f"Método {method_name} no implementado para {field}")
             except Exception as e:
                 self.logger.warning(f"Error extrayendo {field} con {method_name}: {e}")
-                
-        yield data
+        return data
+
+    @property
+    def html_backend(self):
+        """Backend de los helpers safe_xpath_*; se crea al primer uso (también en el pool de procesos)"""
+        backend = self.__dict__.get('_html_backend')
+        if backend is None:
+            backend = self._html_backend = make_backend(backend_name_for(type(self)), self.FAST_SELECTORS)
+        return backend
 
     def safe_xpath_get(self, response, xpath: str, default: Any = None) -> Any:
         """Helper para extraer valores XPath con manejo de errores"""
         try:
-            return response.xpath(xpath).get() if xpath else default
+            return self.html_backend.get(response, xpath) if xpath else default
         except Exception as e:
             self.logger.debug(f"Error en XPath {xpath}: {e}")
             return default
@@ -134,27 +297,74 @@ class BaseSpider(scrapy.Spider):
     def safe_xpath_getall(self, response, xpath: str, default: List = None) -> List:
         """Helper para extraer listas XPath con manejo de errores"""
         try:
-            return response.xpath(xpath).getall() if xpath else (default or [])
+            return self.html_backend.getall(response, xpath) if xpath else (default or [])
         except Exception as e:
             self.logger.debug(f"Error en XPath {xpath}: {e}")
             return default or []
+
+    def safe_xpath_pairs(self, response, rows_xpath: str, key_xpath: str, value_xpath: str) -> List:
+        """Helper para extraer pares (clave, valor) de cada fila, ej. tablas de especificaciones"""
+        if not (rows_xpath and key_xpath and value_xpath):
+            return []
+        try:
+            return self.html_backend.pairs(response, rows_xpath, key_xpath, value_xpath)
+        except Exception as e:
+            self.logger.debug(f"Error en XPath {rows_xpath}: {e}")
+            return []
+    
+    def xhr_payloads(self, response, pattern: str = None) -> List:
+        """JSON de las llamadas XHR capturadas al renderizar, opcionalmente solo las de un patrón de XHR_PATTERNS"""
+        return [
+            item['data'] for item in response.meta.get('xhr') or []
+            if pattern is None or item['pattern'] == pattern
+        ]
     
     def clean_price(self, price_text: str) -> Optional[float]:
-        """Limpia y convierte texto de precio a float"""
-        if not price_text:
+        """
+        Convierte texto de precio a float con las reglas es-AR (ver prices.py).
+        Un precio en cuotas ("6 cuotas de $ 1.234") no es el precio del producto:
+        devuelve None (las cuotas van en `payments`/`installments`)
+        """
+        parsed = PRICE_PARSER.parse(price_text)
+        if parsed.installments:
+            self.logger.warning(f"Precio en cuotas descartado ({parsed.installments} cuotas): {price_text}")
+            self.crawler.stats.inc_value('price/installments_discarded')
             return None
+        if parsed.value is None and parsed.status != 'empty':
+            self.logger.debug(f"Precio sin valor ({parsed.status}): {price_text}")
+        return parsed.value
+
+    def normalize_product(self, data: dict) -> dict:
+        """
+        Normaliza los textos repetitivos del producto (ver normalization.py) y agrega
+        los valores estructurados: discount_percent e installments.
+        """
+        for field in self.REPEATED_TEXT_FIELDS:
+            value = data.get(field)
+            if isinstance(value, str):
+                data[field] = normalize_text(value)
+        if data.get('attrs'):
+            data['attrs'] = normalize_attrs(data['attrs'])
+
+        discount = data.get('discount_text')
+        if discount:
+            percent = parse_discount(discount)
+            if percent is not None:
+                data['discount_percent'] = percent
+        if data.get('payments'):
+            installments = [parse_installments(text) for text in data['payments']]
+            installments = [option.to_dict() for option in installments if option]
+            if installments:
+                data['installments'] = installments
+        return data
+
+    def build_product(self, data: dict) -> Optional[ProductItem]:
+        """Normaliza y construye el ProductItem; si no respeta el esquema se loguea y se descarta"""
         try:
-            # Remover caracteres no numéricos excepto punto y coma
-            cleaned = re.sub(r'[^\d.,]', '', price_text.strip())
-            # Reemplazar coma por punto para decimales
-            cleaned = cleaned.replace(',', '.')
-            # Si hay múltiples puntos, mantener solo el último como decimal
-            if cleaned.count('.') > 1:
-                parts = cleaned.split('.')
-                cleaned = ''.join(parts[:-1]) + '.' + parts[-1]
-            return float(cleaned) if cleaned else None
-        except (ValueError, AttributeError):
-            self.logger.debug(f"No se pudo convertir precio: {price_text}")
+            return ProductItem(**self.normalize_product(data))
+        except (ItemValidationError, TypeError) as e:
+            self.crawler.stats.inc_value('item_validation_errors')
+            self.logger.warning(f"Producto descartado por esquema inválido: {e}", extra={'url': data.get('product_url')})
             return None
 
     # Métodos por defecto optimizados (pueden ser sobrescritos en subclases)
@@ -193,10 +403,9 @@ class BaseSpider(scrapy.Spider):
         payments_text = []
         if self.XPATH_PRODUCT_PAYMENTS:
             try:
-                for payment in response.xpath(self.XPATH_PRODUCT_PAYMENTS):
-                    payment_text = payment.xpath('string(.)').get()
+                for payment_text in self.html_backend.strings(response, self.XPATH_PRODUCT_PAYMENTS):
                     if payment_text and payment_text.strip():
-                        payments_text.append(payment_text.strip())
+                        payments_text.append(normalize_text(payment_text))
             except Exception as e:
                 self.logger.debug(f"Error extrayendo pagos: {e}")
         return payments_text or None
@@ -208,9 +417,9 @@ class BaseSpider(scrapy.Spider):
         if not self.XPATH_BREADCRUMB_LAST:
             return None
         try:
-            breadcrumb = response.xpath(self.XPATH_BREADCRUMB_LAST)
-            if breadcrumb:
-                return breadcrumb.xpath('normalize-space(string())').get()
+            names = self.html_backend.strings(response, self.XPATH_BREADCRUMB_LAST)
+            if names:
+                return normalize_space(names[0])
         except Exception as e:
             self.logger.debug(f"Error extrayendo categoría: {e}")
         return None
@@ -219,19 +428,44 @@ class BaseSpider(scrapy.Spider):
         if not self.XPATH_BREADCRUMB_LAST:
             return None
         try:
-            breadcrumb = response.xpath(self.XPATH_BREADCRUMB_LAST)
-            if breadcrumb:
-                return breadcrumb.xpath('./@href').get()
+            return self.html_backend.attribute(response, self.XPATH_BREADCRUMB_LAST, 'href')
         except Exception as e:
             self.logger.debug(f"Error extrayendo URL categoría: {e}")
         return None
 
+    def _update_run_catalog(self, method, *args):
+        """Registra la corrida en build/catalog.sqlite3; un error acá nunca corta el crawl"""
+        try:
+            with RunCatalog() as catalog:
+                getattr(catalog, method)(self.name, self.run_id, *args)
+        except Exception as e:
+            self.logger.warning(f"No se pudo actualizar el catálogo de corridas ({method}): {e}")
+
     def on_feed_exporter_closed(self):
         """
         Se ejecuta cuando el archivo de feed (json) fue cerrado y está listo para ser leído.
         """
         self.logger.info(f"Feed exportado: {self.output_filename}")
+        self._update_run_catalog('update_sizes')
+
+    def on_engine_stopped(self):
+        """
+        Último paso de la corrida, con scheduler, extensiones y feeds ya cerrados:
+        elimina el JOBDIR del modo acotado y cierra el logger (después de los logs
+        de on_feed_exporter_closed y del catálogo de corridas)
+        """
+        if self.job_dir and self.crawler.stats.get_value('finish_reason') == 'finished':
+            bounded_memory.remove_job_dir(self.job_dir)
+        close_logger(self.name)
 
     def close(self, reason):
         self.logger.info(f"Spider {self.name} finalizado. Motivo: {reason}")
+        self.logger.debug(f"Caches de normalización: {cache_stats()}")
+        self._update_run_catalog('register_finish', reason, self.crawler.stats.get_stats())
+        if self.parse_pool is not None:
+            self.logger.info(
+                f"Pool de extracción: {self.parse_pool.submitted} productos, "
+                f"{self.parse_pool.shared_bytes / 1024 / 1024:.1f} MB por memoria compartida"
+            )
+            self.parse_pool.close()
         # No llamar a handle_publish aquí, se hace en on_feed_exporter_closed
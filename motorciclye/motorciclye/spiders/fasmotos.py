@@ -39,6 +39,13 @@ class FasmotosSpider(MotodeltaSpider):
     XPATH_PRODUCT_DESCRIPTION = '//*[@id="ui-vpp-highlighted-specs"]'
     XPATH_PRODUCT_DISCOUNT_TEXT = '//*[@id="pills"]/div/div/p/span/text()'
     XPATH_PRODUCT_PAYMENTS = '//*[@id="pricing_price_subtitle"]'
+    FAST_SELECTORS = {
+        **MotodeltaSpider.FAST_SELECTORS,
+        XPATH_PRODUCT_PRICE: '#price > div > div:nth-of-type(1) > div:nth-of-type(1) > span:nth-of-type(1) > span > span:nth-of-type(2)::text',
+        XPATH_PRODUCT_IMAGES: 'img[data-zoom]::attr(data-zoom)',
+        XPATH_PRODUCT_DISCOUNT_TEXT: '#pills > div > div > p > span::text',
+        XPATH_PRODUCT_PAYMENTS: '#pricing_price_subtitle',
+    }
 
     HANDLE_PAGINATION = False  # Deshabilitar paginación
 
@@ -58,6 +65,10 @@ class FasmotosSpider(MotodeltaSpider):
 
     def start_requests(self):
         """Generar requests con Selenium y debugging habilitado"""
+        if self.use_sitemap():
+            yield from self.start_sitemap_requests()
+            return
+
         for option in self.start_urls:
             url = option.get('menu_url')
             menu_name = option.get('menu_name')
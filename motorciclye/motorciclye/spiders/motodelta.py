@@ -1,7 +1,12 @@
 from urllib import response
+import re
 import scrapy
+from xml.etree.ElementTree import ParseError
 from scrapy_selenium import SeleniumRequest
 from .base_spider import BaseSpider
+from ..items import SourceItem
+from ..pagination import FANOUT_META_KEY
+from ..sitemap import SitemapState, iter_sitemap, matches_any, sitemaps_from_robots
 
 class MotodeltaSpider(BaseSpider):
     source_parsed = False  # Inicializar la fuente como None
@@ -29,7 +34,22 @@ class MotodeltaSpider(BaseSpider):
     XPATH_PRODUCT_ATTRS_VALUE = './/td//span[@class="andes-table__column--value"]/text()'
 
     XPATH_BREADCRUMB_LAST = '//*[contains(@class, "andes-breadcrumb")]//li[last()]/a'
+
+    # Selectores CSS equivalentes para HTML_BACKEND = 'selectolax' (ver html_backends.py)
+    FAST_SELECTORS = {
+        XPATH_PRODUCT_NAME: 'h1::text',
+        XPATH_PRODUCT_PRICE: '#price > div > div:nth-of-type(1) > div:nth-of-type(1) > span > span > span:nth-of-type(2)::text',
+        XPATH_PRODUCT_IMAGES: 'div img[data-zoom]::attr(data-zoom)',
+        XPATH_PRODUCT_DESCRIPTION: '[class="ui-pdp-description__content"]::text',
+        XPATH_PRODUCT_ATTRS: 'table[class="andes-table"] tr:has(> th):has(> td)',
+        XPATH_PRODUCT_ATTRS_KEY: 'th ::text',
+        XPATH_PRODUCT_ATTRS_VALUE: 'td span[class="andes-table__column--value"]::text',
+        XPATH_BREADCRUMB_LAST: '[class*="andes-breadcrumb"] li:last-of-type > a',
+    }
     HANDLE_PAGINATION = True  # Habilitar paginación por defecto
+    # Los listados de MercadoShops usan offsets (_Desde_N) y muestran el total de resultados
+    PAGINATION_STRATEGY = 'offset'
+    XPATH_TOTAL_RESULTS = '//*[contains(@class, "ui-search-search-result__quantity-results")]/text()'
 
     XPATH_SOURCE_IMG_LOGO = '//*[@id="image-logo"]/@src'
     XPATH_SOURCE_ADDRESS = '//*[@id="shop-address-link"]/span/text()'
@@ -41,8 +61,93 @@ class MotodeltaSpider(BaseSpider):
     XPATH_SOURCE_WS = None
     XPATH_BUSINESS_HOURS_TEXT = None
 
+    # Descubrimiento por sitemap (alternativa al recorrido de menús y paginado).
+    # Se activa con SITEMAP_ENABLED = True o con `scrapy crawl <spider> -a sitemap=1`;
+    # `-a sitemap_full=1` ignora <lastmod> y programa todos los productos.
+    SITEMAP_ENABLED = False
+    SITEMAP_URLS = []  # Si está vacío se usan los 'Sitemap:' de robots.txt
+    SITEMAP_PRODUCT_PATTERNS = [r'/MLA-?\d+']  # Regex de URLs de producto (tiendas MercadoShops)
+    SITEMAP_FOLLOW_PATTERNS = []  # Regex de sitemaps hijos a seguir (vacío = todos)
+    SITEMAP_INCREMENTAL = True
+    sitemap_state = None
+
+    def use_sitemap(self) -> bool:
+        """Indica si el spider descubre productos por sitemap en lugar de por menús"""
+        flag = getattr(self, 'sitemap', None)
+        if flag is not None:
+            return str(flag).lower() in ('1', 'true', 'yes', 'si')
+        return self.SITEMAP_ENABLED
+
+    def start_sitemap_requests(self):
+        """Parsea la fuente y luego programa la descarga de robots.txt / sitemaps"""
+        self.sitemap_state = SitemapState(self.name)
+        full = str(getattr(self, 'sitemap_full', '')).lower() in ('1', 'true', 'yes', 'si')
+        if self.SITEMAP_INCREMENTAL and not full:
+            self.sitemap_state.load()
+        self._sitemap_product_re = [re.compile(p) for p in self.SITEMAP_PRODUCT_PATTERNS]
+        self._sitemap_follow_re = [re.compile(p) for p in self.SITEMAP_FOLLOW_PATTERNS]
+        self.logger.info(f"Descubrimiento por sitemap habilitado (última corrida: {self.sitemap_state.last_run})")
+
+        source_url = self.start_urls[0] + (self.SOURCE_INFO_URL or '')
+        yield SeleniumRequest(url=source_url, callback=self.parse_source_and_sitemap)
+
+    def parse_source_and_sitemap(self, response):
+        for item in self.parse_source(response):
+            yield item
+
+        if self.SITEMAP_URLS:
+            for url in self.SITEMAP_URLS:
+                yield scrapy.Request(url=response.urljoin(url), callback=self.parse_sitemap, meta={'dont_cache': True})
+        else:
+            yield scrapy.Request(
+                url=response.urljoin('/robots.txt'),
+                callback=self.parse_robots,
+                meta={'dont_cache': True}
+            )
+
+    def parse_robots(self, response):
+        sitemap_urls = sitemaps_from_robots(response.text)
+        if not sitemap_urls:
+            sitemap_urls = [response.urljoin('/sitemap.xml')]
+        self.logger.info(f"Sitemaps encontrados en robots.txt: {sitemap_urls}")
+        for url in sitemap_urls:
+            yield scrapy.Request(url=url, callback=self.parse_sitemap, meta={'dont_cache': True})
+
+    def parse_sitemap(self, response):
+        """Recorre un sitemap o índice en streaming y programa solo los productos cambiados"""
+        scheduled = skipped = 0
+        try:
+            for entry in iter_sitemap(response.body):
+                if entry.is_sitemap:
+                    if self._sitemap_follow_re and not matches_any(entry.loc, self._sitemap_follow_re):
+                        continue
+                    if not self.sitemap_state.is_changed(entry.lastmod):
+                        continue
+                    yield scrapy.Request(url=entry.loc, callback=self.parse_sitemap, meta={'dont_cache': True})
+                elif matches_any(entry.loc, self._sitemap_product_re):
+                    if self.should_ignore_url(entry.loc) or not self.sitemap_state.is_changed(entry.lastmod):
+                        skipped += 1
+                        continue
+                    scheduled += 1
+                    yield scrapy.Request(
+                        url=entry.loc,
+                        callback=self.parse_product,
+                        meta={'menu_name': None, 'menu_url': None}
+                    )
+        except (ParseError, ValueError) as e:
+            self.logger.warning(f"Sitemap inválido {response.url}: {e}")
+        self.logger.info(f"Sitemap {response.url}: {scheduled} productos programados, {skipped} sin cambios")
+
+    def close(self, reason):
+        if self.sitemap_state is not None and reason == 'finished':
+            self.sitemap_state.save()
+        super().close(reason)
 
     def start_requests(self):
+        if self.use_sitemap():
+            yield from self.start_sitemap_requests()
+            return
+
         # Si SOURCE_INFO_URL está definido, primero parsea la fuente desde esa URL
         if self.SOURCE_INFO_URL:
             yield SeleniumRequest(
@@ -74,12 +179,12 @@ class MotodeltaSpider(BaseSpider):
             ws = response.xpath(self.XPATH_SOURCE_WS).get() if self.XPATH_SOURCE_WS else None
             business_hours_text = response.xpath(self.XPATH_BUSINESS_HOURS_TEXT).get() if self.XPATH_BUSINESS_HOURS_TEXT else None
 
-            source = {
-                'source_url': response.url,
-                'name': name,
-                'address': address,
-                'logo': logo,
-                'contact_methods': {
+            source_item = SourceItem(
+                source_url=response.url,
+                name=name,
+                address=address,
+                logo=logo,
+                contact_methods={
                     'fb': fb,
                     'ig': ig,
                     'x': x,
@@ -87,13 +192,9 @@ class MotodeltaSpider(BaseSpider):
                     'email': email,
                     'ws': ws,
                     'business_hours': business_hours_text
-                }
-            }
-            
-            # Crear un item para el pipeline con el tipo 'source'
-            source_item = dict(source)
-            source_item['item_type'] = 'source'
-            self.source_parsed = True            
+                },
+            )
+            self.source_parsed = True
             # Enviar al pipeline para procesamiento
             yield source_item
         except Exception as e:
@@ -161,29 +262,29 @@ class MotodeltaSpider(BaseSpider):
         # PAGINADO
         if self.HANDLE_PAGINATION:
             self.logger.info("Paginación habilitada, buscando más páginas.")
-            next_page = response.xpath(self.XPATH_NEXT_PAGE).get()
-            if next_page:
-                self.logger.info(f"Siguiente página encontrada: {next_page}")
+            pages = self.pagination.next_page_urls(response, len(product_links))
+            if pages.urls:
+                self.logger.info(f"Páginas programadas desde {response.url}: {len(pages.urls)}")
+            for page_url in pages.urls:
                 yield scrapy.Request(
-                    url=response.urljoin(next_page),
+                    url=page_url,
                     callback=self.parse_list_of_products,
                     meta={
                         'menu_name': response.meta.get('menu_name'),
-                        'menu_url': response.meta.get('menu_url')
+                        'menu_url': response.meta.get('menu_url'),
+                        FANOUT_META_KEY: pages.fanout,
                     }
                 )
 
     def parse_product_attrs(self, response):
         """Extrae todos los atributos de la tabla de especificaciones"""
         attrs = {}
-        if self.XPATH_PRODUCT_ATTRS:
-            # Si no hay XPATH específico, extraer toda la tabla
-            rows = response.xpath(self.XPATH_PRODUCT_ATTRS)
-            for row in rows:
-                key = row.xpath(self.XPATH_PRODUCT_ATTRS_KEY).get()
-                value = row.xpath(self.XPATH_PRODUCT_ATTRS_VALUE).get()
-                if key and value:
-                    attrs[key.strip()] = value.strip()
+        pairs = self.safe_xpath_pairs(
+            response, self.XPATH_PRODUCT_ATTRS, self.XPATH_PRODUCT_ATTRS_KEY, self.XPATH_PRODUCT_ATTRS_VALUE
+        )
+        for key, value in pairs:
+            if key and value:
+                attrs[key.strip()] = value.strip()
         return attrs
 
     def parse_product_brand(self, response):
@@ -193,46 +294,42 @@ class MotodeltaSpider(BaseSpider):
             return brand.strip()
         return None
 
-    def parse_product(self, response):
-        try:
-            self.logger.info(f"Parseando producto: {response.url}")
-            name = self.parse_product_name(response)
-            price = self.parse_product_price(response)
-            # Para ver el HTML completo en los logs:
-            self.logger.debug(response.text)
-            images = self.parse_product_images(response)
-            description = self.parse_product_description(response)
-            attrs = self.parse_product_attrs(response)
-            brand = self.parse_product_brand(response)
-            discount_text = self.parse_product_discount_text(response)
-            payments = self.parse_product_payments(response)
-
-            menu_name = response.meta.get('menu_name')
-            menu_url = response.meta.get('menu_url')
-            self.logger.debug(f"Extraído: name={name}, price={price}, images={len(images)} imágenes")
-
-            # Extraer la categoría del último breadcrumb
-            category_name = self.parse_product_category_name(response)
-            category_url = self.parse_product_category_url(response)
-
-            product = {
-                'item_type': 'product',
-                'menu_name': menu_name,
-                'menu_url': menu_url,
-                'product_url': response.url,
-                'name': name,
-                'price': price,
-                'brand': brand,
-                'attrs': attrs,
-                'payments': payments,
-                'discount_text': discount_text,
-                'images': images,
-                'description': description,
-                'category_name': category_name,
-                'category_url': category_url,
-                'source': self.source_parsed,
-            }
-            yield product
-        except Exception as e:
-            self.logger.error(f"Error al parsear producto: {response.url} - {e}")
-            raise scrapy.exceptions.CloseSpider(f"Error al parsear producto: {response.url} - {e}")
+    def extract_product_fields(self, response):
+        name = self.parse_product_name(response)
+        price = self.parse_product_price(response)
+        # Para ver el HTML completo en los logs:
+        self.logger.debug(response.text)
+        images = self.parse_product_images(response)
+        description = self.parse_product_description(response)
+        attrs = self.parse_product_attrs(response)
+        brand = self.parse_product_brand(response)
+        discount_text = self.parse_product_discount_text(response)
+        payments = self.parse_product_payments(response)
+
+        menu_name = response.meta.get('menu_name')
+        menu_url = response.meta.get('menu_url')
+        self.logger.debug(f"Extraído: name={name}, price={price}, images={len(images)} imágenes")
+
+        # Extraer la categoría del último breadcrumb
+        category_name = self.parse_product_category_name(response)
+        category_url = self.parse_product_category_url(response)
+
+        return {
+            'menu_name': menu_name,
+            'menu_url': menu_url,
+            'product_url': response.url,
+            'name': name,
+            'price': price,
+            'brand': brand,
+            'attrs': attrs,
+            'payments': payments,
+            'discount_text': discount_text,
+            'images': images,
+            'description': description,
+            'category_name': category_name,
+            'category_url': category_url,
+        }
+
+    def handle_product_error(self, response, error):
+        self.logger.error(f"Error al parsear producto: {response.url} - {error}")
+        raise scrapy.exceptions.CloseSpider(f"Error al parsear producto: {response.url} - {error}")
@@ -57,11 +57,4 @@ class MotojoseSpider(MotodeltaSpider):
     def parse_product_images(self, response):
         """Extrae imágenes y las convierte a URLs absolutas"""
         images = self.safe_xpath_getall(response, self.XPATH_PRODUCT_IMAGES)
-        return [response.urljoin(img) for img in images] if images else None
-
-    def parse_product_price(self, response):
-        """Parse de precio que maneja casos especiales como 'consultar'"""
-        price_text = self.safe_xpath_get(response, self.XPATH_PRODUCT_PRICE)
-        if price_text and 'consultar' in price_text.lower():
-            return None
-        return self.clean_price(price_text)
\ No newline at end of file
+        return [response.urljoin(img) for img in images] if images else None
\ No newline at end of file
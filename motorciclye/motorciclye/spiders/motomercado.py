@@ -27,6 +27,7 @@ class MotomercadoSpider(MotodeltaSpider):
     XPATH_PRODUCT_LINKS = '//div[contains(@class, "item-product")]//a/@href'
     XPATH_NEXT_PAGE = '//a[@class="pagination-next"]/@href'
     HANDLE_PAGINATION = True
+    SITEMAP_PRODUCT_PATTERNS = [r'/productos/']  # Tiendanube
     XPATH_PRODUCT_NAME = '//h1[@class="product-name"]/text() | //h1/text()'
     XPATH_PRODUCT_PRICE = '//span[@class="price-current"]/text() | //*[@id="price_display"]/text() | //span[contains(@class, "price")]/text()'
     XPATH_PRODUCT_IMAGES = '//div[@class="product-images"]//img/@src | //div[contains(@class, "image")]//img/@src'
@@ -37,50 +38,22 @@ class MotomercadoSpider(MotodeltaSpider):
     XPATH_PRODUCT_ATTRS_VALUE = './text()'
     XPATH_PRODUCT_DISCOUNT_TEXT = '//*[contains(@class, "offer") and contains(text(), "%") and contains(text(), "OFF")]/text() | //div[contains(@class, "text-uppercase") and contains(@class, "font-weight-bold") and contains(text(), "% Off")]/text() | //span[contains(@class, "offer") and contains(text(), "%")]/text()'
 
+    # Selectores alternativos si XPATH_PRODUCT_PRICE no encuentra el precio
+    XPATH_PRODUCT_PRICE_FALLBACKS = (
+        '//span[contains(@class, "price")]/text()',
+        '//div[contains(@class, "price")]//text()',
+        '//*[contains(text(), "$")]//text()',
+        '//span[contains(text(), "$")]/text()',
+    )
+
     def parse_product_price(self, response):
-        # Intentar múltiples selectores para el precio
-        raw_price = response.xpath(self.XPATH_PRODUCT_PRICE).get()
-        
+        raw_price = self.safe_xpath_get(response, self.XPATH_PRODUCT_PRICE)
         if not raw_price:
-            # Selectores alternativos para precios
-            price_selectors = [
-                '//span[contains(@class, "price")]/text()',
-                '//div[contains(@class, "price")]//text()',
-                '//*[contains(text(), "$")]//text()',
-                '//span[contains(text(), "$")]/text()'
-            ]
-            
-            for selector in price_selectors:
-                raw_price = response.xpath(selector).get()
+            for selector in self.XPATH_PRODUCT_PRICE_FALLBACKS:
+                raw_price = self.safe_xpath_get(response, selector)
                 if raw_price and '$' in raw_price:
                     break
-        
-        if raw_price:
-            # Limpiar el precio de caracteres especiales
-            import re
-            # Buscar números con punto o coma como separadores decimales
-            price_match = re.search(r'[\$]?\s*([0-9]{1,3}(?:[.,]\d{3})*(?:[.,]\d{2})?)', raw_price.replace(' ', ''))
-            if price_match:
-                price_str = price_match.group(1)
-                # Convertir formato argentino (punto para miles, coma para decimales)
-                if ',' in price_str and '.' in price_str:
-                    # Formato: 1.234,56
-                    price_str = price_str.replace('.', '').replace(',', '.')
-                elif ',' in price_str:
-                    # Formato: 1234,56 o 1,234 (miles)
-                    if len(price_str.split(',')[1]) == 2:
-                        # Es decimal: 1234,56
-                        price_str = price_str.replace(',', '.')
-                    else:
-                        # Son miles: 1,234
-                        price_str = price_str.replace(',', '')
-                
-                try:
-                    return float(price_str)
-                except ValueError:
-                    pass
-        
-        return None
+        return self.clean_price(raw_price)
     
     def parse_product_images(self, response):
         images = response.xpath(self.XPATH_PRODUCT_IMAGES).getall()
@@ -45,6 +45,9 @@ class MotosportSpider(MotodeltaSpider):
         }
     }
 
+    # El chequeo anti-bot se pasa en el navegador y el crawl sigue por HTTP (session_handoff.py)
+    SESSION_HANDOFF = True
+
     SOURCE_INFO_URL = None  # Si la info de la fuente está en otra URL, pon aquí el path relativo o None (ej: "/contacto")
 
     # XPATHS como atributos de clase
@@ -67,7 +70,21 @@ class MotosportSpider(MotodeltaSpider):
     XPATH_BREADCRUMB_LAST = None
     XPATH_PRODUCT_DISCOUNT_TEXT = '/html/body/div[1]/main/div/div[3]/div/section/div[2]/div[2]/div/div/div[1]/div/div[1]/div[1]/div/div/span/text()'
     XPATH_PRODUCT_PAYMENTS = '//div[@class="text text-promo"]/ul/li'
+    FAST_SELECTORS = {
+        **MotodeltaSpider.FAST_SELECTORS,
+        XPATH_PRODUCT_PRICE: '[class="price-wrapper"] > p span[class="woocommerce-Price-amount amount"] > bdi::text',
+        XPATH_PRODUCT_IMAGES: 'img[class="wp-post-image ux-skip-lazy"]::attr(src)',
+        XPATH_PRODUCT_DESCRIPTION: 'div[class="product-short-description"] > p::text',
+        XPATH_PRODUCT_ATTRS: '#accordion-additional_information-content > table tr:has(> th):has(> td)',
+        XPATH_PRODUCT_ATTRS_VALUE: 'td > p::text',
+        XPATH_PRODUCT_PAYMENTS: 'div[class="text text-promo"] > ul > li',
+    }
     HANDLE_PAGINATION = True  # Habilitar paginación por defecto
+    # WooCommerce: /page/N/ con el número de la última página en la navegación
+    PAGINATION_STRATEGY = 'page_number'
+    XPATH_LAST_PAGE = '(//ul[contains(@class, "page-numbers")]//a[contains(@class, "page-number") and not(contains(@class, "next"))])[last()]/text()'
+    PAGINATION_URL_TEMPLATE = '{url}page/{page}/'
+    SITEMAP_PRODUCT_PATTERNS = [r'/producto/']  # WooCommerce
 
     XPATH_SOURCE_IMG_LOGO = '//*[@id="logo"]/a/img[1]/@src'
     XPATH_SOURCE_ADDRESS = '//*[@id="col-2083106921"]/div/div[2]/text()'
@@ -127,6 +144,10 @@ class MotosportSpider(MotodeltaSpider):
     
     def start_requests(self):
         """Generar requests iniciales con headers anti-bot optimizados"""
+        if self.use_sitemap():
+            yield from self.start_sitemap_requests()
+            return
+
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
@@ -30,6 +30,8 @@ import scrapy
 from scrapy.crawler import CrawlerProcess
 from scrapy.utils.project import get_project_settings
 from scrapy.spiders import Spider
+from itemadapter import ItemAdapter
+from motorciclye.items import item_to_dict
 
 
 class SpiderTestResult:
@@ -111,19 +113,20 @@ class TestPipeline:
     def process_item(self, item, spider):
         try:
             # Validar estructura básica del item
-            if not isinstance(item, dict):
-                self.test_result.add_error(f"Item no es un diccionario: {type(item)}")
+            if not ItemAdapter.is_item(item):
+                self.test_result.add_error(f"Item de tipo no soportado: {type(item)}")
                 return item
                 
-            item_type = item.get('item_type')
+            adapter = ItemAdapter(item)
+            item_type = adapter.get('item_type')
             
             if item_type == 'source':
-                self._test_source_item(item, spider)
-                self.test_result.add_source(item)
+                self._test_source_item(adapter, spider)
+                self.test_result.add_source(item_to_dict(item))
                 
             elif item_type == 'product':
-                self._test_product_item(item, spider)
-                self.test_result.add_product(item)
+                self._test_product_item(adapter, spider)
+                self.test_result.add_product(adapter)
                 
             else:
                 self.test_result.add_warning(f"Tipo de item desconocido: {item_type}")
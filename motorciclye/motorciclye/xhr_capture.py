@@ -0,0 +1,108 @@
+"""
+Captura de respuestas XHR/JSON durante el render (selenium_middleware.py).
+
+Los sitios que necesitan navegador suelen cargar el catálogo con llamadas XHR
+que devuelven JSON; esperar unos segundos y parsear el DOM resultante es lento
+(la espera es fija aunque los datos ya llegaron) y frágil (el markup cambia
+más que la API). Con captura:
+
+- Chrome guarda los eventos de red en el log `performance` (solo el dominio
+  Network) y el middleware los lee mientras la página carga.
+- Cada respuesta XHR/Fetch cuya URL coincide con un patrón (regex) del spider
+  (XHR_PATTERNS) o de la request (`meta['xhr_patterns']`) se lee con
+  Network.getResponseBody cuando termina de cargar.
+- La espera termina apenas cada patrón tuvo al menos una respuesta, o al
+  vencer `rendering.xhr.timeout_secs` (o `meta['xhr_timeout']`).
+
+Los payloads quedan en `response.meta['xhr']` como una lista de
+{'url', 'status', 'pattern', 'data'} en orden de llegada; `data` es el JSON
+ya decodificado. Las respuestas que no son JSON válido se descartan.
+"""
+
+import base64
+import json
+import re
+import time
+from typing import Dict, List, Sequence
+
+from selenium.common.exceptions import WebDriverException
+
+from .config import load_config
+
+DEFAULT_TIMEOUT_SECS = 10
+DEFAULT_POLL_INTERVAL_SECS = 0.1
+CAPTURED_TYPES = {'XHR', 'Fetch'}
+
+
+def xhr_config() -> dict:
+    return (load_config().get('rendering') or {}).get('xhr') or {}
+
+
+def enable_logging(chrome_options):
+    """Log `performance` de ChromeDriver con los eventos de red; se aplica antes de crear el driver"""
+    chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    chrome_options.add_experimental_option('perfLoggingPrefs', {'enableNetwork': True, 'enablePage': False})
+
+
+class XhrCapture:
+    """Lee del log de performance las respuestas XHR/Fetch que coinciden con los patrones"""
+
+    def __init__(self, timeout: float = None, poll_interval: float = None):
+        cfg = xhr_config()
+        self.timeout = timeout if timeout is not None else cfg.get('timeout_secs', DEFAULT_TIMEOUT_SECS)
+        self.poll_interval = poll_interval if poll_interval is not None else cfg.get('poll_interval_secs', DEFAULT_POLL_INTERVAL_SECS)
+
+    def reset(self, driver):
+        """Descarta los eventos pendientes (de la página anterior) antes de navegar"""
+        driver.get_log('performance')
+
+    def wait(self, driver, patterns: Sequence[str], timeout: float = None) -> List[Dict]:
+        """
+        Respuestas JSON de las URLs que coinciden con `patterns`; vuelve apenas
+        cada patrón tiene una o al vencer el timeout
+        """
+        compiled = [re.compile(pattern) for pattern in patterns]
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        pending = {}  # requestId -> (índice del patrón, response de DevTools)
+        matched = set()
+        captured = []
+        while True:
+            for entry in driver.get_log('performance'):
+                message = json.loads(entry['message']).get('message') or {}
+                method = message.get('method')
+                params = message.get('params') or {}
+                if method == 'Network.responseReceived' and params.get('type') in CAPTURED_TYPES:
+                    url = params['response'].get('url', '')
+                    index = next((i for i, regex in enumerate(compiled) if regex.search(url)), None)
+                    if index is not None:
+                        pending[params['requestId']] = (index, params['response'])
+                elif method == 'Network.loadingFinished' and params.get('requestId') in pending:
+                    index, response = pending.pop(params['requestId'])
+                    data = self._json_body(driver, params['requestId'])
+                    if data is not None:
+                        captured.append({
+                            'url': response.get('url'),
+                            'status': response.get('status'),
+                            'pattern': patterns[index],
+                            'data': data,
+                        })
+                        matched.add(index)
+                elif method == 'Network.loadingFailed':
+                    pending.pop(params.get('requestId'), None)
+            if len(matched) == len(compiled) or time.monotonic() >= deadline:
+                return captured
+            time.sleep(self.poll_interval)
+
+    @staticmethod
+    def _json_body(driver, request_id: str):
+        try:
+            result = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+        except WebDriverException:
+            return None  # El navegador ya descartó el body
+        body = result.get('body', '')
+        if result.get('base64Encoded'):
+            body = base64.b64decode(body)
+        try:
+            return json.loads(body)
+        except ValueError:
+            return None
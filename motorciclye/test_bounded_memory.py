@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Test del modo de memoria acotada (motorciclye/bounded_memory.py).
+
+Sirve un catálogo sintético en localhost (listados de 500 productos con
+paginado y páginas de producto de ~20 KB), lo crawlea con un spider basado en
+BaseSpider en un proceso aparte y mide el RSS máximo del proceso para varios
+tamaños de catálogo. Falla si en modo acotado el pico supera el techo o crece
+con el tamaño del catálogo más que la tolerancia.
+
+Uso:
+    python test_bounded_memory.py                       # 2000 y 20000 productos
+    python test_bounded_memory.py --sizes 5000 50000
+    python test_bounded_memory.py --compare             # también sin modo acotado
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import psutil
+
+# Agregar el path del proyecto
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+PAGE_SIZE = 500  # Productos por página de listado
+DEFAULT_CEILING_MB = 256
+DEFAULT_MAX_GROWTH_MB = 24
+FILLER = ''.join(f'<p class="spec-{i}">Especificación técnica {i} del producto de prueba</p>' for i in range(300))
+
+
+class CatalogHandler(BaseHTTPRequestHandler):
+    """/list/<n> y /p/<id> de un catálogo de `server.catalog_size` productos"""
+
+    def do_GET(self):
+        size = self.server.catalog_size
+        parts = self.path.strip('/').split('/')
+        if len(parts) == 2 and parts[0] == 'list' and parts[1].isdigit():
+            page = int(parts[1])
+            first = (page - 1) * PAGE_SIZE
+            items = ''.join(f'<li><a href="/p/{i}">Producto {i}</a></li>' for i in range(first, min(first + PAGE_SIZE, size)))
+            next_link = f'<a rel="next" href="/list/{page + 1}">Siguiente</a>' if first + PAGE_SIZE < size else ''
+            body = f'<html><body><ul id="products">{items}</ul>{next_link}</body></html>'
+        elif len(parts) == 2 and parts[0] == 'p' and parts[1].isdigit() and int(parts[1]) < size:
+            product_id = int(parts[1])
+            body = (
+                f'<html><body><h1>Casco modelo {product_id}</h1><span class="price">$ {10000 + product_id:,}</span>'
+                f'<img src="/img/{product_id}.jpg"><div class="description">Descripción {product_id}</div>'
+                f'{FILLER}</body></html>'
+            ).replace(',', '.')
+        else:
+            self.send_error(404)
+            return
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(catalog_size: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CatalogHandler)
+    server.daemon_threads = True
+    server.catalog_size = catalog_size
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_crawl(base_url: str, bounded: bool):
+    """Se ejecuta en el proceso hijo: crawlea el catálogo e imprime las stats en JSON"""
+    os.environ.setdefault('SCRAPY_SETTINGS_MODULE', 'motorciclye.settings')
+    import scrapy
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    from motorciclye.spiders.base_spider import BaseSpider
+
+    class SyntheticCatalogSpider(BaseSpider):
+        name = 'bounded_memory_test'
+        XPATH_PRODUCT_LINKS = '//ul[@id="products"]/li/a/@href'
+        XPATH_NEXT_PAGE = '//a[@rel="next"]/@href'
+        XPATH_PRODUCT_NAME = '//h1/text()'
+        XPATH_PRODUCT_PRICE = '//span[@class="price"]/text()'
+        XPATH_PRODUCT_IMAGES = '//img/@src'
+        XPATH_PRODUCT_DESCRIPTION = '//div[@class="description"]/text()'
+
+        def start_requests(self):
+            yield scrapy.Request(f'{self.base_url}/list/1', callback=self.parse_listing, meta={'menu_name': 'Cascos'})
+
+        async def start(self):  # Scrapy 2.13+
+            for request in self.start_requests():
+                yield request
+
+        def parse_listing(self, response):
+            meta = {'menu_name': response.meta['menu_name'], 'menu_url': response.url}
+            for href in response.xpath(self.XPATH_PRODUCT_LINKS).getall():
+                yield response.follow(href, callback=self.parse_product, meta=meta)
+            next_page = response.xpath(self.XPATH_NEXT_PAGE).get()
+            if next_page:
+                yield response.follow(next_page, callback=self.parse_listing, meta={'menu_name': meta['menu_name']})
+
+    settings = get_project_settings()
+    settings.setdict({
+        'ITEM_PIPELINES': {},
+        'EXTENSIONS': {'motorciclye.outbox.OutboxExtension': None},
+        'HTTPCACHE_ENABLED': False,
+        'LOG_LEVEL': 'WARNING',
+        'TELNETCONSOLE_ENABLED': False,
+    }, priority='cmdline')
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(SyntheticCatalogSpider)
+    process.crawl(crawler, base_url=base_url, bounded_memory='1' if bounded else '0')
+    process.start()
+    stats = crawler.stats.get_stats()
+    print(json.dumps({
+        'items': stats.get('item_scraped_count', 0),
+        'disk_enqueued': stats.get('scheduler/enqueued/disk', 0),
+        'memory_enqueued': stats.get('scheduler/enqueued/memory', 0),
+        'finish_reason': stats.get('finish_reason'),
+    }))
+
+
+def measure(catalog_size: int, bounded: bool) -> dict:
+    """Crawlea un catálogo en un proceso hijo y devuelve sus stats y el RSS máximo"""
+    server = start_server(catalog_size)
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    with tempfile.TemporaryDirectory() as workdir:  # build/ del hijo fuera del proyecto
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(project_root), os.environ.get('PYTHONPATH')])))
+        child = subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), '--child', base_url] + (['--bounded'] if bounded else []),
+            cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+        )
+        proc = psutil.Process(child.pid)
+        peak = 0
+        start = time.monotonic()
+        while child.poll() is None:
+            try:
+                peak = max(peak, proc.memory_info().rss)
+            except psutil.Error:
+                break
+            time.sleep(0.1)
+        stdout, stderr = child.communicate()
+        elapsed = time.monotonic() - start
+    server.shutdown()
+    if child.returncode != 0 or not stdout.strip():
+        raise RuntimeError(f"El crawl falló (código {child.returncode}):\n{stderr[-3000:]}")
+    result = json.loads(stdout.strip().splitlines()[-1])
+    result.update({'size': catalog_size, 'peak_mb': peak / 1024 / 1024, 'seconds': elapsed})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Test de memoria del modo acotado con un catálogo sintético')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2000, 20000], help='Tamaños de catálogo')
+    parser.add_argument('--ceiling-mb', type=float, default=DEFAULT_CEILING_MB, help='RSS máximo permitido')
+    parser.add_argument('--max-growth-mb', type=float, default=DEFAULT_MAX_GROWTH_MB,
+                        help='Crecimiento máximo del pico entre el catálogo más chico y el más grande')
+    parser.add_argument('--compare', action='store_true', help='Medir también sin modo acotado')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--bounded', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_crawl(args.child, args.bounded)
+        return 0
+
+    modes = [True, False] if args.compare else [True]
+    results = {mode: [] for mode in modes}
+    for bounded in modes:
+        label = 'acotado' if bounded else 'por defecto'
+        print(f"🧪 Modo {label}")
+        for size in sorted(args.sizes):
+            result = measure(size, bounded)
+            results[bounded].append(result)
+            print(f"   {size:>7} productos: {result['items']} items, pico {result['peak_mb']:.0f} MB, "
+                  f"{result['disk_enqueued']} requests a disco, {result['seconds']:.0f}s")
+
+    failures = []
+    bounded_results = results[True]
+    for result in bounded_results:
+        if result['items'] != result['size']:
+            failures.append(f"{result['size']} productos: se extrajeron {result['items']}")
+        if result['peak_mb'] > args.ceiling_mb:
+            failures.append(f"{result['size']} productos: pico {result['peak_mb']:.0f} MB > techo {args.ceiling_mb:.0f} MB")
+    growth = bounded_results[-1]['peak_mb'] - bounded_results[0]['peak_mb']
+    print(f"\n📈 Crecimiento del pico en modo acotado: {growth:+.1f} MB "
+          f"({bounded_results[0]['size']} → {bounded_results[-1]['size']} productos)")
+    if False in results:
+        default_growth = results[False][-1]['peak_mb'] - results[False][0]['peak_mb']
+        print(f"   Sin modo acotado: {default_growth:+.1f} MB")
+    if len(bounded_results) > 1 and growth > args.max_growth_mb:
+        failures.append(f"el pico creció {growth:.1f} MB > {args.max_growth_mb:.0f} MB")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    print("✅ Memoria acotada" if not failures else "❌ Falló")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
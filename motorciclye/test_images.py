@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Test del pipeline de imágenes por contenido (motorciclye/images.py).
+
+Genera imágenes locales (una foto JPEG, la misma foto recomprimida, un PNG con
+transparencia, una imagen muy chica y un placeholder) y corre dos crawls en
+procesos aparte con ContentAddressedImagesPipeline contra URLs file://:
+
+1. Primera corrida: la foto se guarda con clave por contenido y miniaturas, la
+   recomprimida se deduplica (misma clave), el PNG se convierte a JPEG, la
+   chica falla y el placeholder no se descarga.
+2. Segunda corrida: todas las URLs salen del índice, sin descargar ni guardar
+   nada nuevo.
+
+Uso:
+    python test_images.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# Agregar el path del proyecto
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+
+def make_images(directory: Path) -> dict:
+    """Imágenes de prueba en `directory`; devuelve nombre -> URL file://"""
+    from PIL import Image
+
+    photo = Image.new('RGB', (240, 180))
+    photo.putdata([((x * 3) % 256, (y * 5) % 256, ((x + y) * 2) % 256) for y in range(180) for x in range(240)])
+    photo.save(directory / 'photo.jpg', 'JPEG', quality=95)
+    photo.save(directory / 'photo_recompressed.jpg', 'JPEG', quality=60)
+
+    logo = Image.new('RGBA', (120, 120), (0, 0, 0, 0))
+    logo.paste((200, 30, 30, 255), (30, 30, 90, 90))
+    logo.save(directory / 'logo.png', 'PNG')
+
+    Image.new('RGB', (20, 20), (10, 10, 10)).save(directory / 'tiny.jpg', 'JPEG')
+    photo.save(directory / 'placeholder.jpg', 'JPEG')
+    return {path.stem: path.as_uri() for path in directory.iterdir()}
+
+
+def run_crawl(workdir: str, urls: list):
+    """Se ejecuta en el proceso hijo: un producto con `urls` por el pipeline; imprime items y stats en JSON"""
+    os.environ.setdefault('SCRAPY_SETTINGS_MODULE', 'motorciclye.settings')
+    os.chdir(workdir)  # build/images del hijo fuera del proyecto
+    import scrapy
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    from motorciclye import images
+
+    images.images_config = lambda: {'enabled': True, 'index': os.path.join('build', 'images', 'index.sqlite3')}
+    items = []
+
+    class LocalImagesSpider(scrapy.Spider):
+        name = 'images_test'
+
+        async def start(self):
+            yield scrapy.Request('data:,', callback=self.parse)
+
+        def parse(self, response):
+            yield {'item_type': 'product', 'images': urls}
+
+    settings = get_project_settings()
+    settings.setdict({
+        'ITEM_PIPELINES': {'motorciclye.images.ContentAddressedImagesPipeline': 280},
+        'EXTENSIONS': {'motorciclye.outbox.OutboxExtension': None},
+        'HTTPCACHE_ENABLED': False,
+        'LOG_LEVEL': 'CRITICAL',  # La imagen chica falla a propósito
+        'TELNETCONSOLE_ENABLED': False,
+    }, priority='cmdline')
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(LocalImagesSpider)
+
+    def item_scraped(item):
+        items.append(dict(item))
+
+    crawler.signals.connect(item_scraped, signal=scrapy.signals.item_scraped)
+    process.crawl(crawler)
+    process.start()
+    stats = crawler.stats.get_stats()
+    print(json.dumps({
+        'items': items,
+        'downloaded': stats.get('file_status_count/downloaded', 0),
+        'finish_reason': stats.get('finish_reason'),
+    }))
+
+
+def crawl(workdir: str, urls: list) -> dict:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(project_root), os.environ.get('PYTHONPATH')])))
+    output = subprocess.run(
+        [sys.executable, __file__, '--child', workdir, json.dumps(urls)],
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> int:
+    from motorciclye.settings import IMAGES_THUMBS
+
+    with tempfile.TemporaryDirectory() as workdir:
+        image_dir = Path(workdir) / 'source'
+        image_dir.mkdir()
+        url = make_images(image_dir)
+        urls = [url['photo'], url['photo_recompressed'], url['logo'], url['tiny'], url['placeholder']]
+        store = Path(workdir) / 'build' / 'images'
+        failures = []
+
+        print("🖼️  Primera corrida")
+        first = crawl(workdir, urls)
+        keys = first['items'][0].get('image_keys') or []
+        print(f"   image_keys: {keys}")
+        if len(keys) != 3:
+            failures.append(f"se esperaban 3 claves (foto, recomprimida, logo), hay {len(keys)}")
+        elif keys[0] != keys[1]:
+            failures.append("la foto recomprimida no se deduplicó")
+        elif not keys[0].startswith('full/') or keys[0] == keys[2]:
+            failures.append(f"claves inesperadas: {keys}")
+        for key in set(keys):
+            sha256 = Path(key).stem
+            for path in [store / key] + [store / 'thumbs' / thumb / sha256[:2] / f'{sha256}.jpg' for thumb in IMAGES_THUMBS]:
+                if not path.exists():
+                    failures.append(f"no se guardó {path.relative_to(store)}")
+        if first['downloaded'] != 4:
+            failures.append(f"se esperaban 4 descargas (sin el placeholder), hubo {first['downloaded']}")
+        stored = sorted(str(path.relative_to(store)) for path in store.rglob('*.jpg'))
+
+        print("🔁 Segunda corrida")
+        second = crawl(workdir, urls)
+        print(f"   image_keys: {second['items'][0].get('image_keys')}, {second['downloaded']} descargadas")
+        if second['items'][0].get('image_keys') != keys:
+            failures.append("la segunda corrida devolvió otras claves")
+        if second['downloaded'] != 1:  # Solo la imagen chica, que no entra al índice
+            failures.append(f"la segunda corrida descargó {second['downloaded']} imágenes (se esperaba 1)")
+        if sorted(str(path.relative_to(store)) for path in store.rglob('*.jpg')) != stored:
+            failures.append("la segunda corrida guardó imágenes nuevas")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Pipeline de imágenes OK")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == '--child':
+        run_crawl(sys.argv[2], json.loads(sys.argv[3]))
+    else:
+        sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test del spider desacoplado del pool de extracción (motorciclye/parse_pool.py).
+
+En los workers el spider no tiene crawler: los logs y las stats que toca la
+extracción se guardan y vuelven con el resultado. Verifica con MotodeltaSpider:
+
+1. clean_price de un precio en cuotas en el spider desacoplado: devuelve None,
+   cuenta `price/installments_discarded` y loguea el descarte, sin
+   AttributeError (que en motodelta cerraba el crawl vía handle_product_error).
+2. Lo mismo de punta a punta en un ParsePool real: un producto con precio en
+   cuotas vuelve sin precio y con la stat y el log para el proceso principal,
+   y uno con precio común vuelve con su valor.
+
+Uso:
+    python test_parse_pool.py
+"""
+
+import sys
+from pathlib import Path
+
+# Agregar el path del proyecto
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+INSTALLMENTS_STAT = 'price/installments_discarded'
+
+
+def product_page(price_text: str) -> bytes:
+    """Página mínima con el precio donde lo busca MotodeltaSpider.XPATH_PRODUCT_PRICE"""
+    return (
+        '<html><body><h1>Casco LS2 FF353</h1>'
+        f'<div id="price"><div><div><div><span><span><span>$</span><span>{price_text}</span></span></span></div></div></div></div>'
+        '</body></html>'
+    ).encode('utf-8')
+
+
+def check_detached(failures: list):
+    from motorciclye.parse_pool import detached_spider
+    from motorciclye.spiders.motodelta import MotodeltaSpider
+
+    spider = detached_spider(MotodeltaSpider)
+    try:
+        value = spider.clean_price('6 cuotas de $ 1.234')
+    except Exception as e:
+        failures.append(f"clean_price en el spider desacoplado levantó {e!r}")
+        return
+    print(f"   clean_price('6 cuotas de $ 1.234') = {value}, stats {spider.crawler.stats.values}")
+    if value is not None:
+        failures.append(f"el precio en cuotas devolvió {value} (se esperaba None)")
+    if spider.crawler.stats.values.get(INSTALLMENTS_STAT) != 1:
+        failures.append(f"no se contó {INSTALLMENTS_STAT}")
+    if not any('cuotas' in message for _, message in spider.logger.records):
+        failures.append("no se logueó el descarte")
+    if spider.clean_price('$ 1.234,56') != 1234.56:
+        failures.append("el precio común no se parseó")
+
+
+def check_pool(failures: list):
+    from scrapy.http import HtmlResponse, Request
+    from twisted.internet import defer, reactor
+
+    from motorciclye.parse_pool import ParsePool
+    from motorciclye.spiders.motodelta import MotodeltaSpider
+
+    results = {}
+
+    @defer.inlineCallbacks
+    def run():
+        pool = ParsePool(MotodeltaSpider, workers=1)
+        try:
+            for price_text in ('6 cuotas de $ 1.234', '1.234,56'):
+                url = 'https://www.motodelta.com.ar/casco-ls2'
+                response = HtmlResponse(url, body=product_page(price_text), encoding='utf-8', request=Request(url))
+                try:
+                    results[price_text] = yield pool.extract(response)
+                except Exception as e:
+                    results[price_text] = e
+        finally:
+            pool.close()
+            reactor.stop()
+
+    reactor.callWhenRunning(run)
+    reactor.run()
+
+    installments = results.get('6 cuotas de $ 1.234')
+    if isinstance(installments, Exception) or installments is None:
+        failures.append(f"el pool falló con el precio en cuotas: {installments!r}")
+    else:
+        data, records, stats = installments
+        print(f"   en cuotas: price={data.get('price')}, stats {stats}")
+        if data.get('price') is not None or stats.get(INSTALLMENTS_STAT) != 1:
+            failures.append(f"resultado inesperado del pool: price={data.get('price')}, stats {stats}")
+        if not any('cuotas' in message for _, message in records):
+            failures.append("el log del descarte no volvió del worker")
+    common = results.get('1.234,56')
+    if isinstance(common, Exception) or common is None or common[0].get('price') != 1234.56 or common[2]:
+        failures.append(f"resultado inesperado del pool con precio común: {common!r}")
+    else:
+        print(f"   común: price={common[0].get('price')}, stats {common[2]}")
+
+
+def main() -> int:
+    failures = []
+    print("🧩 Spider desacoplado")
+    check_detached(failures)
+    print("🧵 ParsePool")
+    check_pool(failures)
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Extracción en el pool OK")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())